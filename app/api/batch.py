@@ -0,0 +1,166 @@
+#Bulk ingest: send a zip/tar or many files in one request and get back one
+#batch id. The documents are extracted in parallel and their chunks are
+#embedded and indexed together, and /batch/{id} reports overall progress.
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from app.models.schemas import BatchResponse, DocumentStatus, UploadResponse
+from app.services.document_registry import DocumentRegistry
+from app.services.job_queue import JobQueue
+from app.api.dependencies import get_document_registry, get_job_queue
+from app.api.upload import store_document
+from app.api.index import file_payload
+from app.utils.file_utils import (
+    UploadTooLarge, stream_to_temp, remove_quietly, is_archive, extract_archive
+)
+from app.config import settings
+from typing import Dict, List, Tuple
+import asyncio
+import contextlib
+import os
+import time
+
+router = APIRouter()
+
+@router.post("/batch", response_model=BatchResponse)
+async def ingest_batch(files: List[UploadFile] = File(...), workspace_id: str = "default",
+                       priority: int = 0,
+                       registry: DocumentRegistry = Depends(get_document_registry),
+                       job_queue: JobQueue = Depends(get_job_queue)):
+    """Upload many documents (files and/or zip/tar archives) and queue one
+    batch ingestion job for all of them"""
+    
+    documents = []
+    skipped = []
+    
+    for file in files:
+        archive = is_archive(file.filename)
+        
+        try:
+            upload = await stream_to_temp(
+                file,
+                temp_dir=settings.TEMP_DIR,
+                max_size=settings.BATCH_MAX_ARCHIVE_SIZE if archive else settings.MAX_FILE_SIZE,
+                chunk_size=settings.UPLOAD_CHUNK_SIZE
+            )
+        except UploadTooLarge as e:
+            skipped.append({'filename': file.filename, 'reason': str(e)})
+            continue
+        
+        if not archive:
+            upload['filename'] = file.filename
+            members = [upload]
+        else:
+            try:
+                # zip/tar reading is blocking; members are copied out one by one
+                members, archive_skipped = await asyncio.to_thread(
+                    extract_archive,
+                    upload['temp_path'],
+                    settings.TEMP_DIR,
+                    allowed_extensions=settings.SUPPORTED_FORMATS,
+                    max_member_size=settings.MAX_FILE_SIZE,
+                    max_members=settings.BATCH_MAX_FILES - len(documents),
+                    chunk_size=settings.UPLOAD_CHUNK_SIZE
+                )
+            except Exception as e:
+                skipped.append({'filename': file.filename, 'reason': f"unreadable archive: {str(e)}"})
+                continue
+            finally:
+                await remove_quietly(upload['temp_path'])
+            skipped.extend(archive_skipped)
+        
+        # Registry writes and moves block; one thread call per file/archive
+        documents.extend(await asyncio.to_thread(
+            _store_members, members, workspace_id, settings.BATCH_MAX_FILES - len(documents),
+            skipped, registry, job_queue
+        ))
+    
+    # Byte-identical files collapse to one document; already indexed ones
+    # don't need another pass
+    payloads = {}
+    for document, file_path in documents:
+        if document.document_id in payloads or document.status == DocumentStatus.COMPLETED:
+            continue
+        payloads[document.document_id] = {'document_id': document.document_id,
+                                          **file_payload(file_path)}
+    
+    batch_id = None
+    if payloads:
+        job = await asyncio.to_thread(
+            job_queue.enqueue_batch, workspace_id, list(payloads.values()), priority
+        )
+        batch_id = job['job_id']
+    
+    return BatchResponse(
+        batch_id=batch_id,
+        workspace_id=workspace_id,
+        documents=[document for document, _ in documents],
+        skipped=skipped,
+        queued=len(payloads)
+    )
+
+def _store_members(members: List[Dict], workspace_id: str, room: int, skipped: List[Dict],
+                   registry: DocumentRegistry, job_queue: JobQueue
+                   ) -> List[Tuple[UploadResponse, str]]:
+    """Store received files (at most room of them) and return each one's
+    upload response and file path; temp files are always removed"""
+    documents = []
+    
+    for member in members:
+        try:
+            if len(documents) >= room:
+                skipped.append({'filename': member['filename'],
+                                'reason': f"more than {settings.BATCH_MAX_FILES} files"})
+                continue
+            
+            documents.append(store_document(
+                temp_path=member['temp_path'],
+                filename=member['filename'],
+                size=member['size'],
+                content_hash=member['content_hash'],
+                header=member['header'],
+                workspace_id=workspace_id,
+                registry=registry,
+                job_queue=job_queue
+            ))
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(member['temp_path'])
+    
+    return documents
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    """Aggregate progress and throughput of a batch, plus each document's status"""
+    
+    batch = job_queue.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(404, "Batch not found")
+    
+    documents = batch['documents']
+    by_status = {status.value: 0 for status in DocumentStatus}
+    for document in documents:
+        by_status[document['status']] += 1
+    
+    finished = by_status[DocumentStatus.COMPLETED.value] + by_status[DocumentStatus.FAILED.value]
+    elapsed = None
+    if batch['started_at']:
+        elapsed = (batch['finished_at'] or time.time()) - batch['started_at']
+    
+    return {
+        "batch_id": batch_id,
+        "workspace_id": batch['workspace_id'],
+        "status": batch['status'],
+        "stage": batch['stage'],
+        "progress": batch['progress'],
+        "attempts": batch['attempts'],
+        "error": batch['error'],
+        "documents_total": len(documents),
+        "documents_by_status": by_status,
+        "chunks": sum(document['chunks'] or 0 for document in documents),
+        "documents_per_second": round(finished / elapsed, 2) if elapsed else None,
+        "timings": batch['timings'],
+        "created_at": batch['created_at'],
+        "started_at": batch['started_at'],
+        "finished_at": batch['finished_at'],
+        "documents": documents
+    }
@@ -1,19 +1,28 @@
 #this endpoint takes your message, finds relevant info from uploaded documents, 
 #generates a response, and sends it back to you
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from app.models.schemas import ChatRequest, ChatResponse
 from app.services.chat_service import ChatService
+from app.services.retrieval_service import RetrievalUnavailable
+from app.api.dependencies import get_chat_service
+from typing import Dict
+import json
 
 router = APIRouter()
-chat_service = ChatService()
+
+def _sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest,
+               chat_service: ChatService = Depends(get_chat_service)):
     """Chat endpoint with RAG"""
     
     try:
-        result = chat_service.chat(
+        result = await chat_service.chat(
             message=request.message,
             workspace_id=request.workspace_id,
             conversation_id=request.conversation_id,
@@ -22,5 +31,34 @@ async def chat(request: ChatRequest):
         
         return ChatResponse(**result)
         
+    except RetrievalUnavailable as e:
+        raise HTTPException(503, f"Retrieval unavailable: {str(e)}")
     except Exception as e:
-        raise HTTPException(500, f"Chat failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Chat failed: {str(e)}")
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest,
+                      chat_service: ChatService = Depends(get_chat_service)):
+    """Chat endpoint with RAG, streamed as Server-Sent Events
+    
+    Events: 'sources' once retrieval is done, 'token' for each piece of
+    the answer, then 'done' (or 'error').
+    """
+    
+    async def event_stream():
+        try:
+            async for event in chat_service.chat_stream(
+                message=request.message,
+                workspace_id=request.workspace_id,
+                conversation_id=request.conversation_id,
+                filters=request.filters
+            ):
+                yield _sse(event['event'], event['data'])
+        except Exception as e:
+            yield _sse('error', {'detail': f"Chat failed: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
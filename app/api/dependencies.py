@@ -0,0 +1,50 @@
+#FastAPI dependencies that hand the shared, process-wide services
+#to the endpoints instead of each router building its own copies
+
+from fastapi import Depends
+from app.services.container import ServiceContainer, get_container
+from app.services.retrieval_service import RetrievalService
+from app.services.chat_service import ChatService
+from app.services.job_queue import JobQueue
+from app.services.document_registry import DocumentRegistry
+from app.services.upload_sessions import UploadSessionStore
+
+
+def get_services() -> ServiceContainer:
+    """Shared service container"""
+    return get_container()
+
+
+def get_retrieval_service(
+    container: ServiceContainer = Depends(get_services)
+) -> RetrievalService:
+    """Shared retrieval service"""
+    return container.retrieval_service
+
+
+def get_chat_service(
+    container: ServiceContainer = Depends(get_services)
+) -> ChatService:
+    """Shared chat service"""
+    return container.chat_service
+
+
+def get_job_queue(
+    container: ServiceContainer = Depends(get_services)
+) -> JobQueue:
+    """Durable ingestion job queue"""
+    return container.job_queue
+
+
+def get_document_registry(
+    container: ServiceContainer = Depends(get_services)
+) -> DocumentRegistry:
+    """Content-hash document registry"""
+    return container.document_registry
+
+
+def get_upload_sessions(
+    container: ServiceContainer = Depends(get_services)
+) -> UploadSessionStore:
+    """Resumable upload sessions"""
+    return container.upload_sessions
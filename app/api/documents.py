@@ -0,0 +1,19 @@
+#Lists the documents stored in a workspace, along with how many
+#duplicate uploads were skipped thanks to content-hash dedup
+
+from fastapi import APIRouter, Depends
+from app.services.document_registry import DocumentRegistry
+from app.api.dependencies import get_document_registry
+
+router = APIRouter()
+
+@router.get("/documents")
+async def list_documents(workspace_id: str = "default",
+                         registry: DocumentRegistry = Depends(get_document_registry)):
+    """Documents in a workspace plus dedup counts"""
+    
+    return {
+        "workspace_id": workspace_id,
+        "documents": registry.list_documents(workspace_id),
+        "dedup": registry.workspace_stats(workspace_id)
+    }
@@ -1,114 +1,129 @@
-#After you upload a file, this code processes it in the background, 
-# breaks it into searchable pieces, and prepares it so the chatbot 
-#can find relevant information when you ask questions
+#After you upload a file, this code queues it for processing by the 
+# ingestion workers, which break it into searchable pieces and prepare it 
+#so the chatbot can find relevant information when you ask questions
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from app.services.file_processor import FileProcessor
-from app.utils.text_utils import TextChunker
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_store import VectorStore
-from app.services.keyword_search import KeywordSearchService
-from app.models.schemas import DocumentStatus
-from typing import Dict
+from fastapi import APIRouter, HTTPException, Depends
+from app.services.job_queue import JobQueue
+from app.api.dependencies import get_job_queue
+from app.models.schemas import DocumentStatus, FileType
+from app.config import settings
+from typing import Dict, Optional
+import asyncio
 import os
 
 router = APIRouter()
 
-file_processor = FileProcessor()
-text_chunker = TextChunker()
-embedding_service = EmbeddingService()
-vector_store = VectorStore()
-keyword_search = KeywordSearchService()
-
-# In-memory status tracking (use database in production)
-processing_status = {}
-
-def process_document_task(document_id: str, file_path: str, 
-                         file_type: str, workspace_id: str, filename: str):
-    """Background task to process document"""
-    
-    try:
-        processing_status[document_id] = DocumentStatus.PROCESSING
-        
-        # Step 1: Extract content
-        processed = file_processor.process_file(
-            file_path=file_path,
-            file_type=file_type,
-            doc_id=document_id,
-            filename=filename
-        )
-        
-        content = processed['content']
-        metadata = processed['metadata']
-        
-        # Step 2: Chunk text
-        chunks = text_chunker.chunk_text(content, document_id)
-        
-        # Add metadata to chunks
-        for chunk in chunks:
-            chunk['metadata'] = metadata
-        
-        # Step 3: Generate embeddings
-        chunk_texts = [chunk['content'] for chunk in chunks]
-        embeddings = embedding_service.embed_batch(chunk_texts)
-        
-        # Step 4: Store in vector database
-        vector_store.add_chunks(workspace_id, chunks, embeddings)
-        
-        # Step 5: Index for keyword search
-        keyword_search.index_chunks(chunks, workspace_id)
-        
-        processing_status[document_id] = DocumentStatus.COMPLETED
-        
-    except Exception as e:
-        processing_status[document_id] = DocumentStatus.FAILED
-        print(f"Error processing {document_id}: {str(e)}")
+# File extension -> FileProcessor type
+EXTENSION_FILE_TYPES = {
+    'pdf': FileType.PDF,
+    'png': FileType.IMAGE,
+    'jpg': FileType.IMAGE,
+    'jpeg': FileType.IMAGE,
+    'txt': FileType.TEXT,
+    'csv': FileType.CSV,
+    'xlsx': FileType.EXCEL,
+    'xls': FileType.EXCEL,
+    'docx': FileType.DOCX
+}
 
 @router.post("/index/{document_id}")
 async def index_document(
     document_id: str,
     workspace_id: str,
-    background_tasks: BackgroundTasks
+    priority: int = 0,
+    force: bool = False,
+    job_queue: JobQueue = Depends(get_job_queue)
 ):
-    """Trigger document indexing"""
+    """Queue document indexing (higher priority runs first)
+    
+    Already-indexed documents (e.g. a deduplicated re-upload) are not
+    indexed again unless force=true.
+    """
+    # The queue's BEGIN IMMEDIATE can wait on worker writes; keep it off the loop
+    return await asyncio.to_thread(
+        queue_document, document_id, workspace_id, job_queue, priority, force
+    )
+
+def queue_document(document_id: str, workspace_id: str, job_queue: JobQueue,
+                   priority: int = 0, force: bool = False) -> Dict:
+    """Enqueue an uploaded document for the ingestion workers"""
+    
+    latest = job_queue.get_document_status(document_id)
+    if latest and latest['status'] == DocumentStatus.COMPLETED and not force:
+        return {
+            "document_id": document_id,
+            "job_id": latest['job_id'],
+            "status": latest['status'],
+            "message": "Document already indexed"
+        }
+    
+    payload = document_payload(document_id, workspace_id)
+    if payload is None:
+        raise HTTPException(404, "Document not found")
+    
+    job = job_queue.enqueue(
+        workspace_id=workspace_id,
+        document_id=document_id,
+        priority=priority,
+        payload=payload
+    )
+    
+    return {
+        "document_id": document_id,
+        "job_id": job['job_id'],
+        "status": job['status'],
+        "message": "Document indexing queued"
+    }
+
+def document_payload(document_id: str, workspace_id: str) -> Optional[Dict]:
+    """Ingestion job payload for an uploaded document, None if it isn't on disk"""
     
     # Find the uploaded file
-    workspace_dir = os.path.join("uploads", workspace_id)
-    files = [f for f in os.listdir(workspace_dir) if f.startswith(document_id)]
+    workspace_dir = os.path.join(settings.UPLOAD_DIR, workspace_id)
+    files = [f for f in os.listdir(workspace_dir) if f.startswith(document_id)] \
+        if os.path.isdir(workspace_dir) else []
     
     if not files:
-        raise HTTPException(404, "Document not found")
+        return None
     
-    file_path = os.path.join(workspace_dir, files[0])
-    filename = files[0].split('_', 1)[1]  # Remove doc_id prefix
+    return file_payload(os.path.join(workspace_dir, files[0]))
+
+def file_payload(file_path: str) -> Dict:
+    """Ingestion job payload for an uploaded file at a known path"""
+    filename = os.path.basename(file_path).split('_', 1)[1]  # Remove doc_id prefix
     
     # Detect file type from extension
     ext = filename.split('.')[-1].lower()
-    file_type = ext
-    
-    # Add to background tasks
-    background_tasks.add_task(
-        process_document_task,
-        document_id=document_id,
-        file_path=file_path,
-        file_type=file_type,
-        workspace_id=workspace_id,
-        filename=filename
-    )
     
     return {
-        "document_id": document_id,
-        "status": "processing",
-        "message": "Document indexing started"
+        'file_path': file_path,
+        'file_type': EXTENSION_FILE_TYPES.get(ext, ext),
+        'filename': filename
     }
 
 @router.get("/status/{document_id}")
-async def get_status(document_id: str):
-    """Check document processing status"""
+async def get_status(document_id: str,
+                     job_queue: JobQueue = Depends(get_job_queue)):
+    """Check document processing status (works from any API worker)"""
+    
+    job = await asyncio.to_thread(job_queue.get_document_status, document_id)
     
-    status = processing_status.get(document_id, DocumentStatus.PENDING)
+    if job is None:
+        return {
+            "document_id": document_id,
+            "status": DocumentStatus.PENDING
+        }
     
     return {
         "document_id": document_id,
-        "status": status
-    }
\ No newline at end of file
+        "job_id": job['job_id'],
+        "status": job['status'],
+        "stage": job['stage'],
+        "progress": job['progress'],
+        "attempts": job['attempts'],
+        "error": job['error'],
+        "timings": job['timings'],
+        "created_at": job['created_at'],
+        "started_at": job['started_at'],
+        "finished_at": job['finished_at']
+    }
@@ -0,0 +1,116 @@
+#Resumable uploads for very large documents: start a session, PUT the
+#file in numbered parts (re-sending only the parts that failed), check
+#which byte ranges arrived, then complete to assemble and store the file
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from app.models.schemas import UploadSessionRequest, UploadResponse
+from app.services.upload_sessions import UploadSessionStore, UploadSessionError
+from app.services.document_registry import DocumentRegistry
+from app.services.job_queue import JobQueue
+from app.api.dependencies import (
+    get_upload_sessions, get_document_registry, get_job_queue
+)
+from app.api.upload import store_upload
+from app.api.index import queue_document
+from typing import Dict
+import asyncio
+import contextlib
+import os
+
+router = APIRouter()
+
+def _session_or_404(sessions: UploadSessionStore, upload_id: str) -> Dict:
+    try:
+        return sessions.get(upload_id)
+    except KeyError:
+        raise HTTPException(404, "Upload session not found")
+
+@router.post("/uploads")
+async def create_upload(request: UploadSessionRequest,
+                        sessions: UploadSessionStore = Depends(get_upload_sessions)):
+    """Start a resumable upload"""
+    try:
+        return sessions.create(
+            filename=request.filename,
+            workspace_id=request.workspace_id,
+            size=request.size,
+            part_size=request.part_size
+        )
+    except UploadSessionError as e:
+        raise HTTPException(400, str(e))
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request,
+                      sessions: UploadSessionStore = Depends(get_upload_sessions)):
+    """Receive one part as the raw request body (idempotent, may be re-sent)"""
+    _session_or_404(sessions, upload_id)
+    
+    try:
+        return await sessions.write_part(upload_id, part_number, request.stream())
+    except UploadSessionError as e:
+        raise HTTPException(400, str(e))
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str,
+                     sessions: UploadSessionStore = Depends(get_upload_sessions)):
+    """Which parts and byte ranges have been received"""
+    _session_or_404(sessions, upload_id)
+    await asyncio.to_thread(sessions.cleanup_expired)
+    return sessions.progress(upload_id)
+
+@router.post("/uploads/{upload_id}/complete", response_model=UploadResponse)
+async def complete_upload(upload_id: str, index: bool = False, priority: int = 0,
+                          sessions: UploadSessionStore = Depends(get_upload_sessions),
+                          registry: DocumentRegistry = Depends(get_document_registry),
+                          job_queue: JobQueue = Depends(get_job_queue)):
+    """Assemble the parts, store the document and optionally queue indexing"""
+    session = _session_or_404(sessions, upload_id)
+    
+    try:
+        # Assembling and storing copy up to RESUMABLE_MAX_FILE_SIZE bytes
+        # and write the registry and queue; keep all of it off the event loop
+        return await asyncio.to_thread(
+            _complete, session, index, priority, sessions, registry, job_queue
+        )
+    except UploadSessionError as e:
+        raise HTTPException(409, str(e))
+
+def _complete(session: Dict, index: bool, priority: int, sessions: UploadSessionStore,
+              registry: DocumentRegistry, job_queue: JobQueue) -> UploadResponse:
+    """complete_upload's blocking work, run in a worker thread"""
+    upload_id = session['upload_id']
+    upload = sessions.assemble(upload_id)
+    
+    try:
+        response = store_upload(
+            temp_path=upload['temp_path'],
+            filename=session['filename'],
+            size=upload['size'],
+            content_hash=upload['content_hash'],
+            header=upload['header'],
+            workspace_id=session['workspace_id'],
+            registry=registry,
+            job_queue=job_queue
+        )
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(upload['temp_path'])
+    
+    sessions.delete(upload_id)
+    sessions.cleanup_expired()
+    
+    if index:
+        job = queue_document(
+            response.document_id, session['workspace_id'], job_queue, priority
+        )
+        response.status = job['status']
+    
+    return response
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str,
+                       sessions: UploadSessionStore = Depends(get_upload_sessions)):
+    """Abandon a resumable upload and delete its parts"""
+    _session_or_404(sessions, upload_id)
+    await asyncio.to_thread(sessions.delete, upload_id)
+    return {"upload_id": upload_id, "status": "aborted"}
@@ -3,20 +3,29 @@
 # relevant pieces of your documents when you ask a question, 
 #using both AI understanding and keyword matching.
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Response
 from app.models.schemas import SearchRequest, SearchResult
-from app.services.retrieval_service import RetrievalService
+from app.services.retrieval_service import RetrievalService, RetrievalUnavailable
+from app.api.dependencies import get_retrieval_service
 from typing import List
 
 router = APIRouter()
-retrieval_service = RetrievalService()
 
+# Plain def: FastAPI runs it in its threadpool, so concurrent searches
+# overlap and their query encodes can share a batch.
 @router.post("/search", response_model=List[SearchResult])
-async def search(request: SearchRequest, workspace_id: str = "default"):
-    """Search for relevant chunks"""
+def search(request: SearchRequest, response: Response,
+           workspace_id: str = "default",
+           retrieval_service: RetrievalService = Depends(get_retrieval_service)):
+    """Search for relevant chunks
+    
+    Degradation (a branch that timed out or failed) is reported in the
+    X-Retrieval-Degraded and X-Retrieval-Branches response headers; if no
+    branch answered, the response is a 503 rather than an empty result.
+    """
     
     try:
-        results = retrieval_service.hybrid_search(
+        detailed = retrieval_service.hybrid_search_detailed(
             query=request.query,
             workspace_id=workspace_id,
             top_k=request.top_k,
@@ -25,6 +34,14 @@ async def search(request: SearchRequest, workspace_id: str = "default"):
             use_keyword=request.use_keyword,
             semantic_weight=request.semantic_weight
         )
+        results = detailed['results']
+        retrieval = detailed['retrieval']
+        
+        response.headers["X-Retrieval-Degraded"] = str(retrieval['degraded']).lower()
+        response.headers["X-Retrieval-Branches"] = ";".join(
+            f"{name}={branch['status']}"
+            for name, branch in retrieval['branches'].items()
+        )
         
         return [
             SearchResult(
@@ -37,5 +54,7 @@ async def search(request: SearchRequest, workspace_id: str = "default"):
             for r in results
         ]
         
+    except RetrievalUnavailable as e:
+        raise HTTPException(503, f"Search unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(500, f"Search failed: {str(e)}")
\ No newline at end of file
@@ -1,8 +1,18 @@
 #This endpoint successfully uploads a file, 
 #saves it with a unique name, and returns information about the upload!
+#Files identical to one already in the workspace aren't stored again.
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from app.models.schemas import UploadResponse, FileType, DocumentStatus
+from app.services.document_registry import DocumentRegistry
+from app.services.job_queue import JobQueue
+from app.api.dependencies import get_document_registry, get_job_queue
+from app.utils.file_utils import (
+    UploadTooLarge, stream_to_temp, move_into_place, remove_quietly
+)
+from app.config import settings
+from typing import Tuple
+import asyncio
 import os
 import uuid
 from datetime import datetime
@@ -10,9 +20,9 @@ import magic
 
 router = APIRouter()
 
-def detect_file_type(content: bytes, filename: str) -> str:
-    """Detect file type"""
-    mime = magic.from_buffer(content, mime=True)
+def detect_file_type(header: bytes, filename: str) -> str:
+    """Detect file type from the first bytes and the extension"""
+    mime = magic.from_buffer(header, mime=True)
     ext = filename.split('.')[-1].lower()
     
     if 'pdf' in mime or ext == 'pdf':
@@ -21,32 +31,109 @@ def detect_file_type(content: bytes, filename: str) -> str:
         return 'image'
     elif ext == 'txt':
         return 'text'
+    elif ext in ['xlsx', 'xls']:
+        return 'excel'
     else:
         return ext
 
 @router.post("/upload", response_model=UploadResponse)
-async def upload_file(file: UploadFile = File(...), workspace_id: str = "default"):
-    """Upload a file"""
+async def upload_file(file: UploadFile = File(...), workspace_id: str = "default",
+                      registry: DocumentRegistry = Depends(get_document_registry),
+                      job_queue: JobQueue = Depends(get_job_queue)):
+    """Upload a file (deduplicated by content hash within the workspace)"""
     
-    content = await file.read()
-    file_size = len(content)
+    # Stream to TEMP_DIR, hashing and enforcing MAX_FILE_SIZE on the fly
+    try:
+        upload = await stream_to_temp(
+            file,
+            temp_dir=settings.TEMP_DIR,
+            max_size=settings.MAX_FILE_SIZE,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
     
-    file_type = detect_file_type(content, file.filename)
+    try:
+        # Registry writes and a cross-filesystem move block; keep them off the loop
+        return await asyncio.to_thread(
+            store_upload,
+            upload['temp_path'],
+            filename=file.filename,
+            size=upload['size'],
+            content_hash=upload['content_hash'],
+            header=upload['header'],
+            workspace_id=workspace_id,
+            registry=registry,
+            job_queue=job_queue
+        )
+    finally:
+        await remove_quietly(upload['temp_path'])
+
+def store_upload(temp_path: str, filename: str, size: int, content_hash: str,
+                 header: bytes, workspace_id: str, registry: DocumentRegistry,
+                 job_queue: JobQueue) -> UploadResponse:
+    """Move a fully received upload into uploads/<workspace>, or point at
+    the existing copy if the workspace already has these bytes (blocking)"""
+    response, _ = store_document(
+        temp_path, filename, size, content_hash, header, workspace_id, registry, job_queue
+    )
+    return response
+
+def store_document(temp_path: str, filename: str, size: int, content_hash: str,
+                   header: bytes, workspace_id: str, registry: DocumentRegistry,
+                   job_queue: JobQueue) -> Tuple[UploadResponse, str]:
+    """store_upload, also returning the stored file's path"""
+    
+    # Byte-identical file already in this workspace: hand back its id
+    existing = registry.find_by_hash(workspace_id, content_hash)
+    if existing:
+        registry.record_duplicate(existing['document_id'])
+        return _duplicate_response(existing, job_queue), existing['file_path']
+    
+    file_type = detect_file_type(header, filename)
     doc_id = str(uuid.uuid4())
     
-    workspace_dir = os.path.join("uploads", workspace_id)
-    os.makedirs(workspace_dir, exist_ok=True)
+    workspace_dir = os.path.join(settings.UPLOAD_DIR, workspace_id)
+    file_path = os.path.join(workspace_dir, f"{doc_id}_{filename}")
+    
+    move_into_place(temp_path, file_path)
     
-    file_path = os.path.join(workspace_dir, f"{doc_id}_{file.filename}")
+    document = registry.register(
+        workspace_id=workspace_id,
+        document_id=doc_id,
+        content_hash=content_hash,
+        filename=filename,
+        file_type=file_type,
+        size=size,
+        file_path=file_path
+    )
     
-    with open(file_path, 'wb') as f:
-        f.write(content)
+    # A concurrent upload of the same bytes won the race
+    if document['document_id'] != doc_id:
+        os.remove(file_path)
+        return _duplicate_response(document, job_queue), document['file_path']
     
     return UploadResponse(
         document_id=doc_id,
-        filename=file.filename,
+        filename=filename,
         file_type=file_type,
-        size=file_size,
+        size=size,
         status=DocumentStatus.PENDING,
-        uploaded_at=datetime.now()
-    )
\ No newline at end of file
+        uploaded_at=datetime.now(),
+        content_hash=content_hash
+    ), file_path
+
+def _duplicate_response(document: dict, job_queue: JobQueue) -> UploadResponse:
+    """Upload response pointing at the existing copy of a document"""
+    job = job_queue.get_document_status(document['document_id'])
+    
+    return UploadResponse(
+        document_id=document['document_id'],
+        filename=document['filename'],
+        file_type=document['file_type'],
+        size=document['size'],
+        status=job['status'] if job else DocumentStatus.PENDING,
+        uploaded_at=datetime.fromtimestamp(document['uploaded_at']),
+        content_hash=document['content_hash'],
+        deduplicated=True
+    )
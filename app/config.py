@@ -1,14 +1,26 @@
 from pydantic_settings import BaseSettings
+import os
 
 class Settings(BaseSettings):
     # API Settings
     API_TITLE: str = "AI Chatbot API"
     API_VERSION: str = "1.0.0"
     
+    # Startup
+    WARMUP_ON_STARTUP: bool = True  # Load and pre-warm services before /ready
+    
     # File Upload
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
     UPLOAD_DIR: str = "uploads"
     TEMP_DIR: str = "temp_files"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB read size while hashing uploads
+    REGISTRY_DB_PATH: str = "./documents.db"  # Content-hash registry for dedup
+    
+    # Resumable uploads
+    RESUMABLE_MAX_FILE_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB
+    RESUMABLE_PART_SIZE: int = 8 * 1024 * 1024  # 8MB
+    RESUMABLE_MIN_PART_SIZE: int = 1024 * 1024  # 1MB
+    RESUMABLE_UPLOAD_TTL: float = 24 * 3600  # seconds since last part
     
     # Supported formats
     SUPPORTED_FORMATS: list = [
@@ -19,17 +31,97 @@ class Settings(BaseSettings):
     # OCR Settings
     TESSERACT_CONFIG: str = "--oem 3 --psm 6"
     OCR_LANGUAGES: str = "eng+fra+ara"  # English, French, Arabic
+    OCR_DPI: int = 300  # Fixed DPI, or fallback when adaptive OCR finds no text lines
+    OCR_ADAPTIVE: bool = True  # Pick DPI per page, binarize, OCR with detected script only
+    OCR_PREVIEW_DPI: int = 72  # Preview render used to measure the page
+    OCR_TARGET_LINE_PX: int = 48  # Text line height aimed for at OCR resolution
+    OCR_MIN_DPI: int = 150
+    OCR_MAX_DPI: int = 400
+    OCR_MAX_PIXELS: int = 12_000_000  # Per page image
+    OCR_DETECT_SCRIPT: bool = True
+    OCR_SCRIPT_LANGUAGES: dict = {  # Tesseract OSD script -> OCR languages
+        "Latin": "eng+fra",
+        "Arabic": "ara"
+    }
+    OCR_MIN_PAGE_CHARS: int = 20  # Text-layer pages with less text and an image get OCR'd
+    OCR_PAGE_WINDOW: int = 8  # Pages rendered/OCR'd at once (caps memory)
+    OCR_PAGE_TIMEOUT: float = 120.0  # seconds per page
+    
+    # PDF extraction
+    EXTRACT_WORKERS: int = 0  # PDF text/table extraction and OCR processes (one pool) per ingestion worker, 0 = CPU count / INGEST_WORKERS
+    PDF_PAGES_PER_TASK: int = 16  # Pages per pool task
+    PDF_TASK_WINDOW: int = 8  # Tasks in flight or waiting to be consumed (caps memory)
+    PDF_TABLE_MIN_RECTS: int = 4  # Rectangles on a page before tables are extracted
+    PDF_TABLE_MIN_LINES: int = 8  # ... or ruling line segments
+    PDF_TEXT_TIMEOUT: float = 120.0  # seconds per pdftotext call
+    
+    # CSV/Excel extraction
+    TABLE_READ_ROWS: int = 10000  # Rows read and rendered at a time (bounds memory)
+    
+    # Table store
+    TABLE_STORE_ENABLED: bool = True  # Keep extracted tables as columns for aggregate questions
+    TABLE_STORE_DIR: str = "./tables"
+    TABLE_QUERY_MAX_ROWS: int = 50  # Rows or groups handed to the LLM
+    TABLE_QUERY_MAX_VALUES: int = 100000  # Distinct values above which a text column isn't matched
+    TABLE_CACHE_SIZE: int = 256  # Tables kept loaded (memory-mapped) per process
+    
+    # Extraction cache
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_DIR: str = "./cache/extraction"
+    EXTRACTION_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2GB
     
     # Chunking
-    CHUNK_SIZE: int = 500  # tokens
-    CHUNK_OVERLAP: int = 50  # tokens
+    CHUNK_SIZE: int = 256  # tokens (all-MiniLM-L6-v2 truncates its input at 256)
+    CHUNK_OVERLAP: int = 32  # tokens
+    CHUNK_TOKENIZER: str = ""  # Tokenizer for chunk sizes, default EMBEDDING_MODEL's; "whitespace" counts words
+    
+    # Near-duplicate chunks
+    DEDUP_ENABLED: bool = True  # Index one canonical copy of near-identical chunks per workspace
+    DEDUP_DB_PATH: str = "./dedup.db"
+    DEDUP_THRESHOLD: float = 0.9  # Estimated Jaccard similarity of word shingles
+    DEDUP_SHINGLE_WORDS: int = 3
+    DEDUP_NUM_PERM: int = 128  # MinHash permutations
+    DEDUP_BANDS: int = 16  # LSH bands of DEDUP_NUM_PERM / DEDUP_BANDS rows each
     
     # Embedding
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048  # entries, 0 disables the cache
+    QUERY_EMBEDDING_CACHE_TTL: float = 0  # seconds, 0 = never expire
+    EMBEDDING_BATCH_SIZE: int = 64  # Texts per model.encode call at ingest
+    EMBEDDING_BATCHING: bool = True  # Coalesce concurrent query encodes
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_CACHE_ENABLED: bool = True  # Reuse chunk embeddings across re-chunking/re-indexing
+    EMBEDDING_CACHE_DIR: str = "./cache/embeddings"
     
     # Vector DB
     CHROMA_PERSIST_DIR: str = "./chroma_db"
     
+    # Keyword index
+    KEYWORD_COMMIT_PERIOD: float = 1.0  # seconds between background commits
+    KEYWORD_COMMIT_LIMIT: int = 1000  # buffered docs that trigger an early commit
+    KEYWORD_OPTIMIZE_EVERY: int = 50  # commits between full optimizes
+    KEYWORD_REFRESH_INTERVAL: float = 1.0  # seconds between searcher freshness checks
+    KEYWORD_WRITE_LOCK_TIMEOUT: float = 10.0  # seconds to wait for the writer lock
+    
+    # Ingestion jobs
+    JOB_DB_PATH: str = "./jobs.db"
+    INGEST_WORKERS: int = 2  # Ingestion worker processes
+    INGEST_START_WITH_API: bool = True  # Run the worker pool inside the API process
+    INGEST_WORKSPACE_CONCURRENCY: int = 2  # Running jobs per workspace
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: float = 5.0  # seconds, doubled on every retry
+    JOB_POLL_INTERVAL: float = 0.5  # seconds
+    JOB_HEARTBEAT_INTERVAL: float = 15.0  # seconds
+    JOB_STALE_AFTER: float = 120.0  # seconds without heartbeat before requeue
+    INGEST_CHUNK_BATCH: int = 256  # Chunks embedded and written together (bounds ingest memory)
+    
+    # Batch ingest
+    BATCH_MAX_ARCHIVE_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB per zip/tar
+    BATCH_MAX_FILES: int = 10000  # Documents per batch
+    BATCH_EXTRACT_WORKERS: int = 4  # Documents extracted at once per batch job
+    BATCH_EMBED_CHUNKS: int = 1024  # Chunks pooled across documents per embed/write
+    
     # LLM
     OPENAI_API_KEY: str = ""
     LLM_MODEL: str = "gpt-3.5-turbo"
@@ -38,8 +130,17 @@ class Settings(BaseSettings):
     # Retrieval
     TOP_K: int = 5
     SIMILARITY_THRESHOLD: float = 0.7
+    RETRIEVAL_WORKERS: int = 8  # Threads per retrieval branch (semantic, keyword)
+    SEMANTIC_SEARCH_TIMEOUT: float = 2.0  # seconds
+    KEYWORD_SEARCH_TIMEOUT: float = 1.0  # seconds
     
     class Config:
         env_file = ".env"
+        extra = "ignore"  # .env also holds keys for other tools (TESSERACT_CMD, POPPLER_PATH)
+    
+    def pool_workers(self, configured: int) -> int:
+        """Size of a per-ingestion-worker process pool: the configured
+        count, or this worker's share of the CPUs"""
+        return configured or max(1, (os.cpu_count() or 1) // max(1, self.INGEST_WORKERS))
 
 settings = Settings()
\ No newline at end of file
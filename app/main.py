@@ -1,10 +1,39 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from app.config import settings
+from app.api import upload, index, search, chat, documents, resumable, batch
+from app.services.container import get_container
+from app.worker import IngestionWorkerPool
+import asyncio
 import os
-import uuid
-from datetime import datetime
 
-app = FastAPI(title="AI Chatbot API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in a worker thread so /health answers while the model loads;
+    # /ready only flips once every stage has finished.
+    if settings.WARMUP_ON_STARTUP:
+        app.state.warm_up = asyncio.create_task(
+            asyncio.to_thread(get_container().warm_up)
+        )
+    
+    # Ingestion worker processes (set INGEST_START_WITH_API=false and run
+    # `python -m app.worker` separately when running several API workers)
+    pool = None
+    if settings.INGEST_START_WITH_API and settings.INGEST_WORKERS > 0:
+        pool = IngestionWorkerPool()
+        pool.start()
+    
+    yield
+    
+    if pool is not None:
+        await asyncio.to_thread(pool.stop)
+    # Commit buffered keyword writes before the worker exits
+    await asyncio.to_thread(get_container().close)
+
+app = FastAPI(title=settings.API_TITLE, version=settings.API_VERSION,
+              lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -15,14 +44,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads from Content-Length before the body is read
+# (chunked uploads are still cut off at MAX_FILE_SIZE while streaming)
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path.endswith("/upload"):
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File exceeds {settings.MAX_FILE_SIZE} bytes"}
+            )
+    return await call_next(request)
+
 # Create upload directory
-os.makedirs("uploads/default", exist_ok=True)
+os.makedirs(os.path.join(settings.UPLOAD_DIR, "default"), exist_ok=True)
+
+# API routes (all share the services held by the process-wide container)
+app.include_router(upload.router, prefix="/api/v1", tags=["upload"])
+app.include_router(index.router, prefix="/api/v1", tags=["index"])
+app.include_router(search.router, prefix="/api/v1", tags=["search"])
+app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
+app.include_router(documents.router, prefix="/api/v1", tags=["documents"])
+app.include_router(resumable.router, prefix="/api/v1", tags=["upload"])
+app.include_router(batch.router, prefix="/api/v1", tags=["batch"])
 
 @app.get("/")
 async def root():
     return {
-        "message": "AI Chatbot API", 
-        "version": "1.0.0",
+        "message": settings.API_TITLE, 
+        "version": settings.API_VERSION,
         "status": "running"
     }
 
@@ -30,43 +84,22 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
-@app.post("/api/v1/upload")
-async def upload_file(file: UploadFile = File(...), workspace_id: str = "default"):
-    """Simple upload endpoint"""
-    try:
-        # Generate document ID
-        doc_id = str(uuid.uuid4())
-        
-        # Read file
-        content = await file.read()
-        file_size = len(content)
-        
-        # Create workspace directory
-        workspace_dir = os.path.join("uploads", workspace_id)
-        os.makedirs(workspace_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(workspace_dir, f"{doc_id}_{file.filename}")
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        return {
-            "document_id": doc_id,
-            "filename": file.filename,
-            "file_type": file.filename.split('.')[-1],
-            "size": file_size,
-            "status": "uploaded",
-            "uploaded_at": datetime.now().isoformat(),
-            "message": "File uploaded successfully!"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the services are loaded and warmed up"""
+    container = get_container()
+    report = container.startup_report()
+    
+    if container.ready or not settings.WARMUP_ON_STARTUP:
+        return {"status": "ready", **report}
+    
+    return JSONResponse(status_code=503, content={"status": "starting", **report})
+
+@app.get("/services")
+async def services():
+    """Load time and memory of each shared service in this worker"""
+    return get_container().stats()
 
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
-
-@app.get("/health")
-async def health():
-    return {"status": "healthy"}
\ No newline at end of file
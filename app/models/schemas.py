@@ -24,6 +24,21 @@ class UploadResponse(BaseModel):
     size: int
     status: DocumentStatus
     uploaded_at: datetime
+    content_hash: Optional[str] = None
+    deduplicated: bool = False  # Byte-identical to an existing document
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int  # Total bytes
+    workspace_id: str = "default"
+    part_size: Optional[int] = None  # Defaults to RESUMABLE_PART_SIZE
+
+class BatchResponse(BaseModel):
+    batch_id: Optional[str] = None  # None when nothing needed indexing
+    workspace_id: str
+    documents: List[UploadResponse]
+    skipped: List[Dict] = []  # Archive members or files that weren't stored
+    queued: int  # Documents handed to the batch job
 
 class DocumentMetadata(BaseModel):
     document_id: str
@@ -66,4 +81,5 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     sources: List[SearchResult]
-    conversation_id: str
\ No newline at end of file
+    conversation_id: str
+    retrieval: Optional[Dict] = None
\ No newline at end of file
@@ -1,32 +1,179 @@
-from openai import OpenAI
 from app.config import settings
-from app.services.retrieval_service import RetrievalService
-from typing import List, Dict, Optional
+from app.services.retrieval_service import RetrievalService, RetrievalUnavailable
+from app.services.table_store import TableStore
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
 import uuid
 
 class ChatService:
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.retrieval_service = RetrievalService()
+    def __init__(self, retrieval_service: Optional[RetrievalService] = None,
+                 table_store: Optional[TableStore] = None):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.retrieval_service = retrieval_service or RetrievalService()
+        self.table_store = table_store
         self.conversations = {}  # In-memory (use DB in production)
     
-    def chat(self, message: str, workspace_id: str, 
-             conversation_id: Optional[str] = None,
-             filters: Optional[Dict] = None,
-             prompt_template: Optional[str] = None) -> Dict:
+    async def chat(self, message: str, workspace_id: str, 
+                   conversation_id: Optional[str] = None,
+                   filters: Optional[Dict] = None,
+                   prompt_template: Optional[str] = None) -> Dict:
         """Chat with RAG"""
         
+        conversation_id, retrieval = await self._retrieve(
+            message, workspace_id, conversation_id, filters
+        )
+        messages = self._build_messages(
+            message, conversation_id, retrieval['results'], prompt_template
+        )
+        
+        # Call LLM
+        response = await self.client.chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=messages,
+            temperature=settings.LLM_TEMPERATURE
+        )
+        
+        assistant_message = response.choices[0].message.content
+        self._remember(conversation_id, message, assistant_message)
+        
+        return {
+            "response": assistant_message,
+            "sources": self._format_sources(retrieval['results']),
+            "conversation_id": conversation_id,
+            "retrieval": retrieval['retrieval']
+        }
+    
+    async def chat_stream(self, message: str, workspace_id: str,
+                          conversation_id: Optional[str] = None,
+                          filters: Optional[Dict] = None,
+                          prompt_template: Optional[str] = None
+                          ) -> AsyncIterator[Dict]:
+        """Chat with RAG, yielding events as they become available
+        
+        Emits one 'sources' event as soon as retrieval finishes, a 'token'
+        event per streamed completion delta and a final 'done' event.
+        """
+        
+        conversation_id, retrieval = await self._retrieve(
+            message, workspace_id, conversation_id, filters
+        )
+        
+        yield {
+            "event": "sources",
+            "data": {
+                "conversation_id": conversation_id,
+                "sources": self._format_sources(retrieval['results']),
+                "retrieval": retrieval['retrieval']
+            }
+        }
+        
+        messages = self._build_messages(
+            message, conversation_id, retrieval['results'], prompt_template
+        )
+        
+        stream = await self.client.chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=messages,
+            temperature=settings.LLM_TEMPERATURE,
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                yield {"event": "token", "data": {"content": token}}
+        
+        self._remember(conversation_id, message, "".join(parts))
+        
+        yield {"event": "done", "data": {"conversation_id": conversation_id}}
+    
+    async def _retrieve(self, message: str, workspace_id: str,
+                        conversation_id: Optional[str],
+                        filters: Optional[Dict]) -> Tuple[str, Dict]:
+        """Create or get the conversation and retrieve context off the event loop
+        
+        Aggregate questions over a named table column are answered from the
+        table store alone; a row lookup's table result is put ahead of the
+        normal text results.
+        """
+        
         # Create or get conversation
         if not conversation_id:
             conversation_id = str(uuid.uuid4())
             self.conversations[conversation_id] = []
         
-        # Retrieve relevant context
-        search_results = self.retrieval_service.hybrid_search(
-            query=message,
-            workspace_id=workspace_id,
-            filters=filters
-        )
+        answer = None
+        if self.table_store is not None:
+            try:
+                answer = await asyncio.to_thread(
+                    self.table_store.query, message, workspace_id, filters
+                )
+            except Exception as e:
+                print(f"Table query failed, using text retrieval: {str(e)}")
+            
+            if answer is not None and answer['confident']:
+                return conversation_id, self._table_retrieval(answer)
+        
+        # Embedding, Chroma and Whoosh are blocking; run them in a worker thread
+        try:
+            retrieval = await asyncio.to_thread(
+                self.retrieval_service.hybrid_search_detailed,
+                query=message,
+                workspace_id=workspace_id,
+                filters=filters
+            )
+        except RetrievalUnavailable:
+            if answer is None:
+                raise
+            return conversation_id, self._table_retrieval(answer)
+        
+        if answer is not None:
+            table = self._table_retrieval(answer)
+            retrieval['results'] = table['results'] + retrieval['results']
+            retrieval['retrieval']['table'] = table['retrieval']['table']
+        
+        return conversation_id, retrieval
+    
+    def _table_retrieval(self, answer: Dict) -> Dict:
+        """Shape a table query result like hybrid_search_detailed output"""
+        metadata = {
+            'document_id': answer['document_id'],
+            'filename': answer['filename'],
+            'table': answer['name'],
+            'source': 'table'
+        }
+        if answer['page'] is not None:
+            metadata['page'] = answer['page']
+        
+        return {
+            'results': [{
+                'chunk_id': answer['table_id'],
+                'document_id': answer['document_id'],
+                'content': self.table_store.describe(answer),
+                'score': 1.0,
+                'metadata': metadata
+            }],
+            'retrieval': {
+                'mode': 'table',
+                'table': {
+                    key: answer[key] for key in
+                    ('table_id', 'operation', 'column', 'group_by', 'filters',
+                     'matched_rows', 'total_rows')
+                },
+                'seconds': answer['seconds']
+            }
+        }
+    
+    def _build_messages(self, message: str, conversation_id: str,
+                        search_results: List[Dict],
+                        prompt_template: Optional[str] = None) -> List[Dict]:
+        """Build the OpenAI message list from history and retrieved context"""
         
         # Build context
         context = self._build_context(search_results)
@@ -50,28 +197,28 @@ class ChatService:
         # Add current query
         messages.append({"role": "user", "content": user_prompt})
         
-        # Call LLM
-        response = self.client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=messages,
-            temperature=settings.LLM_TEMPERATURE
-        )
-        
-        assistant_message = response.choices[0].message.content
-        
-        # Update conversation history
-        self.conversations[conversation_id].append(
-            {"role": "user", "content": message}
-        )
-        self.conversations[conversation_id].append(
-            {"role": "assistant", "content": assistant_message}
-        )
-        
-        return {
-            "response": assistant_message,
-            "sources": search_results,
-            "conversation_id": conversation_id
-        }
+        return messages
+    
+    def _remember(self, conversation_id: str, message: str,
+                  assistant_message: str):
+        """Update conversation history"""
+        history = self.conversations.setdefault(conversation_id, [])
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": assistant_message})
+    
+    def _format_sources(self, search_results: List[Dict]) -> List[Dict]:
+        """Shape search results like SearchResult (semantic hits keep
+        document_id only in their metadata)"""
+        return [
+            {
+                "chunk_id": r['chunk_id'],
+                "document_id": r.get('document_id') or r['metadata'].get('document_id', ''),
+                "content": r['content'],
+                "score": r['score'],
+                "metadata": r['metadata']
+            }
+            for r in search_results
+        ]
     
     def _build_context(self, search_results: List[Dict]) -> str:
         """Format search results into context"""
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import psutil
+
+from app.config import settings
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_store import VectorStore
+from app.services.keyword_search import KeywordSearchService
+from app.services.retrieval_service import RetrievalService
+from app.services.chat_service import ChatService
+from app.services.file_processor import FileProcessor
+from app.services.job_queue import JobQueue
+from app.services.document_registry import DocumentRegistry
+from app.services.upload_sessions import UploadSessionStore
+from app.services.table_store import TableStore
+from app.services.near_duplicates import NearDuplicateIndex
+from app.utils.text_utils import TextChunker
+
+
+class ServiceContainer:
+    """Owns the heavy services so each one is built once per process"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._services: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._process = psutil.Process(os.getpid())
+        self._ready = threading.Event()
+        self._startup: Dict[str, Any] = {
+            'started_at': None,
+            'finished_at': None,
+            'total_seconds': None,
+            'stages': {},
+            'error': None
+        }
+
+    def _rss(self) -> int:
+        """Resident memory of this process in bytes"""
+        return self._process.memory_info().rss
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the named service, building it on first use"""
+        service = self._services.get(name)
+        if service is not None:
+            return service
+
+        with self._lock:
+            if name not in self._services:
+                rss_before = self._rss()
+                start = time.perf_counter()
+
+                self._services[name] = factory()
+
+                self._stats[name] = {
+                    'load_seconds': round(time.perf_counter() - start, 4),
+                    'memory_bytes': max(0, self._rss() - rss_before)
+                }
+
+        return self._services[name]
+
+    # Dependencies are resolved before calling _get so that each
+    # component's load time and memory only cover its own construction.
+
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        return self._get('embedding_service', EmbeddingService)
+
+    @property
+    def vector_store(self) -> VectorStore:
+        return self._get('vector_store', VectorStore)
+
+    @property
+    def keyword_search(self) -> KeywordSearchService:
+        return self._get('keyword_search', KeywordSearchService)
+
+    @property
+    def file_processor(self) -> FileProcessor:
+        return self._get('file_processor', FileProcessor)
+
+    @property
+    def text_chunker(self) -> TextChunker:
+        return self._get('text_chunker', TextChunker)
+
+    @property
+    def job_queue(self) -> JobQueue:
+        return self._get('job_queue', JobQueue)
+
+    @property
+    def document_registry(self) -> DocumentRegistry:
+        return self._get('document_registry', DocumentRegistry)
+
+    @property
+    def upload_sessions(self) -> UploadSessionStore:
+        return self._get('upload_sessions', UploadSessionStore)
+
+    @property
+    def table_store(self) -> TableStore:
+        return self._get('table_store', TableStore)
+
+    @property
+    def near_duplicates(self) -> NearDuplicateIndex:
+        return self._get('near_duplicates', NearDuplicateIndex)
+
+    @property
+    def retrieval_service(self) -> RetrievalService:
+        deps = {
+            'vector_store': self.vector_store,
+            'keyword_search': self.keyword_search,
+            'embedding_service': self.embedding_service,
+            'near_duplicates': self.near_duplicates if settings.DEDUP_ENABLED else None
+        }
+        return self._get('retrieval_service', lambda: RetrievalService(**deps))
+
+    @property
+    def chat_service(self) -> ChatService:
+        retrieval_service = self.retrieval_service
+        table_store = self.table_store if settings.TABLE_STORE_ENABLED else None
+        return self._get(
+            'chat_service',
+            lambda: ChatService(retrieval_service=retrieval_service,
+                                table_store=table_store)
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def warm_up(self):
+        """Load every heavy service and pre-warm it, then mark the process ready"""
+        stages = [
+            ('embedding_model', lambda: self.embedding_service.warm_up()),
+            ('vector_store', lambda: self.vector_store.reload_workspaces()),
+            ('keyword_index', lambda: self.keyword_search.get_or_create_index()),
+            ('retrieval_service', lambda: self.retrieval_service),
+            ('chat_service', lambda: self.chat_service),
+            ('file_processor', lambda: self.file_processor),
+        ]
+
+        self._startup['started_at'] = datetime.now().isoformat()
+        total_start = time.perf_counter()
+
+        try:
+            for name, stage in stages:
+                start = time.perf_counter()
+                stage()
+                self._startup['stages'][name] = round(time.perf_counter() - start, 4)
+        except Exception as e:
+            self._startup['error'] = f"{name}: {str(e)}"
+            print(f"Warm-up failed at {name}: {str(e)}")
+            return
+
+        self._startup['total_seconds'] = round(time.perf_counter() - total_start, 4)
+        self._startup['finished_at'] = datetime.now().isoformat()
+        self._ready.set()
+
+    def startup_report(self) -> Dict:
+        """Readiness flag and how long each warm-up stage took"""
+        return {
+            'ready': self.ready,
+            **self._startup,
+            'stages': dict(self._startup['stages'])
+        }
+
+    def close(self):
+        """Flush buffered writes and stop background threads"""
+        keyword_search = self._services.get('keyword_search')
+        if keyword_search is not None:
+            keyword_search.close()
+
+        embedding_service = self._services.get('embedding_service')
+        if embedding_service is not None and embedding_service.batcher is not None:
+            embedding_service.batcher.close()
+
+        file_processor = self._services.get('file_processor')
+        if file_processor is not None:
+            file_processor.close()
+
+        retrieval_service = self._services.get('retrieval_service')
+        if retrieval_service is not None:
+            retrieval_service.close()
+
+    def stats(self) -> Dict:
+        """Per-component load time and memory, plus current process RSS"""
+        with self._lock:
+            components = {name: dict(stat) for name, stat in self._stats.items()}
+            services = dict(self._services)
+
+        for name, service in services.items():
+            if hasattr(service, 'stats'):
+                components[name].update(service.stats())
+
+        return {
+            'pid': self._process.pid,
+            'rss_bytes': self._rss(),
+            'components': components,
+            'startup': self.startup_report()
+        }
+
+
+_container: Optional[ServiceContainer] = None
+_container_lock = threading.Lock()
+
+
+def get_container() -> ServiceContainer:
+    """Return the process-wide service container"""
+    global _container
+
+    if _container is None:
+        with _container_lock:
+            if _container is None:
+                _container = ServiceContainer()
+
+    return _container
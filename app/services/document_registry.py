@@ -0,0 +1,119 @@
+from app.config import settings
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    workspace_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    file_path TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    upload_count INTEGER NOT NULL DEFAULT 1,
+    last_uploaded_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_hash ON documents (workspace_id, content_hash);
+"""
+
+class DocumentRegistry:
+    """Per-workspace record of stored documents, keyed by content hash
+    
+    Lets upload return the existing document_id for byte-identical files
+    instead of storing and indexing them again. upload_count tracks how
+    many times each document was uploaded, which gives the dedup counts.
+    """
+    
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.REGISTRY_DB_PATH
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def find_by_hash(self, workspace_id: str, content_hash: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM documents WHERE workspace_id = ? AND content_hash = ?",
+                (workspace_id, content_hash)
+            ).fetchone()
+        return dict(row) if row else None
+    
+    def register(self, workspace_id: str, document_id: str, content_hash: str,
+                 filename: str, file_type: str, size: int, file_path: str) -> Dict:
+        """Record a new document and return the canonical entry
+        
+        If a concurrent upload of the same bytes registered first, that
+        entry is returned (with its upload count bumped) and the caller
+        should discard its own copy.
+        """
+        now = time.time()
+        
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO documents (document_id, workspace_id, "
+                "content_hash, filename, file_type, size, file_path, uploaded_at, "
+                "last_uploaded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (document_id, workspace_id, content_hash, filename, str(file_type),
+                 size, file_path, now, now)
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    "UPDATE documents SET upload_count = upload_count + 1, "
+                    "last_uploaded_at = ? WHERE workspace_id = ? AND content_hash = ?",
+                    (now, workspace_id, content_hash)
+                )
+            row = conn.execute(
+                "SELECT * FROM documents WHERE workspace_id = ? AND content_hash = ?",
+                (workspace_id, content_hash)
+            ).fetchone()
+            conn.execute("COMMIT")
+        
+        return dict(row)
+    
+    def record_duplicate(self, document_id: str):
+        """Count another upload of an existing document"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE documents SET upload_count = upload_count + 1, "
+                "last_uploaded_at = ? WHERE document_id = ?",
+                (time.time(), document_id)
+            )
+    
+    def list_documents(self, workspace_id: str) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM documents WHERE workspace_id = ? ORDER BY uploaded_at",
+                (workspace_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def workspace_stats(self, workspace_id: str) -> Dict:
+        """Dedup counts for a workspace"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS documents, "
+                "COALESCE(SUM(upload_count), 0) AS uploads, "
+                "COALESCE(SUM(upload_count - 1), 0) AS duplicates, "
+                "COALESCE(SUM((upload_count - 1) * size), 0) AS bytes_saved "
+                "FROM documents WHERE workspace_id = ?",
+                (workspace_id,)
+            ).fetchone()
+        return dict(row)
@@ -0,0 +1,118 @@
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+import queue
+import threading
+import time
+
+import numpy as np
+
+from app.utils.metrics import Histogram
+
+
+class EmbeddingBatcher:
+    """Collects concurrent single-text encode requests into batched model calls
+
+    Callers get a Future back from submit(). A dispatcher thread waits up to
+    max_wait_ms after the first queued request (or until max_batch_size
+    requests are queued), runs one batched encode and resolves each future
+    with its own row.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()  # No request queued behind the sentinel
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._thread.start()
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100, 250])
+        self.encode_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 250, 500, 1000])
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for the next batch (encoded right away once closed)"""
+        future = Future()
+        with self._close_lock:
+            if not self._closed:
+                self._queue.put((text, future, time.perf_counter()))
+                return future
+
+        # The dispatcher has stopped; nobody would resolve a queued future
+        try:
+            future.set_result(self.encode([text])[0].copy())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        """Stop the dispatcher thread once the queue is drained"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first) -> List:
+        """Gather requests until the batch is full or the first one has waited long enough"""
+        batch = [first]
+        deadline = first[2] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item is None:
+                # Re-queue the sentinel so the run loop sees it after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            started = time.perf_counter()
+
+            for _, _, enqueued_at in batch:
+                self.queue_wait_ms.observe((started - enqueued_at) * 1000)
+            self.batch_sizes.observe(len(batch))
+
+            try:
+                embeddings = self.encode([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self.encode_ms.observe((time.perf_counter() - started) * 1000)
+
+            # Copy each row so a cached query vector doesn't pin the whole batch
+            for row, (_, future, _) in zip(embeddings, batch):
+                future.set_result(row.copy())
+
+    def stats(self) -> Dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued': self._queue.qsize(),
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+            'encode_ms': self.encode_ms.snapshot()
+        }
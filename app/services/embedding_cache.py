@@ -0,0 +1,182 @@
+from app.config import settings
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model TEXT PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    seconds_per_text REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    slot INTEGER NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+"""
+
+LOOKUP_BATCH = 500  # Hashes per IN (...) query, under SQLite's variable limit
+
+class EmbeddingCache:
+    """Chunk embeddings on disk, keyed by (model, SHA-256 of the text)
+    
+    Vectors are float32 rows appended to one raw file per model and read
+    back through a memory map; index.db maps each text hash to its row.
+    Appends from every ingestion process are serialized by BEGIN
+    IMMEDIATE, and rows are written before the index entries that point at
+    them are committed, so readers never see a half-written vector.
+    Entries are never evicted: identical text always has the same
+    embedding, so the file only grows with genuinely new text.
+    """
+    
+    def __init__(self, model_name: str, dim: int, directory: str = None):
+        self.directory = directory or settings.EMBEDDING_CACHE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        
+        self.model = f"{model_name}:{dim}"
+        self.dim = dim
+        self.db_path = os.path.join(self.directory, "index.db")
+        self.vectors_path = os.path.join(
+            self.directory, f"{hashlib.sha256(self.model.encode()).hexdigest()[:16]}.f32"
+        )
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO models (model, dim) VALUES (?, ?)",
+                         (self.model, dim))
+        
+        self._map: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.seconds_per_text = 0.0  # As of the last lookup
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(text.encode('utf-8')).digest()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Cached embeddings for whichever keys have one (copied out of the map)"""
+        slots = {}
+        unique = list(dict.fromkeys(keys))
+        
+        with self._connect() as conn:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                batch = unique[start:start + LOOKUP_BATCH]
+                slots.update(conn.execute(
+                    "SELECT text_hash, slot FROM embeddings WHERE model = ? AND text_hash IN "
+                    f"({','.join('?' * len(batch))})",
+                    [self.model, *batch]
+                ).fetchall())
+            seconds_per_text = conn.execute(
+                "SELECT seconds_per_text FROM models WHERE model = ?", (self.model,)
+            ).fetchone()[0]
+        
+        found = {}
+        if slots:
+            vectors = self._vectors(max(slots.values()) + 1)
+            found = {key: np.array(vectors[slot]) for key, slot in slots.items()}
+        
+        hits = sum(1 for key in keys if key in found)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+            self.seconds_saved += hits * seconds_per_text
+            self.seconds_per_text = seconds_per_text
+        
+        return found
+    
+    def put_many(self, keys: List[bytes], embeddings: np.ndarray, seconds: float):
+        """Append new embeddings; seconds is what encoding them took, kept
+        as a running per-text average to estimate the time hits save"""
+        if not keys:
+            return
+        
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have embedded the same text meanwhile
+                present = set()
+                for start in range(0, len(keys), LOOKUP_BATCH):
+                    batch = keys[start:start + LOOKUP_BATCH]
+                    present.update(row[0] for row in conn.execute(
+                        "SELECT text_hash FROM embeddings WHERE model = ? AND text_hash IN "
+                        f"({','.join('?' * len(batch))})",
+                        [self.model, *batch]
+                    ))
+                new = [i for i, key in enumerate(keys) if key not in present]
+                
+                rows, seconds_per_text = conn.execute(
+                    "SELECT rows, seconds_per_text FROM models WHERE model = ?", (self.model,)
+                ).fetchone()
+                
+                if new:
+                    with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'wb') as f:
+                        f.seek(rows * self.dim * 4)
+                        f.write(embeddings[new].tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                    
+                    conn.executemany(
+                        "INSERT INTO embeddings (model, text_hash, slot) VALUES (?, ?, ?)",
+                        [(self.model, keys[i], rows + n) for n, i in enumerate(new)]
+                    )
+                
+                measured = seconds / len(keys)
+                seconds_per_text = measured if not seconds_per_text else \
+                    0.9 * seconds_per_text + 0.1 * measured
+                
+                conn.execute(
+                    "UPDATE models SET rows = ?, seconds_per_text = ? WHERE model = ?",
+                    (rows + len(new), seconds_per_text, self.model)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT rows FROM models WHERE model = ?", (self.model,)
+            ).fetchone()[0]
+        
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': rows,
+                'bytes': rows * self.dim * 4,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'embed_seconds_saved': round(self.seconds_saved, 4)
+            }
+    
+    def _vectors(self, rows: int) -> np.memmap:
+        """The vectors file mapped with at least this many rows, remapped
+        when other processes have appended past the current map"""
+        with self._lock:
+            if self._map is None or len(self._map) < rows:
+                available = os.path.getsize(self.vectors_path) // (self.dim * 4)
+                self._map = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                      shape=(available, self.dim))
+            return self._map
@@ -1,30 +1,154 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Dict, Tuple
 import numpy as np
+import time
+import unicodedata
 from app.config import settings
+from app.utils.cache import LRUCache
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
 
 class EmbeddingService:
     def __init__(self):
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = settings.EMBEDDING_MODEL
+        self.model = SentenceTransformer(self.model_name)
+        
+        # Query embeddings keyed by (model, normalized text)
+        self.query_cache = LRUCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=settings.QUERY_EMBEDDING_CACHE_TTL
+        )
+        
+        # Concurrent query encodes are coalesced into batched model calls
+        self.batcher = None
+        if settings.EMBEDDING_BATCHING:
+            self.batcher = EmbeddingBatcher(
+                self._encode_queries,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+            )
+        
+        # Chunk embeddings on disk keyed by (model, text hash), shared by
+        # every ingestion process
+        self.chunk_cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.chunk_cache = EmbeddingCache(
+                self.model_name, self.model.get_sentence_embedding_dimension()
+            )
     
-    def embed_text(self, text: str) -> List[float]:
-        """Generate embedding for a single text"""
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+    def warm_up(self):
+        """Run a dummy encode so the first real query doesn't pay for it"""
+        self.model.encode("warm up", convert_to_numpy=True)
     
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
+    def embed_text(self, text: str) -> np.ndarray:
+        """Generate a normalized float32 embedding for a single text
+        
+        The cache key is the NFC/whitespace-normalized text, but the text is
+        encoded as given, so a cache hit or miss never changes what a query
+        embeds to on first use.
+        """
+        key = (self.model_name, self._normalize_query(text))
+        
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            if self.batcher is not None:
+                embedding = self.batcher.submit(text).result()
+            else:
+                embedding = self._encode_queries([text])[0]
+            embedding.setflags(write=False)
+            self.query_cache.put(key, embedding)
+        
+        return embedding
+    
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate normalized float32 embeddings for multiple texts
+        
+        Texts are encoded in length order so each batch pads to similar
+        lengths, and rows are written straight into one contiguous
+        (len(texts), dim) array in the caller's order.
+        """
+        dim = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        if not texts:
+            return embeddings
+        
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            embeddings[idx] = self.model.encode(
+                [texts[i] for i in idx],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        
+        return embeddings
+    
+    def embed_chunks(self, texts: List[str]) -> Tuple[np.ndarray, Dict]:
+        """embed_batch through the chunk embedding cache
+        
+        Only texts missing from the cache (each distinct one once) are
+        encoded, and they're added to it. Returns the embeddings plus this
+        call's hits, misses and the estimated encode seconds saved.
+        """
+        if self.chunk_cache is None:
+            return self.embed_batch(texts), {'hits': 0, 'misses': len(texts), 'seconds_saved': 0.0}
+        
+        keys = [self.chunk_cache.key(text) for text in texts]
+        cached = self.chunk_cache.get_many(keys)
+        
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in cached:
+                missing.setdefault(key, i)
+        
+        dim = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        
+        if missing:
+            start = time.perf_counter()
+            encoded = self.embed_batch([texts[i] for i in missing.values()])
+            self.chunk_cache.put_many(list(missing), encoded, time.perf_counter() - start)
+            cached.update(zip(missing, encoded))
+        
+        for i, key in enumerate(keys):
+            embeddings[i] = cached[key]
+        
+        hits = len(texts) - sum(1 for key in keys if key in missing)
+        return embeddings, {
+            'hits': hits,
+            'misses': len(texts) - hits,
+            'seconds_saved': hits * self.chunk_cache.seconds_per_text
+        }
+    
+    def similarity(self, embedding1: np.ndarray, 
+                   embedding2: np.ndarray) -> float:
+        """Cosine similarity; embeddings are unit length so it's a dot product"""
+        return float(np.dot(embedding1, embedding2))
+    
+    def stats(self) -> Dict:
+        """Query/chunk cache counters and batching histograms"""
+        return {
+            'query_cache': self.query_cache.stats(),
+            'chunk_cache': self.chunk_cache.stats() if self.chunk_cache else None,
+            'batcher': self.batcher.stats() if self.batcher else None
+        }
+    
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of queries in one model call"""
         embeddings = self.model.encode(
             texts,
+            batch_size=len(texts),
             convert_to_numpy=True,
-            show_progress_bar=True
+            normalize_embeddings=True
         )
-        return embeddings.tolist()
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
     
-    def similarity(self, embedding1: List[float], 
-                   embedding2: List[float]) -> float:
-        """Calculate cosine similarity between two embeddings"""
-        vec1 = np.array(embedding1)
-        vec2 = np.array(embedding2)
-        
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
\ No newline at end of file
+    def _normalize_query(self, text: str) -> str:
+        """Normalize unicode and whitespace so trivial variants share a cache entry"""
+        text = unicodedata.normalize('NFC', text)
+        return " ".join(text.split())
@@ -0,0 +1,199 @@
+from app.config import settings
+from typing import Any, Dict, Iterator, Optional
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+# Bump when extractor output changes so stale entries stop matching
+EXTRACTOR_VERSION = 5
+
+# Settings that change what extraction produces
+FINGERPRINT_SETTINGS = [
+    'TESSERACT_CONFIG', 'OCR_LANGUAGES', 'OCR_DPI', 'OCR_ADAPTIVE',
+    'OCR_PREVIEW_DPI', 'OCR_TARGET_LINE_PX', 'OCR_MIN_DPI', 'OCR_MAX_DPI',
+    'OCR_MAX_PIXELS', 'OCR_DETECT_SCRIPT', 'OCR_SCRIPT_LANGUAGES',
+    'OCR_MIN_PAGE_CHARS', 'PDF_TABLE_MIN_RECTS', 'PDF_TABLE_MIN_LINES',
+    'TABLE_READ_ROWS'
+]
+
+# Metadata that belongs to the upload, not to the bytes; never cached
+DOCUMENT_FIELDS = ('document_id', 'filename')
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """On-disk cache of FileProcessor output keyed by file content
+    
+    Keys are SHA-256(file bytes) plus a fingerprint of the extractor
+    version and OCR settings, so the same bytes uploaded again (or to
+    another workspace) skip extraction entirely. Entries are gzip'd JSON
+    lines (a metadata header, one line per section, then a trailer with
+    the final metadata and tables), written and read as a stream so a
+    document never has to fit in memory. A hit touches the file's mtime
+    and the oldest entries are evicted once the cache grows past
+    EXTRACTION_CACHE_MAX_BYTES.
+    """
+    
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or settings.EXTRACTION_CACHE_DIR
+        self.max_bytes = settings.EXTRACTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        fingerprint = json.dumps(
+            {'version': EXTRACTOR_VERSION,
+             **{name: getattr(settings, name) for name in FINGERPRINT_SETTINGS}},
+            sort_keys=True
+        )
+        self.fingerprint = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+    
+    def key_for(self, file_path: str, file_type: str) -> str:
+        """Cache key for a file processed as the given type"""
+        return f"{file_sha256(file_path)}-{file_type}-{self.fingerprint}"
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached extraction as {'metadata', 'sections', 'tables'}, or None
+        
+        sections is a generator over the entry; metadata and tables are
+        completed from the trailer once it's exhausted.
+        """
+        path = self._path(key)
+        
+        try:
+            f = gzip.open(path, 'rt', encoding='utf-8')
+            header = json.loads(f.readline())
+            os.utime(path)  # LRU: mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.hits += 1
+        
+        extraction = {'metadata': header['metadata'], 'tables': []}
+        extraction['sections'] = self._read_sections(path, f, extraction)
+        return extraction
+    
+    def put(self, key: str, extraction: Dict[str, Any]) -> Dict[str, Any]:
+        """Wrap an extraction so its sections are written to the cache as
+        they're consumed; the entry only appears once all were read"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        sections = extraction['sections']
+        
+        def tee() -> Iterator[Dict]:
+            # Write to a temp file and rename so readers never see a partial entry
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+                    self._write_line(f, {'metadata': self._portable(extraction['metadata'])})
+                    for section in sections:
+                        self._write_line(f, {'section': section})
+                        yield section
+                    self._write_line(f, {'trailer': {
+                        'metadata': self._portable(extraction['metadata']),
+                        'tables': extraction['tables']
+                    }})
+                os.replace(temp_path, path)
+            except BaseException:
+                # Failed or abandoned part way through: cache nothing
+                try:
+                    os.remove(temp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+            
+            with self._lock:
+                self.writes += 1
+            
+            self._evict()
+        
+        return {**extraction, 'sections': tee()}
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jsonl.gz")
+    
+    def _portable(self, metadata: Dict) -> Dict:
+        return {k: v for k, v in metadata.items() if k not in DOCUMENT_FIELDS}
+    
+    def _write_line(self, f, record: Dict):
+        f.write(json.dumps(record, default=str))
+        f.write("\n")
+    
+    def _read_sections(self, path: str, f, extraction: Dict) -> Iterator[Dict]:
+        """Yield the cached sections, then fill in the trailer"""
+        with f:
+            try:
+                for line in f:
+                    record = json.loads(line)
+                    if 'section' in record:
+                        yield record['section']
+                    else:
+                        extraction['metadata'].update(record['trailer']['metadata'])
+                        extraction['tables'].extend(record['trailer']['tables'])
+                        return
+                raise ValueError("Cache entry has no trailer")
+            except (OSError, ValueError):
+                # Corrupt entry: drop it so the retry extracts from scratch
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                raise
+    
+    def _evict(self):
+        """Remove least recently used entries until under the size limit"""
+        entries = []
+        total = 0
+        
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith('.jsonl.gz'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        
+        if total <= self.max_bytes:
+            return
+        
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Evicted by another process
+            
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            if total <= self.max_bytes:
+                break
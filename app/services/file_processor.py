@@ -1,19 +1,88 @@
-import PyPDF2
-import pdfplumber
-import pandas as pd
-import docx
-from langdetect import detect
 from app.services.ocr_service import OCRService
+from app.services.extraction_cache import ExtractionCache
+from app.services.pdf_extractor import extract_pdf_pages
 from app.models.schemas import FileType, DocumentMetadata
-from typing import Dict, Any
+from app.config import settings
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List
+import csv
+import io
+import multiprocessing
 import os
+import threading
+
+SECTION_CHARS = 64 * 1024  # Plain text / DOCX paragraphs grouped per section
+LANGUAGE_SAMPLE_CHARS = 1000
 
 class FileProcessor:
     def __init__(self):
-        self.ocr_service = OCRService()
+        self.cache = ExtractionCache() if settings.EXTRACTION_CACHE_ENABLED else None
+        
+        # PDF text extraction and OCR share one pool, so together they
+        # never run more than EXTRACT_WORKERS processes
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.ocr_service = OCRService(pool=self._get_pool)
     
-    def process_file(self, file_path: str, file_type: FileType, 
-                     doc_id: str, filename: str) -> Dict[str, Any]:
+    def extract(self, file_path: str, file_type: FileType,
+                doc_id: str, filename: str) -> Dict[str, Any]:
+        """Start extracting a file as a stream of sections
+        
+        Returns {'metadata', 'sections', 'tables', 'cache_hit'}. sections is
+        a generator of {'text', 'page'} dicts (page is None for formats
+        without pages) produced while the file is read, so the whole
+        document is never held as one string. CSV/Excel sections are blocks
+        of rows rendered as CSV, with a 'header' (file, sheet and column
+        names) that the chunker repeats at the top of every chunk, plus the
+        'columns' (and, for Excel, the sheet as 'table') for the table
+        store. metadata and tables are only complete once sections is
+        exhausted. Identical bytes are replayed from the extraction cache.
+        """
+        extraction = None
+        
+        if self.cache is not None:
+            key = self.cache.key_for(file_path, file_type)
+            extraction = self.cache.get(key)
+        
+        cache_hit = extraction is not None
+        if not cache_hit:
+            extraction = self._extract(file_path, file_type, doc_id, filename)
+            if self.cache is not None:
+                extraction = self.cache.put(key, extraction)
+        
+        # Cached under whichever upload produced it first
+        extraction['metadata'].update(document_id=doc_id, filename=filename)
+        extraction['sections'] = self._with_language(
+            extraction['metadata'], extraction['sections']
+        )
+        extraction['cache_hit'] = cache_hit
+        return extraction
+    
+    def stats(self) -> Dict:
+        """Extraction cache counters"""
+        return {'extraction_cache': self.cache.stats() if self.cache else None}
+    
+    def close(self):
+        """Shut down the extraction process pool"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self.ocr_service.close()
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Process pool for PDF text/table extraction and OCR, created on first PDF"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=settings.pool_workers(settings.EXTRACT_WORKERS),
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+    
+    def _extract(self, file_path: str, file_type: FileType, 
+                 doc_id: str, filename: str) -> Dict[str, Any]:
         """Main processing dispatcher"""
         
         if file_type == FileType.PDF:
@@ -33,179 +102,367 @@ class FileProcessor:
     
     def _process_pdf(self, file_path: str, doc_id: str, 
                      filename: str) -> Dict[str, Any]:
-        """Process PDF - try direct extraction, fall back to OCR"""
+        """Process PDF - direct extraction for pages with a text layer,
+        OCR for image-only pages"""
         
-        # Try direct extraction first
-        text = ""
-        tables = []
+        # Cheap up-front classification from page resources
+        needs_ocr = self.ocr_service.classify_pdf_pages(file_path)
         
-        with pdfplumber.open(file_path) as pdf:
-            page_count = len(pdf.pages)
-            
-            for page in pdf.pages:
-                # Extract text
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-                
-                # Extract tables
-                page_tables = page.extract_tables()
-                if page_tables:
-                    for table in page_tables:
-                        df = pd.DataFrame(table[1:], columns=table[0])
-                        tables.append({
-                            'page': page.page_number,
-                            'data': df.to_dict('records')
-                        })
-        
-        # If little text extracted, it's likely scanned
-        if len(text.strip()) < 100:
-            text = self.ocr_service.extract_from_pdf(file_path)
-            page_count = text.count("--- Page")
-        
-        # Detect language
-        language = self._detect_language(text)
+        metadata = {
+            'document_id': doc_id,
+            'filename': filename,
+            'file_type': FileType.PDF,
+            'page_count': len(needs_ocr),
+            # Comma-separated: Chroma metadata values must be scalars
+            'ocr_pages': "",
+            'ocr_page_count': 0
+        }
+        tables = []
         
         return {
-            'content': text,
+            'metadata': metadata,
             'tables': tables,
-            'metadata': {
-                'document_id': doc_id,
-                'filename': filename,
-                'file_type': FileType.PDF,
-                'language': language,
-                'page_count': page_count
-            }
+            'sections': self._pdf_pages(file_path, needs_ocr, metadata, tables)
         }
     
+    def _pdf_pages(self, file_path: str, needs_ocr: List[bool],
+                   metadata: Dict, tables: List[Dict]) -> Iterator[Dict]:
+        """Yield PDF pages in order
+        
+        Text-layer pages are extracted PDF_PAGES_PER_TASK at a time (at most
+        PDF_TASK_WINDOW tasks ahead of the consumer), and image-only pages
+        are OCR'd at the same time (at most OCR_PAGE_WINDOW ahead), all in
+        the one extraction pool. Text-layer pages that turn out to need OCR
+        are submitted as soon as their task comes back.
+        """
+        text_pages = [i + 1 for i, flag in enumerate(needs_ocr) if not flag]
+        tasks = iter([
+            text_pages[i:i + settings.PDF_PAGES_PER_TASK]
+            for i in range(0, len(text_pages), settings.PDF_PAGES_PER_TASK)
+        ])
+        in_flight = deque()
+        
+        def top_up():
+            while len(in_flight) < settings.PDF_TASK_WINDOW:
+                pages = next(tasks, None)
+                if pages is None:
+                    return
+                in_flight.append(self._get_pool().submit(extract_pdf_pages, file_path, pages))
+        
+        scanned = deque(i + 1 for i, flag in enumerate(needs_ocr) if flag)
+        ocr_futures: Dict[int, Future] = {}
+        
+        def top_up_ocr():
+            while scanned and len(ocr_futures) < self.ocr_service.window:
+                page = scanned.popleft()
+                ocr_futures[page] = self.ocr_service.submit_pdf_page(file_path, page)
+        
+        def ocr_text(number: int) -> str:
+            future = ocr_futures.pop(number, None) or \
+                self.ocr_service.submit_pdf_page(file_path, number)
+            text = self.ocr_service.page_result(file_path, number, future)
+            top_up_ocr()
+            return text
+        
+        ocr_pages = []
+        extracted: Dict[int, Dict] = {}
+        
+        try:
+            top_up()
+            top_up_ocr()
+            
+            for number in range(1, len(needs_ocr) + 1):
+                ocr = needs_ocr[number - 1]
+                
+                if ocr:
+                    page_text = ocr_text(number)
+                else:
+                    if number not in extracted:
+                        # Text pages come back in order, one task at a time
+                        extracted = {page['page']: page for page in in_flight.popleft().result()}
+                        top_up()
+                        for page in extracted.values():
+                            if page['needs_ocr']:
+                                ocr_futures[page['page']] = \
+                                    self.ocr_service.submit_pdf_page(file_path, page['page'])
+                    page = extracted.pop(number)
+                    
+                    if page['needs_ocr']:
+                        ocr = True
+                        page_text = ocr_text(number)
+                    else:
+                        page_text = page['text']
+                        tables.extend(page['tables'])
+                
+                if ocr:
+                    ocr_pages.append(number)
+                    metadata['ocr_pages'] = ",".join(str(p) for p in ocr_pages)
+                    metadata['ocr_page_count'] = len(ocr_pages)
+                
+                if page_text.strip():
+                    yield {'text': page_text, 'page': number, 'ocr': ocr}
+        finally:
+            for future in [*in_flight, *ocr_futures.values()]:
+                future.cancel()
+    
     def _process_image(self, file_path: str, doc_id: str, 
                       filename: str) -> Dict[str, Any]:
         """Process image with OCR"""
-        text = self.ocr_service.extract_from_image(file_path)
-        language = self._detect_language(text)
+        
+        def sections():
+            yield {'text': self.ocr_service.extract_from_image(file_path), 'page': None}
         
         return {
-            'content': text,
-            'tables': [],
             'metadata': {
                 'document_id': doc_id,
                 'filename': filename,
-                'file_type': FileType.IMAGE,
-                'language': language
-            }
+                'file_type': FileType.IMAGE
+            },
+            'tables': [],
+            'sections': sections()
         }
     
     def _process_text(self, file_path: str, doc_id: str, 
                      filename: str) -> Dict[str, Any]:
         """Process plain text file"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read()
         
-        language = self._detect_language(text)
+        def sections():
+            with open(file_path, 'r', encoding='utf-8') as f:
+                yield from self._group_lines(f)
         
         return {
-            'content': text,
-            'tables': [],
             'metadata': {
                 'document_id': doc_id,
                 'filename': filename,
-                'file_type': FileType.TEXT,
-                'language': language
-            }
+                'file_type': FileType.TEXT
+            },
+            'tables': [],
+            'sections': sections()
         }
     
     def _process_csv(self, file_path: str, doc_id: str, 
                     filename: str) -> Dict[str, Any]:
-        """Process CSV file"""
-        df = pd.read_csv(file_path)
+        """Process CSV file, TABLE_READ_ROWS rows at a time"""
+        import pandas as pd
         
-        # Convert to text representation
-        text = f"CSV File: {filename}\n\n"
-        text += f"Columns: {', '.join(df.columns.tolist())}\n\n"
-        text += df.to_string(index=False)
+        metadata = {
+            'document_id': doc_id,
+            'filename': filename,
+            'file_type': FileType.CSV,
+            'language': 'en',
+            'row_count': 0,
+            # Comma-separated: Chroma metadata values must be scalars
+            'columns': ""
+        }
+        
+        def sections():
+            columns = None
+            with pd.read_csv(file_path, chunksize=settings.TABLE_READ_ROWS) as reader:
+                for df in reader:
+                    if columns is None:
+                        columns = [str(column) for column in df.columns]
+                        metadata['columns'] = ",".join(columns)
+                        header = f"CSV File: {filename}\n{self._csv_line(columns)}"
+                    
+                    metadata['row_count'] += len(df)
+                    yield {
+                        'text': df.to_csv(index=False, header=False, lineterminator="\n"),
+                        'page': None,
+                        'header': header,
+                        'columns': columns
+                    }
         
         return {
-            'content': text,
-            'tables': [{'data': df.to_dict('records')}],
-            'metadata': {
-                'document_id': doc_id,
-                'filename': filename,
-                'file_type': FileType.CSV,
-                'language': 'en',
-                'row_count': len(df),
-                'columns': df.columns.tolist()
-            }
+            'metadata': metadata,
+            'tables': [],
+            'sections': sections()
         }
     
     def _process_excel(self, file_path: str, doc_id: str, 
                       filename: str) -> Dict[str, Any]:
-        """Process Excel file"""
-        excel_file = pd.ExcelFile(file_path)
+        """Process Excel file in one streaming pass over the workbook"""
         
-        text = f"Excel File: {filename}\n\n"
-        tables = []
+        metadata = {
+            'document_id': doc_id,
+            'filename': filename,
+            'file_type': FileType.EXCEL,
+            'language': 'en',
+            'sheet_count': 0,
+            'row_count': 0
+        }
         
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            text += f"Sheet: {sheet_name}\n"
-            text += f"Columns: {', '.join(df.columns.tolist())}\n"
-            text += df.to_string(index=False) + "\n\n"
-            
-            tables.append({
-                'sheet': sheet_name,
-                'data': df.to_dict('records')
-            })
+        def sections():
+            for sheet_name, rows in self._workbook_sheets(file_path, metadata):
+                yield from self._sheet_sections(filename, sheet_name, rows, metadata)
         
         return {
-            'content': text,
-            'tables': tables,
-            'metadata': {
-                'document_id': doc_id,
-                'filename': filename,
-                'file_type': FileType.EXCEL,
-                'language': 'en',
-                'sheet_count': len(excel_file.sheet_names)
-            }
+            'metadata': metadata,
+            'tables': [],
+            'sections': sections()
         }
     
+    def _workbook_sheets(self, file_path: str, metadata: Dict) -> Iterator[tuple]:
+        """(sheet name, row tuples) for every sheet
+        
+        .xlsx is opened once in openpyxl's read-only mode, which parses each
+        sheet's XML as its rows are iterated instead of loading the whole
+        workbook. Legacy .xls (which openpyxl can't read) is parsed once,
+        all sheets together, by pandas.
+        """
+        if file_path.lower().endswith('.xls'):
+            import pandas as pd
+            
+            sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+            metadata['sheet_count'] = len(sheets)
+            for sheet_name, df in sheets.items():
+                yield sheet_name, df.itertuples(index=False, name=None)
+            return
+        
+        import openpyxl
+        
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            metadata['sheet_count'] = len(workbook.worksheets)
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    
+    def _sheet_sections(self, filename: str, sheet_name: str, rows: Iterable[tuple],
+                        metadata: Dict) -> Iterator[Dict]:
+        """Render a sheet as CSV, TABLE_READ_ROWS rows per section; its
+        first non-empty row is the header"""
+        rows = iter(rows)
+        
+        columns = None
+        for row in rows:
+            values = [self._cell(value) for value in row]
+            if any(values):
+                columns = values
+                break
+        if columns is None:
+            return  # Empty sheet
+        
+        # Drop trailing blank columns (formatting beyond the data)
+        while not columns[-1]:
+            columns.pop()
+        width = len(columns)
+        columns = [name or f"Column{i + 1}" for i, name in enumerate(columns)]
+        header = f"Excel File: {filename}\nSheet: {sheet_name}\n{self._csv_line(columns)}"
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        count = 0
+        
+        for row in rows:
+            values = [self._cell(value) for value in row[:width]]
+            if not any(values):
+                continue
+            
+            writer.writerow(values)
+            count += 1
+            if count == settings.TABLE_READ_ROWS:
+                metadata['row_count'] += count
+                yield {'text': buffer.getvalue(), 'page': None, 'header': header,
+                       'table': sheet_name, 'columns': columns}
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, lineterminator="\n")
+                count = 0
+        
+        metadata['row_count'] += count
+        if count:
+            yield {'text': buffer.getvalue(), 'page': None, 'header': header,
+                   'table': sheet_name, 'columns': columns}
+    
+    def _cell(self, value) -> str:
+        """A spreadsheet cell as text, blank for empty/NaN cells"""
+        if value is None or value != value:  # NaN from pandas
+            return ""
+        return str(value)
+    
+    def _csv_line(self, values: List[str]) -> str:
+        """One CSV-quoted line"""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="").writerow(values)
+        return buffer.getvalue()
+    
     def _process_docx(self, file_path: str, doc_id: str, 
                      filename: str) -> Dict[str, Any]:
         """Process Word document"""
+        import docx
+        import pandas as pd
+
         doc = docx.Document(file_path)
-        
-        text = ""
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-        
-        # Extract tables
         tables = []
-        for table in doc.tables:
-            data = []
-            for row in table.rows:
-                data.append([cell.text for cell in row.cells])
-            
-            if data:
-                df = pd.DataFrame(data[1:], columns=data[0])
-                tables.append({'data': df.to_dict('records')})
         
-        language = self._detect_language(text)
+        def sections():
+            yield from self._group_lines(para.text + "\n" for para in doc.paragraphs)
+            
+            # Extract tables
+            for table in doc.tables:
+                data = []
+                for row in table.rows:
+                    data.append([cell.text for cell in row.cells])
+                
+                if data:
+                    df = pd.DataFrame(data[1:], columns=data[0])
+                    tables.append({'data': df.to_dict('records')})
         
         return {
-            'content': text,
-            'tables': tables,
             'metadata': {
                 'document_id': doc_id,
                 'filename': filename,
-                'file_type': FileType.DOCX,
-                'language': language
-            }
+                'file_type': FileType.DOCX
+            },
+            'tables': tables,
+            'sections': sections()
         }
     
+    def _group_lines(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """Group lines into sections of about SECTION_CHARS characters"""
+        buffer = []
+        size = 0
+        
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if size >= SECTION_CHARS:
+                yield {'text': "".join(buffer), 'page': None}
+                buffer = []
+                size = 0
+        
+        if buffer:
+            yield {'text': "".join(buffer), 'page': None}
+    
+    def _with_language(self, metadata: Dict, sections: Iterator[Dict]) -> Iterator[Dict]:
+        """Pass sections through, detecting the language from the first
+        LANGUAGE_SAMPLE_CHARS characters before the first one is yielded"""
+        if 'language' in metadata:
+            yield from sections
+            return
+        
+        sample = []
+        sample_size = 0
+        for section in sections:
+            sample.append(section)
+            sample_size += len(section['text'])
+            if sample_size >= LANGUAGE_SAMPLE_CHARS:
+                break
+        
+        metadata['language'] = self._detect_language(
+            "".join(section['text'] for section in sample)
+        )
+        
+        yield from sample
+        yield from sections
+    
     def _detect_language(self, text: str) -> str:
         """Detect text language"""
+        from langdetect import detect
+
         try:
             if len(text.strip()) < 20:
                 return 'unknown'
             return detect(text[:1000])  # Sample first 1000 chars
         except:
-            return 'unknown'
\ No newline at end of file
+            return 'unknown'
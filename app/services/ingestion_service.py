@@ -0,0 +1,338 @@
+from app.config import settings
+from app.models.schemas import DocumentStatus
+from app.services.container import ServiceContainer
+from app.services.table_store import TableCollector
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import time
+
+# Document-level counters that are only final once extraction finishes;
+# reported with the job timings rather than copied onto every chunk
+SUMMARY_FIELDS = ('ocr_pages', 'ocr_page_count')
+
+INGEST_STAGES = ('extract', 'dedup', 'embed', 'vector_index', 'keyword_index')
+EMBEDDING_CACHE_COUNTERS = ('hits', 'misses', 'seconds_saved')
+
+def embedding_cache_report(counters: Dict[str, float]) -> Dict:
+    """Chunk embedding cache hits, hit rate and encode seconds saved"""
+    lookups = counters['hits'] + counters['misses']
+    return {
+        'hits': counters['hits'],
+        'misses': counters['misses'],
+        'hit_rate': round(counters['hits'] / lookups, 4) if lookups else 0.0,
+        'embed_seconds_saved': round(counters['seconds_saved'], 4)
+    }
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class IngestionService:
+    """Extract → chunk → embed → index pipeline"""
+    
+    def __init__(self, services: ServiceContainer):
+        self.services = services
+    
+    def process_document(self, document_id: str, file_path: str,
+                         file_type: str, workspace_id: str, filename: str,
+                         progress: Optional[Callable[[str, float], None]] = None
+                         ) -> Dict:
+        """Process a document and return the seconds spent in each stage
+        
+        Extraction yields pages/sections, the chunker turns them into
+        chunks as they arrive, and every INGEST_CHUNK_BATCH chunks are
+        embedded and written before more of the file is read. Peak memory
+        is one batch of chunks and embeddings, not the whole document.
+        'extract' covers extraction and chunking, which are interleaved, and
+        saving the document's tables to the table store.
+        """
+        
+        stages = dict.fromkeys(INGEST_STAGES, 0.0)
+        cache = dict.fromkeys(EMBEDDING_CACHE_COUNTERS, 0)
+        chunk_count = 0
+        duplicate_count = 0
+        batches = 0
+        fraction = 0.0
+        
+        extraction = self.services.file_processor.extract(
+            file_path=file_path,
+            file_type=file_type,
+            doc_id=document_id,
+            filename=filename
+        )
+        metadata = extraction['metadata']
+        tables = self._table_collector(workspace_id, document_id, filename)
+        sections = tables.watch(extraction['sections']) if tables else extraction['sections']
+        chunks = self.services.text_chunker.iter_chunks(sections, document_id)
+        
+        clock = time.perf_counter()
+        try:
+            for batch in batched(chunks, settings.INGEST_CHUNK_BATCH):
+                stages['extract'] += time.perf_counter() - clock
+                
+                self._attach_metadata(batch, metadata)
+                duplicate_count += self._write(workspace_id, batch, stages, cache)
+                chunk_count += len(batch)
+                batches += 1
+                
+                # Paged documents report how far through the file we are
+                if progress:
+                    page = batch[-1].get('page_end')
+                    if page and metadata.get('page_count'):
+                        fraction = round(min(0.99, page / metadata['page_count']), 4)
+                    progress('index', fraction)
+                
+                clock = time.perf_counter()
+            
+            self._commit_keywords(stages)
+            clock = time.perf_counter()
+        except BaseException:
+            if tables:
+                tables.abort()
+            raise
+        
+        table_counts = tables.finish(extraction['tables']) if tables else {}
+        stages['extract'] += time.perf_counter() - clock
+        
+        return {
+            **{stage: round(seconds, 4) for stage, seconds in stages.items()},
+            'extraction_cache_hit': extraction['cache_hit'],
+            'chunks': chunk_count,
+            'duplicate_chunks': duplicate_count,
+            'write_batches': batches,
+            'embedding_cache': embedding_cache_report(cache),
+            **table_counts,
+            **{field: metadata[field] for field in SUMMARY_FIELDS if field in metadata}
+        }
+    
+    def process_batch(self, workspace_id: str, documents: List[Dict],
+                      progress: Optional[Callable[[str, float], None]] = None,
+                      on_document: Optional[Callable[..., None]] = None) -> Dict:
+        """Ingest many documents together and return aggregate throughput
+        
+        Up to BATCH_EXTRACT_WORKERS documents are extracted and chunked at
+        once (each thread holds one document's chunks, never its text). Their
+        chunks are pooled, and every BATCH_EMBED_CHUNKS chunks are embedded
+        in one embed_batch call and written with one Chroma add and one
+        keyword index hand-off, instead of one small batch per document.
+        on_document(document_id, status, chunks=, error=) fires as each
+        document is fully indexed or fails; a failed document doesn't stop
+        the others.
+        """
+        
+        total = len(documents)
+        start = time.perf_counter()
+        stages = dict.fromkeys(INGEST_STAGES, 0.0)
+        cache = dict.fromkeys(EMBEDDING_CACHE_COUNTERS, 0)
+        counts = {'completed': 0, 'failed': 0, 'chunks': 0, 'duplicate_chunks': 0,
+                  'embed_batches': 0, 'extraction_cache_hits': 0, 'tables': 0}
+        
+        pending: List[Dict] = []  # Chunks waiting for the next bulk write
+        outstanding: Dict[str, int] = {}  # document_id -> chunks not yet written
+        count_by_document: Dict[str, int] = {}
+        extracted = 0
+        
+        def report(stage: str):
+            if progress:
+                finished = counts['completed'] + counts['failed']
+                progress(stage, round((extracted + finished) / (2 * total), 4))
+        
+        def finish(document_id: str, status: DocumentStatus, chunks: int = 0,
+                   error: Optional[str] = None):
+            counts['completed' if status == DocumentStatus.COMPLETED else 'failed'] += 1
+            if on_document:
+                on_document(document_id, status, chunks=chunks, error=error)
+        
+        def flush():
+            batch = pending[:]
+            pending.clear()
+            if not batch:
+                return
+            
+            counts['duplicate_chunks'] += self._write(workspace_id, batch, stages, cache)
+            self._commit_keywords(stages)
+            counts['embed_batches'] += 1
+            
+            written: Dict[str, int] = {}
+            for chunk in batch:
+                written[chunk['document_id']] = written.get(chunk['document_id'], 0) + 1
+            for document_id, count in written.items():
+                outstanding[document_id] -= count
+                if outstanding[document_id] == 0:
+                    del outstanding[document_id]
+                    finish(document_id, DocumentStatus.COMPLETED, chunks=count_by_document[document_id])
+            report('index')
+        
+        def extract(document: Dict) -> Dict:
+            """Extract and chunk one document (in an extraction thread)"""
+            clock = time.perf_counter()
+            extraction = self.services.file_processor.extract(
+                file_path=document['file_path'],
+                file_type=document['file_type'],
+                doc_id=document['document_id'],
+                filename=document['filename']
+            )
+            tables = self._table_collector(
+                workspace_id, document['document_id'], document['filename']
+            )
+            sections = tables.watch(extraction['sections']) if tables else extraction['sections']
+            try:
+                chunks = list(self.services.text_chunker.iter_chunks(
+                    sections, document['document_id']
+                ))
+            except BaseException:
+                if tables:
+                    tables.abort()
+                raise
+            table_counts = tables.finish(extraction['tables']) if tables else {}
+            self._attach_metadata(chunks, extraction['metadata'])
+            
+            return {
+                'chunks': chunks,
+                'tables': table_counts.get('tables', 0),
+                'cache_hit': extraction['cache_hit'],
+                'seconds': time.perf_counter() - clock
+            }
+        
+        queue = iter(documents)
+        in_flight = {}
+        window = max(1, settings.BATCH_EXTRACT_WORKERS) * 2  # bounds chunks held in memory
+        
+        with ThreadPoolExecutor(max_workers=max(1, settings.BATCH_EXTRACT_WORKERS),
+                                thread_name_prefix="batch-extract") as executor:
+            while True:
+                for document in queue:
+                    in_flight[executor.submit(extract, document)] = document
+                    if len(in_flight) >= window:
+                        break
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    document = in_flight.pop(future)
+                    document_id = document['document_id']
+                    extracted += 1
+                    
+                    try:
+                        processed = future.result()
+                    except Exception as e:
+                        print(f"Batch extraction failed for {document_id}: {str(e)}")
+                        finish(document_id, DocumentStatus.FAILED, error=str(e))
+                        continue
+                    
+                    stages['extract'] += processed['seconds']
+                    counts['extraction_cache_hits'] += processed['cache_hit']
+                    counts['tables'] += processed['tables']
+                    chunks = processed['chunks']
+                    
+                    count_by_document[document_id] = len(chunks)
+                    counts['chunks'] += len(chunks)
+                    if not chunks:
+                        finish(document_id, DocumentStatus.COMPLETED)
+                        continue
+                    
+                    outstanding[document_id] = len(chunks)
+                    pending.extend(chunks)
+                
+                report('extract')
+                if len(pending) >= settings.BATCH_EMBED_CHUNKS:
+                    flush()
+        
+        flush()
+        
+        seconds = time.perf_counter() - start
+        if total and counts['failed'] == total:
+            raise RuntimeError(f"All {total} documents in the batch failed")
+        
+        return {
+            'documents': total,
+            **counts,
+            'seconds': round(seconds, 4),
+            'documents_per_second': round(total / seconds, 2) if seconds else None,
+            'chunks_per_second': round(counts['chunks'] / seconds, 2) if seconds else None,
+            'embedding_cache': embedding_cache_report(cache),
+            # Extraction overlaps across threads, so its total can exceed seconds
+            'stages': {stage: round(value, 4) for stage, value in stages.items()}
+        }
+    
+    def _commit_keywords(self, stages: Dict[str, float]):
+        """Commit the buffered keyword documents before any document is
+        reported complete; a crash before the background commit would
+        otherwise lose them from a COMPLETED job"""
+        clock = time.perf_counter()
+        self.services.keyword_search.flush()
+        stages['keyword_index'] += time.perf_counter() - clock
+    
+    def _table_collector(self, workspace_id: str, document_id: str,
+                         filename: str) -> Optional[TableCollector]:
+        """Collects the document's tables for the table store, if enabled"""
+        if not settings.TABLE_STORE_ENABLED:
+            return None
+        return self.services.table_store.collector(workspace_id, document_id, filename)
+    
+    def _attach_metadata(self, chunks: List[Dict], metadata: Dict):
+        """Give each chunk the document metadata plus its own page range"""
+        document_metadata = {
+            key: value for key, value in metadata.items() if key not in SUMMARY_FIELDS
+        }
+        for chunk in chunks:
+            chunk['metadata'] = dict(document_metadata)
+            chunk['metadata'].update(start_char=chunk['start_char'], end_char=chunk['end_char'])
+            if 'page' in chunk:
+                chunk['metadata'].update(page=chunk['page'], page_end=chunk['page_end'])
+    
+    def _write(self, workspace_id: str, chunks: List[Dict], stages: Dict[str, float],
+               cache: Dict[str, float]) -> int:
+        """Embed a batch of chunks (only those not in the embedding cache)
+        and write it to both indexes
+        
+        Near-duplicates of chunks already indexed in the workspace are
+        recorded as references instead of being written; returns how many.
+        Nothing is recorded in the duplicate index unless the writes succeed.
+        """
+        clock = time.perf_counter()
+        
+        def timed(stage: str):
+            nonlocal clock
+            now = time.perf_counter()
+            stages[stage] += now - clock
+            clock = now
+        
+        collapsed = None
+        if settings.DEDUP_ENABLED:
+            collapsed = self.services.near_duplicates.collapse(workspace_id, chunks)
+            chunks = collapsed['keep']
+            timed('dedup')
+        
+        if chunks:
+            embeddings, lookup = self.services.embedding_service.embed_chunks(
+                [chunk['content'] for chunk in chunks]
+            )
+            for counter in EMBEDDING_CACHE_COUNTERS:
+                cache[counter] += lookup[counter]
+            timed('embed')
+            
+            self.services.vector_store.add_chunks(workspace_id, chunks, embeddings)
+            timed('vector_index')
+            
+            self.services.keyword_search.index_chunks(chunks, workspace_id)
+            timed('keyword_index')
+        
+        if collapsed is None:
+            return 0
+        
+        # Only once the canonical chunks are written (keyword buffer
+        # committed too) may later chunks be collapsed onto them
+        if chunks:
+            self.services.keyword_search.flush()
+            timed('keyword_index')
+        self.services.near_duplicates.register(workspace_id, collapsed)
+        timed('dedup')
+        return len(collapsed['duplicates'])
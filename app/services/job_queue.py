@@ -0,0 +1,318 @@
+from app.config import settings
+from app.models.schemas import DocumentStatus
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    document_id TEXT,
+    workspace_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    stage TEXT,
+    error TEXT,
+    timings TEXT,
+    worker TEXT,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_document ON jobs (document_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_workspace ON jobs (workspace_id, status);
+CREATE TABLE IF NOT EXISTS batch_documents (
+    batch_id TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    filename TEXT,
+    status TEXT NOT NULL,
+    chunks INTEGER,
+    error TEXT,
+    finished_at REAL,
+    PRIMARY KEY (batch_id, document_id)
+);
+CREATE INDEX IF NOT EXISTS idx_batch_documents_document ON batch_documents (document_id);
+"""
+
+class JobQueue:
+    """Durable SQLite-backed ingestion job queue
+    
+    Safe to share between API workers and ingestion worker processes:
+    every claim runs in an IMMEDIATE transaction, so a job is handed to
+    exactly one worker.
+    """
+    
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.JOB_DB_PATH
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Autocommit connection; an unfinished BEGIN is rolled back on close"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def enqueue(self, workspace_id: str, payload: Dict,
+                document_id: Optional[str] = None, kind: str = "document",
+                priority: int = 0) -> Dict:
+        """Add a job, or return the document's job if one is already queued or running"""
+        now = time.time()
+        
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            
+            if document_id:
+                existing = conn.execute(
+                    "SELECT * FROM jobs WHERE document_id = ? AND kind = ? "
+                    "AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+                    (document_id, kind, DocumentStatus.PENDING.value,
+                     DocumentStatus.PROCESSING.value)
+                ).fetchone()
+                if existing:
+                    conn.execute("COMMIT")
+                    return self._to_dict(existing)
+            
+            job_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, document_id, workspace_id, payload, "
+                "priority, status, max_attempts, run_after, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, document_id, workspace_id, json.dumps(payload),
+                 priority, DocumentStatus.PENDING.value, settings.JOB_MAX_ATTEMPTS,
+                 now, now)
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+        
+        return self._to_dict(row)
+    
+    def enqueue_batch(self, workspace_id: str, documents: List[Dict],
+                      priority: int = 0) -> Dict:
+        """Add one job that ingests many documents together
+        
+        Each document is a payload dict (document_id, file_path, file_type,
+        filename); its own status is tracked in batch_documents.
+        """
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, document_id, workspace_id, payload, "
+                "priority, status, max_attempts, run_after, created_at) "
+                "VALUES (?, 'batch', NULL, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, workspace_id, json.dumps({'documents': documents}),
+                 priority, DocumentStatus.PENDING.value, settings.JOB_MAX_ATTEMPTS,
+                 now, now)
+            )
+            conn.executemany(
+                "INSERT INTO batch_documents (batch_id, document_id, filename, status) "
+                "VALUES (?, ?, ?, ?)",
+                [(job_id, document['document_id'], document['filename'],
+                  DocumentStatus.PENDING.value) for document in documents]
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+        
+        return self._to_dict(row)
+    
+    def claim(self, worker: str, kinds: List[str] = None) -> Optional[Dict]:
+        """Take the highest-priority runnable job whose workspace is under its limit"""
+        kinds = kinds or ["document"]
+        now = time.time()
+        
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_stale(conn, now)
+            
+            placeholders = ",".join("?" for _ in kinds)
+            row = conn.execute(
+                f"SELECT * FROM jobs j WHERE j.status = ? AND j.run_after <= ? "
+                f"AND j.attempts < j.max_attempts AND j.kind IN ({placeholders}) "
+                f"AND (SELECT COUNT(*) FROM jobs r WHERE r.workspace_id = j.workspace_id "
+                f"     AND r.status = ?) < ? "
+                f"ORDER BY j.priority DESC, j.created_at LIMIT 1",
+                (DocumentStatus.PENDING.value, now, *kinds,
+                 DocumentStatus.PROCESSING.value, settings.INGEST_WORKSPACE_CONCURRENCY)
+            ).fetchone()
+            
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, "
+                "started_at = ?, heartbeat_at = ?, error = NULL WHERE job_id = ?",
+                (DocumentStatus.PROCESSING.value, worker, now, now, row['job_id'])
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ?", (row['job_id'],)
+            ).fetchone()
+            conn.execute("COMMIT")
+        
+        return self._to_dict(row)
+    
+    def update_progress(self, job_id: str, stage: str, progress: float):
+        """Record the stage a job has reached (also counts as a heartbeat)"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, heartbeat_at = ? WHERE job_id = ?",
+                (stage, progress, time.time(), job_id)
+            )
+    
+    def heartbeat(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?",
+                (time.time(), job_id)
+            )
+    
+    def complete(self, job_id: str, timings: Optional[Dict] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, finished_at = ?, "
+                "timings = ? WHERE job_id = ?",
+                (DocumentStatus.COMPLETED.value, time.time(),
+                 json.dumps(timings or {}), job_id)
+            )
+    
+    def fail(self, job_id: str, error: str):
+        """Schedule a retry with exponential backoff, or fail for good"""
+        now = time.time()
+        
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id, attempts, max_attempts FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row:
+                self._retry_or_fail(conn, row, error, now)
+            conn.execute("COMMIT")
+    
+    def update_batch_document(self, batch_id: str, document_id: str,
+                              status: DocumentStatus, chunks: Optional[int] = None,
+                              error: Optional[str] = None):
+        """Record the outcome of one document in a batch"""
+        finished_at = time.time() if status in (
+            DocumentStatus.COMPLETED, DocumentStatus.FAILED
+        ) else None
+        
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE batch_documents SET status = ?, chunks = ?, error = ?, "
+                "finished_at = ? WHERE batch_id = ? AND document_id = ?",
+                (DocumentStatus(status).value, chunks, error, finished_at,
+                 batch_id, document_id)
+            )
+    
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """Batch job plus the status of each of its documents"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ? AND kind = 'batch'", (batch_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            documents = conn.execute(
+                "SELECT document_id, filename, status, chunks, error, finished_at "
+                "FROM batch_documents WHERE batch_id = ? ORDER BY rowid",
+                (batch_id,)
+            ).fetchall()
+        
+        batch = self._to_dict(row)
+        batch['documents'] = [dict(document) for document in documents]
+        return batch
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+    
+    def get_document_status(self, document_id: str) -> Optional[Dict]:
+        """Latest job for a document, whether queued on its own or in a batch"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE document_id = ? ORDER BY created_at DESC LIMIT 1",
+                (document_id,)
+            ).fetchone()
+            batched = conn.execute(
+                "SELECT j.*, b.status AS document_status, b.chunks, "
+                "b.error AS document_error, b.finished_at AS document_finished_at "
+                "FROM batch_documents b JOIN jobs j ON j.job_id = b.batch_id "
+                "WHERE b.document_id = ? ORDER BY j.created_at DESC LIMIT 1",
+                (document_id,)
+            ).fetchone()
+        
+        if batched is None or (row is not None and row['created_at'] >= batched['created_at']):
+            return self._to_dict(row) if row else None
+        
+        # Report the document's own outcome under the batch job's id
+        job = self._to_dict(batched)
+        status = job.pop('document_status')
+        job.update(
+            document_id=document_id,
+            status=status,
+            error=job.pop('document_error'),
+            finished_at=job.pop('document_finished_at'),
+            progress=1.0 if status == DocumentStatus.COMPLETED.value else job['progress'],
+            timings={'chunks': job.pop('chunks')}
+        )
+        job.pop('payload')
+        return job
+    
+    def _requeue_stale(self, conn: sqlite3.Connection, now: float):
+        """Retry (with backoff) or fail jobs whose worker stopped
+        heartbeating, e.g. it crashed or was OOM-killed on the document"""
+        stale = conn.execute(
+            "SELECT job_id, attempts, max_attempts FROM jobs "
+            "WHERE status = ? AND heartbeat_at < ?",
+            (DocumentStatus.PROCESSING.value, now - settings.JOB_STALE_AFTER)
+        ).fetchall()
+        
+        for row in stale:
+            self._retry_or_fail(conn, row, "worker lost", now)
+    
+    def _retry_or_fail(self, conn: sqlite3.Connection, row: sqlite3.Row,
+                       error: str, now: float):
+        """Requeue a job after exponential backoff, or fail it for good once
+        it has used its attempts (call inside a write transaction)"""
+        if row['attempts'] < row['max_attempts']:
+            delay = settings.JOB_RETRY_BACKOFF * (2 ** (row['attempts'] - 1))
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, "
+                "worker = NULL WHERE job_id = ?",
+                (DocumentStatus.PENDING.value, error, now + delay, row['job_id'])
+            )
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (DocumentStatus.FAILED.value, error, now, row['job_id'])
+            )
+    
+    def _to_dict(self, row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job['payload'] else {}
+        job['timings'] = json.loads(job['timings']) if job['timings'] else None
+        return job
@@ -3,6 +3,9 @@ from whoosh.fields import Schema, TEXT, ID, KEYWORD
 from whoosh.qparser import QueryParser, MultifieldParser
 from whoosh.query import And, Term
 from typing import List, Dict, Optional
+from app.config import settings
+import threading
+import time
 import os
 
 class KeywordSearchService:
@@ -18,65 +21,202 @@ class KeywordSearchService:
             language=KEYWORD(stored=True),
             tags=KEYWORD(stored=True, commas=True)
         )
+        
+        # One open index per process; each thread keeps its own searcher
+        # (Whoosh searchers aren't safe to share) and refreshes it cheaply
+        # when the index generation moves on.
+        self._ix = None
+        self._ix_lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        
+        # Documents from every ingest are buffered and committed together
+        # by a background writer thread.
+        self._pending: List[Dict] = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        
+        self.commits = 0
+        self.optimizes = 0
+        self.last_commit_seconds = 0.0
+        self._commits_since_optimize = 0
+        
+        self._writer_thread = threading.Thread(
+            target=self._flush_loop, name="keyword-writer", daemon=True
+        )
+        self._writer_thread.start()
     
     def get_or_create_index(self):
-        """Get existing index or create new one"""
-        if exists_in(self.index_dir, indexname="chunks"):
-            return open_dir(self.index_dir, indexname="chunks")
-        else:
-            return create_in(self.index_dir, self.schema, indexname="chunks")
+        """Get existing index or create new one (opened once per process)"""
+        if self._ix is None:
+            with self._ix_lock:
+                if self._ix is None:
+                    if exists_in(self.index_dir, indexname="chunks"):
+                        self._ix = open_dir(self.index_dir, indexname="chunks")
+                    else:
+                        self._ix = create_in(self.index_dir, self.schema, indexname="chunks")
+        return self._ix
     
     def index_chunks(self, chunks: List[Dict], workspace_id: str):
-        """Add chunks to keyword index"""
-        ix = self.get_or_create_index()
-        writer = ix.writer()
-        
-        for chunk in chunks:
-            writer.add_document(
-                chunk_id=chunk['chunk_id'],
-                document_id=chunk['document_id'],
-                content=chunk['content'],
-                workspace_id=workspace_id,
-                language=chunk.get('metadata', {}).get('language', ''),
-                tags=','.join(chunk.get('metadata', {}).get('tags', []))
-            )
-        
-        writer.commit()
+        """Queue chunks for the keyword index
+        
+        Chunks become searchable at the next background commit, at most
+        KEYWORD_COMMIT_PERIOD seconds later. They are only durable once
+        committed, so call flush() before reporting their document indexed.
+        """
+        documents = [{
+            'chunk_id': chunk['chunk_id'],
+            'document_id': chunk['document_id'],
+            'content': chunk['content'],
+            'workspace_id': workspace_id,
+            'language': chunk.get('metadata', {}).get('language', ''),
+            'tags': ','.join(chunk.get('metadata', {}).get('tags', []))
+        } for chunk in chunks]
+        
+        with self._pending_lock:
+            self._pending.extend(documents)
+            full = len(self._pending) >= settings.KEYWORD_COMMIT_LIMIT
+        
+        if full:
+            self._wake.set()
     
-    def search(self, query: str, workspace_id: str, top_k: int = 10,
-               filters: Optional[Dict] = None) -> List[Dict]:
-        """Search using keywords"""
-        ix = self.get_or_create_index()
+    def flush(self):
+        """Commit every buffered document in one writer session
         
-        with ix.searcher() as searcher:
-            # Parse query
-            parser = MultifieldParser(["content"], schema=ix.schema)
-            parsed_query = parser.parse(query)
+        Also a commit barrier: it waits for a background commit in progress,
+        and raises if the documents couldn't be committed.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                documents, self._pending = self._pending, []
+            
+            if not documents:
+                return
             
-            # Add workspace filter
-            workspace_filter = Term("workspace_id", workspace_id)
-            final_query = And([parsed_query, workspace_filter])
+            ix = self.get_or_create_index()
+            optimize = self._commits_since_optimize + 1 >= settings.KEYWORD_OPTIMIZE_EVERY
+            start = time.perf_counter()
             
-            # Add additional filters
-            if filters:
-                for key, value in filters.items():
-                    final_query = And([final_query, Term(key, str(value))])
+            try:
+                writer = ix.writer(timeout=settings.KEYWORD_WRITE_LOCK_TIMEOUT)
+                try:
+                    for document in documents:
+                        writer.update_document(**document)
+                except Exception:
+                    writer.cancel()
+                    raise
+                
+                # merge=True folds small segments on every commit; a periodic
+                # optimize collapses the index so the segment count stays bounded.
+                writer.commit(merge=True, optimize=optimize)
+            except Exception:
+                # E.g. another process holds the lock; keep the batch so the
+                # next flush (or the caller's retry) still commits it
+                with self._pending_lock:
+                    self._pending[:0] = documents
+                raise
             
-            # Search
-            results = searcher.search(final_query, limit=top_k)
+            self.commits += 1
+            self.last_commit_seconds = round(time.perf_counter() - start, 4)
+            if optimize:
+                self.optimizes += 1
+                self._commits_since_optimize = 0
+            else:
+                self._commits_since_optimize += 1
             
-            # Format results
-            search_results = []
-            for hit in results:
-                search_results.append({
-                    'chunk_id': hit['chunk_id'],
+            self._generation += 1
+    
+    def close(self):
+        """Stop the background writer and commit what's left"""
+        self._stop.set()
+        self._wake.set()
+        self._writer_thread.join()
+        self.flush()
+    
+    def search(self, query: str, workspace_id: str, top_k: int = 10,
+               filters: Optional[Dict] = None) -> List[Dict]:
+        """Search using keywords"""
+        searcher = self._searcher()
+        
+        # Parse query
+        parser = MultifieldParser(["content"], schema=searcher.schema)
+        parsed_query = parser.parse(query)
+        
+        # Add workspace filter
+        workspace_filter = Term("workspace_id", workspace_id)
+        final_query = And([parsed_query, workspace_filter])
+        
+        # Add additional filters
+        if filters:
+            for key, value in filters.items():
+                final_query = And([final_query, Term(key, str(value))])
+        
+        # Search
+        results = searcher.search(final_query, limit=top_k)
+        
+        # Format results
+        search_results = []
+        for hit in results:
+            search_results.append({
+                'chunk_id': hit['chunk_id'],
+                'document_id': hit['document_id'],
+                'content': hit['content'],
+                'score': hit.score,
+                'metadata': {
                     'document_id': hit['document_id'],
-                    'content': hit['content'],
-                    'score': hit.score,
-                    'metadata': {
-                        'language': hit.get('language'),
-                        'tags': hit.get('tags', '').split(',') if hit.get('tags') else []
-                    }
-                })
+                    'language': hit.get('language'),
+                    'tags': hit.get('tags', '').split(',') if hit.get('tags') else []
+                }
+            })
+        
+        return search_results
+    
+    def stats(self) -> Dict:
+        """Writer buffer and commit counters"""
+        with self._pending_lock:
+            pending = len(self._pending)
+        
+        return {
+            'pending_documents': pending,
+            'commits': self.commits,
+            'optimizes': self.optimizes,
+            'last_commit_seconds': self.last_commit_seconds,
+            'generation': self._generation
+        }
+    
+    def _searcher(self):
+        """This thread's searcher, refreshed if the index has changed
+        
+        Local commits bump the generation so the next query refreshes
+        immediately; commits from other processes are picked up by an
+        up_to_date() check at most every KEYWORD_REFRESH_INTERVAL seconds.
+        """
+        local = self._local
+        now = time.monotonic()
+        searcher = getattr(local, 'searcher', None)
+        
+        if searcher is None:
+            local.searcher = self.get_or_create_index().searcher()
+            local.generation = self._generation
+            local.checked_at = now
+        elif (local.generation != self._generation or
+              now - local.checked_at >= settings.KEYWORD_REFRESH_INTERVAL):
+            if not searcher.up_to_date():
+                # refresh() reuses the readers of unchanged segments
+                local.searcher = searcher.refresh()
+            local.generation = self._generation
+            local.checked_at = now
+        
+        return local.searcher
+    
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=settings.KEYWORD_COMMIT_PERIOD)
+            self._wake.clear()
             
-            return search_results
\ No newline at end of file
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Keyword index commit failed: {str(e)}")
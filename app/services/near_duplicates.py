@@ -0,0 +1,262 @@
+from app.config import settings
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import os
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup_chunks (
+    workspace_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    PRIMARY KEY (workspace_id, chunk_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dedup_bands (
+    workspace_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dedup_bands ON dedup_bands (workspace_id, bucket, chunk_id);
+CREATE TABLE IF NOT EXISTS dedup_refs (
+    workspace_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    canonical_id TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    page INTEGER,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (workspace_id, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_dedup_refs_canonical ON dedup_refs (workspace_id, canonical_id);
+"""
+
+WORD = re.compile(r'\w+')
+PRIME = (1 << 31) - 1  # Permutations are (a * x + b) mod PRIME; a * x fits in 64 bits
+SEED = 42  # Fixed so every process computes the same signatures
+LOOKUP_BATCH = 500  # Values per IN (...) query, under SQLite's variable limit
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of the chunks indexed in each workspace
+    
+    Each chunk gets a MinHash signature over its word shingles, split into
+    DEDUP_BANDS bands that are stored as hashed LSH buckets. A new chunk
+    sharing a bucket with an indexed one is compared on the full signature
+    and, if the estimated Jaccard similarity reaches DEDUP_THRESHOLD, is
+    recorded as a reference to that canonical chunk instead of being
+    embedded and indexed again (repeated disclaimers, headers, templated
+    pages). References are kept so results can list every place the text
+    appears.
+    """
+    
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.DEDUP_DB_PATH
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self.num_perm = settings.DEDUP_NUM_PERM
+        self.bands = settings.DEDUP_BANDS
+        self.rows_per_band = self.num_perm // self.bands
+        
+        rng = np.random.default_rng(SEED)
+        self._a = rng.integers(1, PRIME, size=self.num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, PRIME, size=self.num_perm, dtype=np.uint64)[:, None]
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature (uint32) of the text's word shingles, None if it has no words"""
+        words = WORD.findall(text.lower())
+        if not words:
+            return None
+        
+        size = settings.DEDUP_SHINGLE_WORDS
+        shingles = {
+            " ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))
+        }
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        ) % PRIME
+        
+        return ((self._a * hashes + self._b) % PRIME).min(axis=1).astype(np.uint32)
+    
+    def collapse(self, workspace_id: str, chunks: List[Dict]) -> Dict:
+        """Split chunks into those to index and near-duplicates of chunks
+        already indexed in the workspace (or earlier in this list)
+        
+        Nothing is recorded yet: pass the returned plan ('keep',
+        'duplicates') to register() once the kept chunks have been
+        written, so the index never points at a chunk that failed to
+        write. Chunks that were already canonical (a re-index) stay
+        canonical.
+        """
+        keep = []
+        duplicates = []
+        canonical = []  # (chunk, signature, buckets, previous signature)
+        references = []  # (chunk, canonical_id, similarity)
+        batch_buckets: Dict[int, List[int]] = {}  # bucket -> index into canonical
+        
+        with self._connect() as conn:
+            for chunk in chunks:
+                signature = self.signature(chunk['content'])
+                if signature is None:
+                    keep.append(chunk)
+                    continue
+                
+                buckets = self._buckets(signature)
+                registered = conn.execute(
+                    "SELECT signature FROM dedup_chunks WHERE workspace_id = ? AND chunk_id = ?",
+                    (workspace_id, chunk['chunk_id'])
+                ).fetchone()
+                
+                match = None
+                if not registered:
+                    match = self._best_match(conn, workspace_id, signature, buckets)
+                    for i in {i for bucket in buckets for i in batch_buckets.get(bucket, [])}:
+                        other = canonical[i]
+                        similarity = float(np.mean(other[1] == signature))
+                        if similarity >= settings.DEDUP_THRESHOLD and \
+                                (match is None or similarity > match[1]):
+                            match = (other[0]['chunk_id'], similarity)
+                
+                if match is None:
+                    for bucket in buckets:
+                        batch_buckets.setdefault(bucket, []).append(len(canonical))
+                    canonical.append((chunk, signature, buckets,
+                                      registered[0] if registered else None))
+                    keep.append(chunk)
+                else:
+                    references.append((chunk, *match))
+                    duplicates.append(chunk)
+        
+        return {'keep': keep, 'duplicates': duplicates,
+                'canonical': canonical, 'references': references}
+    
+    def register(self, workspace_id: str, plan: Dict):
+        """Record a collapse() plan: its kept chunks become canonical and
+        its duplicates reference them (call after the kept chunks are written)
+        
+        A concurrent worker may have indexed the same text in the meantime;
+        both copies then stay canonical, which only costs a missed collapse.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for chunk, signature, buckets, previous in plan['canonical']:
+                    self._register(conn, workspace_id, chunk, signature, buckets, previous)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dedup_refs (workspace_id, chunk_id, "
+                    "canonical_id, document_id, chunk_index, page, similarity) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(workspace_id, chunk['chunk_id'], canonical_id, chunk['document_id'],
+                      chunk['chunk_index'], chunk.get('page'), round(similarity, 4))
+                     for chunk, canonical_id, similarity in plan['references']]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def references(self, workspace_id: str, chunk_ids: List[str]) -> Dict[str, List[Dict]]:
+        """Duplicates recorded against each of these canonical chunks"""
+        references: Dict[str, List[Dict]] = {}
+        
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            for start in range(0, len(chunk_ids), LOOKUP_BATCH):
+                batch = chunk_ids[start:start + LOOKUP_BATCH]
+                rows = conn.execute(
+                    "SELECT canonical_id, chunk_id, document_id, chunk_index, page, similarity "
+                    "FROM dedup_refs WHERE workspace_id = ? AND canonical_id IN "
+                    f"({','.join('?' * len(batch))}) ORDER BY document_id, chunk_index",
+                    [workspace_id, *batch]
+                ).fetchall()
+                for row in rows:
+                    reference = dict(row)
+                    references.setdefault(reference.pop('canonical_id'), []).append(reference)
+        
+        return references
+    
+    def stats(self) -> Dict:
+        """Canonical and collapsed chunk counts across workspaces"""
+        with self._connect() as conn:
+            canonical = conn.execute("SELECT COUNT(*) FROM dedup_chunks").fetchone()[0]
+            collapsed = conn.execute("SELECT COUNT(*) FROM dedup_refs").fetchone()[0]
+        return {'canonical_chunks': canonical, 'collapsed_chunks': collapsed}
+    
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        """One LSH bucket per band: a 64-bit hash of the band number and rows"""
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            digest = hashlib.blake2b(
+                band.to_bytes(2, 'big') + rows.tobytes(), digest_size=8
+            ).digest()
+            buckets.append(int.from_bytes(digest, 'big', signed=True))
+        return buckets
+    
+    def _best_match(self, conn: sqlite3.Connection, workspace_id: str,
+                    signature: np.ndarray, buckets: List[int]) -> Optional[Tuple[str, float]]:
+        """Most similar canonical chunk sharing a bucket, if similar enough"""
+        candidates = [row[0] for row in conn.execute(
+            "SELECT DISTINCT chunk_id FROM dedup_bands WHERE workspace_id = ? AND bucket IN "
+            f"({','.join('?' * len(buckets))})",
+            [workspace_id, *buckets]
+        )]
+        
+        best = None
+        for start in range(0, len(candidates), LOOKUP_BATCH):
+            batch = candidates[start:start + LOOKUP_BATCH]
+            for chunk_id, blob in conn.execute(
+                "SELECT chunk_id, signature FROM dedup_chunks WHERE workspace_id = ? AND chunk_id IN "
+                f"({','.join('?' * len(batch))})",
+                [workspace_id, *batch]
+            ):
+                other = np.frombuffer(blob, dtype=np.uint32)
+                if len(other) != len(signature):
+                    continue  # Signed with other DEDUP_NUM_PERM settings
+                similarity = float(np.mean(other == signature))
+                if similarity >= settings.DEDUP_THRESHOLD and (best is None or similarity > best[1]):
+                    best = (chunk_id, similarity)
+        
+        return best
+    
+    def _register(self, conn: sqlite3.Connection, workspace_id: str, chunk: Dict,
+                  signature: np.ndarray, buckets: List[int], previous: Optional[bytes]):
+        """Make a chunk canonical (replacing its previous signature on re-index)"""
+        if previous is not None:
+            old_buckets = self._buckets(np.frombuffer(previous, dtype=np.uint32))
+            conn.execute(
+                "DELETE FROM dedup_bands WHERE workspace_id = ? AND chunk_id = ? AND bucket IN "
+                f"({','.join('?' * len(old_buckets))})",
+                [workspace_id, chunk['chunk_id'], *old_buckets]
+            )
+        conn.execute(
+            "DELETE FROM dedup_refs WHERE workspace_id = ? AND chunk_id = ?",
+            (workspace_id, chunk['chunk_id'])
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO dedup_chunks (workspace_id, chunk_id, document_id, signature) "
+            "VALUES (?, ?, ?, ?)",
+            (workspace_id, chunk['chunk_id'], chunk['document_id'], signature.tobytes())
+        )
+        conn.executemany(
+            "INSERT INTO dedup_bands (workspace_id, bucket, chunk_id) VALUES (?, ?, ?)",
+            [(workspace_id, bucket, chunk['chunk_id']) for bucket in buckets]
+        )
@@ -1,22 +1,194 @@
-import pytesseract
-from PIL import Image
-from pdf2image import convert_from_path
 from app.config import settings
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import multiprocessing
+import numpy as np
 import os
+import threading
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Global binarization threshold that best separates ink from paper"""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 128
+    
+    levels = np.arange(256)
+    weight_bg = np.cumsum(histogram)
+    weight_fg = total - weight_bg
+    mass_bg = np.cumsum(histogram * levels)
+    mean_bg = mass_bg / np.maximum(weight_bg, 1)
+    mean_fg = (mass_bg[-1] - mass_bg) / np.maximum(weight_fg, 1)
+    
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+def estimate_line_height(gray: np.ndarray) -> Optional[float]:
+    """Median height in pixels of the text lines in a page image
+    
+    Uses the horizontal ink profile: consecutive rows containing ink form
+    one line. Returns None for pages with no detectable text.
+    """
+    ink = gray < otsu_threshold(gray)
+    inked_rows = ink.mean(axis=1) > 0.002
+    
+    # Lengths of runs of inked rows
+    padded = np.concatenate(([False], inked_rows, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    heights = edges[1::2] - edges[::2]
+    heights = heights[heights >= 2]
+    
+    if not len(heights):
+        return None
+    return float(np.median(heights))
+
+def choose_dpi(width_in: float, height_in: float,
+               line_height_pt: Optional[float]) -> int:
+    """Resolution that puts text lines at ~OCR_TARGET_LINE_PX pixels
+    
+    Small print gets more DPI and large print less. The page size caps the
+    DPI so the rendered image stays under OCR_MAX_PIXELS.
+    """
+    if line_height_pt:
+        dpi = settings.OCR_TARGET_LINE_PX * 72 / line_height_pt
+    else:
+        dpi = settings.OCR_DPI
+    
+    max_dpi_for_size = (settings.OCR_MAX_PIXELS / max(width_in * height_in, 1e-6)) ** 0.5
+    dpi = min(dpi, max_dpi_for_size, settings.OCR_MAX_DPI)
+    
+    return int(max(dpi, settings.OCR_MIN_DPI))
+
+def preprocess_image(image):
+    """Grayscale, cap the pixel count and binarize before tesseract"""
+    from PIL import Image
+    
+    image = image.convert('L')
+    
+    pixels = image.width * image.height
+    if pixels > settings.OCR_MAX_PIXELS:
+        scale = (settings.OCR_MAX_PIXELS / pixels) ** 0.5
+        image = image.resize(
+            (int(image.width * scale), int(image.height * scale)),
+            Image.LANCZOS
+        )
+    
+    gray = np.asarray(image)
+    binary = np.where(gray < otsu_threshold(gray), 0, 255).astype(np.uint8)
+    return Image.fromarray(binary)
+
+def detect_script(image, timeout: float):
+    """Quick orientation/script pass: (languages or None, degrees to rotate)"""
+    import pytesseract
+    
+    try:
+        osd = pytesseract.image_to_osd(
+            image,
+            config='--psm 0',
+            output_type=pytesseract.Output.DICT,
+            timeout=timeout
+        )
+    except Exception:
+        # Too little text for OSD, or osd.traineddata missing
+        return None, 0
+    
+    return settings.OCR_SCRIPT_LANGUAGES.get(osd.get('script')), osd.get('rotate', 0)
+
+def ocr_image(image, config: str, languages: str, timeout: float,
+              adaptive: bool = True) -> str:
+    """OCR an image, optionally preprocessed, upright and with only the
+    languages of its script"""
+    import pytesseract
+    
+    if adaptive:
+        image = preprocess_image(image)
+        
+        if settings.OCR_DETECT_SCRIPT:
+            script_languages, rotate = detect_script(image, timeout)
+            if rotate:
+                image = image.rotate(-rotate, expand=True, fillcolor=255)
+            languages = script_languages or languages
+    
+    return pytesseract.image_to_string(
+        image,
+        config=config,
+        lang=languages,
+        timeout=timeout
+    )
+
+def ocr_pdf_page(pdf_path: str, page_number: int, dpi: int,
+                 config: str, languages: str, timeout: float,
+                 adaptive: bool = True) -> str:
+    """Render one PDF page and OCR it (runs in an OCR pool process)
+    
+    Only this page is rasterized, and both pdftoppm and tesseract are
+    killed if they exceed the timeout. In adaptive mode a low-resolution
+    preview is rendered first to measure page size and text line height,
+    which pick the DPI for the real render.
+    """
+    from pdf2image import convert_from_path
+    
+    def render(resolution: int):
+        images = convert_from_path(
+            pdf_path,
+            dpi=resolution,
+            first_page=page_number,
+            last_page=page_number,
+            timeout=timeout,
+            grayscale=adaptive
+        )
+        return images[0] if images else None
+    
+    if adaptive:
+        preview = render(settings.OCR_PREVIEW_DPI)
+        if preview is None:
+            return ""
+        
+        scale = 72 / settings.OCR_PREVIEW_DPI  # preview pixels -> points
+        line_height = estimate_line_height(np.asarray(preview.convert('L')))
+        dpi = choose_dpi(
+            preview.width / settings.OCR_PREVIEW_DPI,
+            preview.height / settings.OCR_PREVIEW_DPI,
+            line_height * scale if line_height else None
+        )
+    
+    image = render(dpi)
+    if image is None:
+        return ""
+    
+    return ocr_image(image, config, languages, timeout, adaptive)
 
 class OCRService:
-    def __init__(self):
+    def __init__(self, pool: Optional[Callable[[], ProcessPoolExecutor]] = None):
         self.config = settings.TESSERACT_CONFIG
         self.languages = settings.OCR_LANGUAGES
+        self.dpi = settings.OCR_DPI
+        self.page_timeout = settings.OCR_PAGE_TIMEOUT
+        self.window = max(1, settings.OCR_PAGE_WINDOW)
+        self.adaptive = settings.OCR_ADAPTIVE
+        # Adaptive OCR runs up to four timed steps per page (preview render,
+        # script detection, render, OCR); the page as a whole gets that long
+        self.page_deadline = self.page_timeout * (4 if self.adaptive else 2)
+        
+        # A caller running other work in a process pool can share it, so
+        # the two don't each claim the CPUs
+        self._shared_pool = pool
+        self._pool = None
+        self._pool_lock = threading.Lock()
     
     def extract_from_image(self, image_path: str) -> str:
         """Extract text from a single image"""
+        from PIL import Image
+
         try:
             image = Image.open(image_path)
-            text = pytesseract.image_to_string(
+            text = ocr_image(
                 image,
-                config=self.config,
-                lang=self.languages
+                self.config,
+                self.languages,
+                self.page_timeout,
+                adaptive=self.adaptive
             )
             return text.strip()
         except Exception as e:
@@ -25,35 +197,128 @@ class OCRService:
     def extract_from_pdf(self, pdf_path: str) -> str:
         """Extract text from scanned PDF using OCR"""
         try:
-            # Convert PDF to images
-            images = convert_from_path(pdf_path, dpi=300)
+            pages = self.extract_pages_from_pdf(pdf_path)
+        except Exception as e:
+            raise Exception(f"PDF OCR failed: {str(e)}")
+        
+        return "\n\n".join(
+            f"--- Page {page} ---\n{text}" for page, text in pages.items()
+        )
+    
+    def extract_pages_from_pdf(self, pdf_path: str,
+                               pages: Optional[List[int]] = None) -> Dict[int, str]:
+        """OCR PDF pages in parallel, returning {page_number: text} in page order"""
+        return dict(sorted(self.iter_pages_from_pdf(pdf_path, pages)))
+    
+    def iter_pages_from_pdf(self, pdf_path: str,
+                            pages: Optional[Iterable[int]] = None
+                            ) -> Iterator[Tuple[int, str]]:
+        """OCR PDF pages in parallel, yielding (page_number, text) in the
+        order the pages were given
+        
+        Pages are rendered one at a time inside the pool processes and at
+        most OCR_PAGE_WINDOW are in flight (or finished but not yet
+        consumed), so peak memory is bounded by the window rather than the
+        page count. A page that fails, or takes longer than its steps'
+        OCR_PAGE_TIMEOUTs added up, comes back as empty text.
+        """
+        if pages is None:
+            from pdf2image import pdfinfo_from_path
             
-            # OCR each page
-            all_text = []
-            for i, image in enumerate(images):
-                text = pytesseract.image_to_string(
-                    image,
-                    config=self.config,
-                    lang=self.languages
-                )
-                all_text.append(f"--- Page {i+1} ---\n{text}")
+            pages = range(1, pdfinfo_from_path(pdf_path)['Pages'] + 1)
+        
+        in_flight = deque()
+        
+        try:
+            for page in pages:
+                if len(in_flight) >= self.window:
+                    yield in_flight[0][0], self.page_result(pdf_path, *in_flight.popleft())
+                
+                in_flight.append((page, self.submit_pdf_page(pdf_path, page)))
             
-            return "\n\n".join(all_text)
+            while in_flight:
+                yield in_flight[0][0], self.page_result(pdf_path, *in_flight.popleft())
+        finally:
+            # Consumer stopped early: don't leave pages queued in the pool
+            for _, future in in_flight:
+                future.cancel()
+    
+    def ocr_pdf_page(self, pdf_path: str, page: int) -> str:
+        """OCR a single PDF page in the pool"""
+        return self.page_result(pdf_path, page, self.submit_pdf_page(pdf_path, page))
+    
+    def submit_pdf_page(self, pdf_path: str, page: int) -> Future:
+        """Start OCR of a PDF page in the pool; pass the future to page_result()"""
+        return self._get_pool().submit(
+            ocr_pdf_page, pdf_path, page, self.dpi,
+            self.config, self.languages, self.page_timeout, self.adaptive
+        )
+    
+    def page_result(self, pdf_path: str, page: int, future: Future) -> str:
+        """Text of a submitted page, or "" if it failed or ran out of time"""
+        try:
+            return future.result(timeout=self.page_deadline)
+        except FutureTimeout:
+            future.cancel()
+            print(f"OCR timed out for page {page} of {pdf_path} after {self.page_deadline}s")
+            return ""
         except Exception as e:
-            raise Exception(f"PDF OCR failed: {str(e)}")
+            print(f"OCR failed for page {page} of {pdf_path}: {str(e)}")
+            return ""
+    
+    def close(self):
+        """Shut down the OCR process pool (a shared pool is left to its owner)"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """The shared pool, or our own sized to the machine, created on first PDF"""
+        if self._shared_pool is not None:
+            return self._shared_pool()
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=settings.pool_workers(settings.EXTRACT_WORKERS),
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+    
+    def classify_pdf_pages(self, pdf_path: str) -> List[bool]:
+        """Per page, True if it has no text layer and needs OCR
+        
+        Only page resources are inspected (fonts, including those inside
+        form XObjects); no text is extracted, so this is cheap enough to
+        run up front on every PDF.
+        """
+        import PyPDF2
+        
+        reader = PyPDF2.PdfReader(pdf_path)
+        return [not self._has_fonts(page.get('/Resources')) for page in reader.pages]
     
     def is_pdf_scanned(self, pdf_path: str) -> bool:
         """Check if PDF needs OCR (is scanned vs digital)"""
-        import PyPDF2
+        return all(self.classify_pdf_pages(pdf_path))
+    
+    def _has_fonts(self, resources, depth: int = 0) -> bool:
+        """Whether a resource dictionary (or a form XObject in it) declares fonts"""
+        if resources is None or depth > 3:
+            return False
+        resources = resources.get_object()
         
-        with open(pdf_path, 'rb') as file:
-            pdf = PyPDF2.PdfReader(file)
-            # Sample first few pages
-            sample_pages = min(3, len(pdf.pages))
-            
-            for i in range(sample_pages):
-                text = pdf.pages[i].extract_text()
-                if len(text.strip()) > 100:  # Has decent amount of text
-                    return False
-            
-            return True  # Likely scanned
\ No newline at end of file
+        fonts = resources.get('/Font')
+        if fonts is not None and len(fonts.get_object()) > 0:
+            return True
+        
+        xobjects = resources.get('/XObject')
+        if xobjects is None:
+            return False
+        
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            if xobject.get('/Subtype') == '/Form' and \
+                    self._has_fonts(xobject.get('/Resources'), depth + 1):
+                return True
+        
+        return False
@@ -0,0 +1,120 @@
+from app.config import settings
+from typing import Dict, List
+import re
+import shutil
+import subprocess
+
+# Path construction operators in a content stream: "x y w h re" draws a
+# rectangle (cell borders, shaded rows), "x y l" a line segment (rules)
+NUMBER = rb'[-+]?(?:\d+\.?\d*|\.\d+)'
+RECT_OP = re.compile(rb'(?:' + NUMBER + rb'\s+){4}re\b')
+LINE_OP = re.compile(rb'(?:' + NUMBER + rb'\s+){2}l\b')
+
+def _stream_bytes(obj) -> bytes:
+    """Decoded bytes of a content stream or an array of them"""
+    obj = obj.get_object()
+    if isinstance(obj, list):
+        return b"\n".join(_stream_bytes(part) for part in obj)
+    return obj.get_data()
+
+def _page_streams(page) -> bytes:
+    """The page's content plus that of the form XObjects it draws"""
+    data = [_stream_bytes(page['/Contents'])] if '/Contents' in page else []
+    
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources else None
+    if xobjects is not None:
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            if xobject.get('/Subtype') == '/Form':
+                data.append(xobject.get_data())
+    
+    return b"\n".join(data)
+
+def _has_images(page) -> bool:
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources else None
+    if xobjects is None:
+        return False
+    return any(
+        xobject.get_object().get('/Subtype') == '/Image'
+        for xobject in xobjects.get_object().values()
+    )
+
+def looks_tabular(page) -> bool:
+    """Cheap table detector: enough ruling lines or rectangles on the page
+    
+    Only counts path operators in the raw content stream (a regex over
+    the decoded bytes), so it costs a fraction of a layout analysis.
+    """
+    try:
+        data = _page_streams(page)
+    except Exception:
+        return True  # Can't tell; let pdfplumber decide
+    
+    return len(RECT_OP.findall(data)) >= settings.PDF_TABLE_MIN_RECTS or \
+        len(LINE_OP.findall(data)) >= settings.PDF_TABLE_MIN_LINES
+
+def _pdftotext(pdf_path: str, first: int, last: int) -> List[str]:
+    """Text of pages first..last from poppler's pdftotext, one string per page"""
+    result = subprocess.run(
+        ['pdftotext', '-f', str(first), '-l', str(last), '-enc', 'UTF-8', pdf_path, '-'],
+        capture_output=True,
+        timeout=settings.PDF_TEXT_TIMEOUT,
+        check=True
+    )
+    # Every page ends with a form feed
+    return result.stdout.decode('utf-8', errors='replace').split('\f')[:last - first + 1]
+
+def extract_pdf_pages(pdf_path: str, pages: List[int]) -> List[Dict]:
+    """Extract text (and tables, where the page looks tabular) from some
+    pages of a PDF (runs in a PDF extraction pool process)
+    
+    Text comes from pdftotext, the fast path; pdfplumber only opens the
+    pages flagged by looks_tabular. A page with (almost) no text but an
+    image is returned with needs_ocr=True for the caller to OCR.
+    """
+    import PyPDF2
+    
+    reader = PyPDF2.PdfReader(pdf_path)
+    
+    if shutil.which('pdftotext'):
+        first, last = min(pages), max(pages)
+        texts = _pdftotext(pdf_path, first, last)
+        text_for = lambda number: texts[number - first] if number - first < len(texts) else ""
+    else:
+        text_for = lambda number: reader.pages[number - 1].extract_text() or ""
+    
+    results = []
+    tabular = []
+    
+    for number in pages:
+        page = reader.pages[number - 1]
+        text = text_for(number)
+        
+        # Fonts but (almost) no text over an image: a scanned page with a
+        # stray text object, e.g. a stamp or page number
+        if len(text.strip()) < settings.OCR_MIN_PAGE_CHARS and _has_images(page):
+            results.append({'page': number, 'text': "", 'tables': [], 'needs_ocr': True})
+            continue
+        
+        results.append({'page': number, 'text': text, 'tables': [], 'needs_ocr': False})
+        if looks_tabular(page):
+            tabular.append(number)
+    
+    if tabular:
+        import pdfplumber
+        import pandas as pd
+        
+        by_page = {result['page']: result for result in results}
+        with pdfplumber.open(pdf_path, pages=tabular) as pdf:
+            for page in pdf.pages:
+                for table in page.extract_tables() or []:
+                    df = pd.DataFrame(table[1:], columns=table[0])
+                    by_page[page.page_number]['tables'].append({
+                        'page': page.page_number,
+                        'data': df.to_dict('records')
+                    })
+                page.flush_cache()
+    
+    return results
@@ -1,44 +1,125 @@
 from app.services.vector_store import VectorStore
 from app.services.keyword_search import KeywordSearchService
 from app.services.embedding_service import EmbeddingService
-from typing import List, Dict, Optional
+from app.services.near_duplicates import NearDuplicateIndex
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Dict, Optional, Tuple
 from app.config import settings
+import threading
+import time
+
+class RetrievalUnavailable(RuntimeError):
+    """No retrieval branch produced results (all timed out, failed or were saturated)"""
+    
+    def __init__(self, branches: Dict, errors: List[str]):
+        self.branches = branches
+        super().__init__(
+            "; ".join(errors) or "Retrieval unavailable: " + ", ".join(
+                f"{name} {branch['status']}" for name, branch in branches.items()
+            )
+        )
 
 class RetrievalService:
-    def __init__(self):
-        self.vector_store = VectorStore()
-        self.keyword_search = KeywordSearchService()
-        self.embedding_service = EmbeddingService()
+    def __init__(self, vector_store: Optional[VectorStore] = None,
+                 keyword_search: Optional[KeywordSearchService] = None,
+                 embedding_service: Optional[EmbeddingService] = None,
+                 near_duplicates: Optional[NearDuplicateIndex] = None):
+        self.vector_store = vector_store or VectorStore()
+        self.keyword_search = keyword_search or KeywordSearchService()
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.near_duplicates = near_duplicates
+        
+        # One pool per branch, so a slow backend only ties up its own
+        # branch's threads. A timed-out branch keeps running (it can't be
+        # interrupted); busy counts those too, and a branch whose threads
+        # are all busy is skipped rather than queued behind them.
+        self.executors = {
+            name: ThreadPoolExecutor(
+                max_workers=settings.RETRIEVAL_WORKERS,
+                thread_name_prefix=f"retrieval-{name}"
+            )
+            for name in ('semantic', 'keyword')
+        }
+        self.busy = {name: 0 for name in self.executors}
+        self._busy_lock = threading.Lock()
+        self.branch_timeouts = {
+            'semantic': settings.SEMANTIC_SEARCH_TIMEOUT,
+            'keyword': settings.KEYWORD_SEARCH_TIMEOUT
+        }
     
     def hybrid_search(self, query: str, workspace_id: str,
                      top_k: int = None, filters: Optional[Dict] = None,
                      use_semantic: bool = True, use_keyword: bool = True,
                      semantic_weight: float = 0.7) -> List[Dict]:
         """Hybrid search combining semantic and keyword search"""
+        return self.hybrid_search_detailed(
+            query=query,
+            workspace_id=workspace_id,
+            top_k=top_k,
+            filters=filters,
+            use_semantic=use_semantic,
+            use_keyword=use_keyword,
+            semantic_weight=semantic_weight
+        )['results']
+    
+    def hybrid_search_detailed(self, query: str, workspace_id: str,
+                               top_k: int = None, filters: Optional[Dict] = None,
+                               use_semantic: bool = True, use_keyword: bool = True,
+                               semantic_weight: float = 0.7) -> Dict:
+        """Hybrid search plus per-branch status, timings and degradation info
+        
+        Both branches run concurrently, each with its own deadline. A branch
+        that times out, fails or has no free thread is dropped and the other
+        branch's results are returned on their own; if no branch succeeds,
+        RetrievalUnavailable is raised.
+        """
         
         top_k = top_k or settings.TOP_K
-        results = []
+        started = time.perf_counter()
         
-        # Semantic search
+        searches = {}
         if use_semantic:
-            query_embedding = self.embedding_service.embed_text(query)
-            semantic_results = self.vector_store.search(
-                workspace_id=workspace_id,
-                query_embedding=query_embedding,
-                top_k=top_k * 2,  # Get more for fusion
-                filters=filters
-            )
-            results.append(('semantic', semantic_results))
-        
-        # Keyword search
+            searches['semantic'] = self._semantic_search
         if use_keyword:
-            keyword_results = self.keyword_search.search(
-                query=query,
-                workspace_id=workspace_id,
-                top_k=top_k * 2,
-                filters=filters
-            )
-            results.append(('keyword', keyword_results))
+            searches['keyword'] = self._keyword_search
+        
+        results = []
+        info = {}
+        errors = []
+        
+        branches = {}
+        for name, search in searches.items():
+            future = self._submit(name, search, query, workspace_id,
+                                  top_k * 2, filters)  # Get more for fusion
+            if future is None:
+                info[name] = {'status': 'saturated', 'busy': settings.RETRIEVAL_WORKERS}
+            else:
+                branches[name] = future
+        
+        for name, future in branches.items():
+            remaining = started + self.branch_timeouts[name] - time.perf_counter()
+            
+            try:
+                branch_results, seconds = future.result(timeout=max(0.0, remaining))
+                results.append((name, branch_results))
+                info[name] = {
+                    'status': 'ok',
+                    'seconds': round(seconds, 4),
+                    'count': len(branch_results)
+                }
+            except FutureTimeout:
+                if future.cancel():  # Never started: give its slot back
+                    self._release(name)
+                info[name] = {
+                    'status': 'timeout',
+                    'timeout_seconds': self.branch_timeouts[name]
+                }
+            except Exception as e:
+                errors.append(f"{name}: {str(e)}")
+                info[name] = {'status': 'error', 'error': str(e)}
+        
+        if searches and not results:
+            raise RetrievalUnavailable(info, errors)
         
         # Fusion
         if len(results) == 2:
@@ -50,10 +131,94 @@ class RetrievalService:
         elif len(results) == 1:
             fused = results[0][1]
         else:
-            return []
+            fused = []
+        
+        degraded = [name for name, branch in info.items() if branch['status'] != 'ok']
+        
+        results = fused[:top_k]
+        self._attach_references(workspace_id, results)
         
         # Return top K
-        return fused[:top_k]
+        return {
+            'results': results,
+            'retrieval': {
+                'branches': info,
+                'degraded': bool(degraded),
+                'degraded_branches': degraded,
+                'seconds': round(time.perf_counter() - started, 4)
+            }
+        }
+    
+    def _semantic_search(self, query: str, workspace_id: str, top_k: int,
+                         filters: Optional[Dict]) -> List[Dict]:
+        """Embed the query and search the vector store"""
+        query_embedding = self.embedding_service.embed_text(query)
+        return self.vector_store.search(
+            workspace_id=workspace_id,
+            query_embedding=query_embedding,
+            top_k=top_k,
+            filters=filters
+        )
+    
+    def _keyword_search(self, query: str, workspace_id: str, top_k: int,
+                        filters: Optional[Dict]) -> List[Dict]:
+        """Search the keyword index"""
+        return self.keyword_search.search(
+            query=query,
+            workspace_id=workspace_id,
+            top_k=top_k,
+            filters=filters
+        )
+    
+    def _attach_references(self, workspace_id: str, results: List[Dict]):
+        """List the near-duplicates collapsed into each result at ingest
+        (metadata['references']), so one hit stands for every copy"""
+        if self.near_duplicates is None or not results:
+            return
+        
+        try:
+            references = self.near_duplicates.references(
+                workspace_id, [result['chunk_id'] for result in results]
+            )
+        except Exception as e:
+            print(f"Duplicate references unavailable: {str(e)}")
+            return
+        
+        for result in results:
+            if result['chunk_id'] in references:
+                result['metadata'] = {
+                    **result.get('metadata', {}),
+                    'references': references[result['chunk_id']]
+                }
+    
+    def close(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _submit(self, name: str, fn, *args) -> Optional[Future]:
+        """Start a branch on its pool, or None if all its threads are busy"""
+        with self._busy_lock:
+            if self.busy[name] >= settings.RETRIEVAL_WORKERS:
+                return None
+            self.busy[name] += 1
+        
+        try:
+            return self.executors[name].submit(self._timed, name, fn, *args)
+        except BaseException:
+            self._release(name)
+            raise
+    
+    def _release(self, name: str):
+        with self._busy_lock:
+            self.busy[name] -= 1
+    
+    def _timed(self, name: str, fn, *args) -> Tuple[List[Dict], float]:
+        """Run a branch and return its results with its own duration"""
+        start = time.perf_counter()
+        try:
+            return fn(*args), time.perf_counter() - start
+        finally:
+            self._release(name)
     
     def _reciprocal_rank_fusion(self, results_list: List[tuple],
                                 semantic_weight: float = 0.7,
@@ -0,0 +1,661 @@
+from app.config import settings
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+# Stripped before deciding whether a text value is a number
+NUMBER_NOISE = re.compile(r'[,$€£%\s]')
+WORD = re.compile(r'\w+')
+NUMBER = re.compile(r'(?<![\w.,])-?\d[\d,]*(?:\.\d+)?(?![\w.,]?\w)')
+
+AGGREGATES = [
+    ('sum', re.compile(r'\b(?:total|sum|overall)\b')),
+    ('mean', re.compile(r'\b(?:average|mean|avg)\b')),
+    ('count', re.compile(r'\b(?:how many|count|number of)\b')),
+    ('max', re.compile(r'\b(?:max|maximum|highest|largest|biggest)\b')),
+    ('min', re.compile(r'\b(?:min|minimum|lowest|smallest)\b')),
+]
+ROWS_INTENT = re.compile(r'\b(?:list|show|which|rows?|records?|entries)\b')
+GROUP_BY = re.compile(r'\b(?:by|per|for each|each)\s+$')
+COMPARISON = re.compile(
+    r'(?<!\w)(?P<op>(?:greater|more|higher|larger) than|over|above|exceeding|at least|'
+    r'(?:less|lower|fewer|smaller) than|under|below|at most|>=|<=|>|<|=|equals?|is)'
+    r'\s*\$?(?P<number>-?\d[\d,]*(?:\.\d+)?)'
+)
+COMPARISON_OPS = {
+    'at least': np.greater_equal, '>=': np.greater_equal,
+    'at most': np.less_equal, '<=': np.less_equal,
+    '=': np.equal, 'equal': np.equal, 'equals': np.equal, 'is': np.equal,
+}
+SYMBOLS = {'greater': '>', 'greater_equal': '>=', 'less': '<', 'less_equal': '<=',
+           'equal': '='}
+STOP_WORDS = {'a', 'an', 'and', 'are', 'by', 'for', 'in', 'is', 'of', 'on',
+              'or', 'the', 'to', 'what', 'with'}
+MAX_VALUE_WORDS = 4  # Longest value phrase matched in a question
+
+def _normalize(text: str) -> Tuple[str, ...]:
+    """Lowercase words with a plural 's' dropped, for fuzzy name matching"""
+    return tuple(
+        word[:-1] if len(word) > 3 and word.endswith('s') else word
+        for word in WORD.findall(text.lower())
+    )
+
+def _format(value) -> str:
+    """A number without a trailing .0"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _column_names(names: Iterable) -> List[str]:
+    """Non-empty, unique column names"""
+    result = []
+    seen = set()
+    for i, name in enumerate(names):
+        name = str(name).strip() if name is not None else ""
+        name = name or f"Column{i + 1}"
+        base, n = name, 2
+        while name in seen:
+            name = f"{base} {n}"
+            n += 1
+        seen.add(name)
+        result.append(name)
+    return result
+
+class ColumnWriter:
+    """Appends blocks of text values to one column's files
+    
+    A column is numeric (float64, NaN for blanks) until a block contains a
+    value that doesn't parse as a number; it is then rewritten as text:
+    int32 codes into a dictionary of distinct values (-1 for blanks).
+    """
+    
+    def __init__(self, directory: str, index: int, name: str):
+        self.directory = directory
+        self.index = index
+        self.name = name
+        self.kind = 'number'
+        self.rows = 0
+        self.values: List[str] = []  # Dictionary, text columns only
+        self.codes: Dict[str, int] = {}
+        self.file = open(self._path('f8'), 'wb')
+    
+    def append(self, values):
+        """Append a pandas Series of strings ('' for blanks)"""
+        import pandas as pd
+        
+        values = values.astype(str)
+        blank = values == ""
+        
+        if self.kind == 'number':
+            numbers = pd.to_numeric(values, errors='coerce')
+            # Only clean up the values that didn't parse as they are
+            retry = numbers.isna() & ~blank
+            if retry.any():
+                numbers[retry] = pd.to_numeric(
+                    values[retry].str.replace(NUMBER_NOISE, "", regex=True), errors='coerce'
+                )
+            if (numbers.notna() | blank).all():
+                self.file.write(numbers.to_numpy(dtype=np.float64).tobytes())
+                self.rows += len(values)
+                return
+            self._to_text()
+        
+        for value in values[~blank].unique():
+            if value not in self.codes:
+                self.codes[value] = len(self.values)
+                self.values.append(value)
+        
+        codes = values.map(self.codes).fillna(-1).to_numpy(dtype=np.int32)
+        self.file.write(codes.tobytes())
+        self.rows += len(values)
+    
+    def close(self) -> Dict:
+        """Finish the files and return the column's metadata"""
+        self.file.close()
+        
+        column = {'name': self.name, 'kind': self.kind}
+        if self.kind == 'text':
+            with open(self._path('json'), 'w') as f:
+                json.dump(self.values, f)
+        return column
+    
+    def abort(self):
+        self.file.close()
+    
+    def _to_text(self):
+        """Rewrite the numbers written so far as text codes"""
+        self.file.close()
+        numbers = np.fromfile(self._path('f8'), dtype=np.float64)
+        
+        codes = np.full(len(numbers), -1, dtype=np.int32)
+        for i, number in enumerate(numbers):
+            if number == number:
+                value = str(int(number)) if number.is_integer() else repr(float(number))
+                if value not in self.codes:
+                    self.codes[value] = len(self.values)
+                    self.values.append(value)
+                codes[i] = self.codes[value]
+        
+        self.kind = 'text'
+        self.file = open(self._path('i4'), 'wb')
+        self.file.write(codes.tobytes())
+        os.remove(self._path('f8'))
+    
+    def _path(self, extension: str) -> str:
+        return os.path.join(self.directory, f"{self.index}.{extension}")
+
+class TableWriter:
+    """Writes one table as a directory of column files plus meta.json"""
+    
+    def __init__(self, directory: str, meta: Dict, columns: List[str]):
+        self.directory = directory
+        self.meta = meta
+        os.makedirs(directory)
+        self.columns = [ColumnWriter(directory, i, name) for i, name in enumerate(columns)]
+    
+    def append(self, df):
+        """Append a DataFrame of strings with this table's columns"""
+        for column, (_, values) in zip(self.columns, df.items()):
+            column.append(values)
+    
+    def close(self):
+        self.meta['rows'] = self.columns[0].rows if self.columns else 0
+        self.meta['columns'] = [column.close() for column in self.columns]
+        with open(os.path.join(self.directory, "meta.json"), 'w') as f:
+            json.dump(self.meta, f)
+    
+    def abort(self):
+        for column in self.columns:
+            column.abort()
+
+class TableCollector:
+    """Builds a document's tables while its extraction streams past
+    
+    watch() passes the sections through and appends every CSV/Excel row
+    block (sections with 'columns') to its table; finish() adds the tables
+    extracted from PDF/DOCX and swaps the document's tables in.
+    """
+    
+    def __init__(self, store: "TableStore", workspace_id: str, document_id: str,
+                 filename: str):
+        self.store = store
+        self.workspace_id = workspace_id
+        self.document_id = document_id
+        self.filename = filename
+        self.final_dir = store._document_dir(workspace_id, document_id)
+        self.directory = f"{self.final_dir}.{uuid.uuid4().hex}.tmp"
+        self.writers: Dict[str, TableWriter] = {}
+    
+    def watch(self, sections: Iterable[Dict]) -> Iterator[Dict]:
+        import pandas as pd
+        
+        for section in sections:
+            if section.get('columns'):
+                writer = self._writer(section.get('table') or self.filename,
+                                      section['columns'], section.get('page'))
+                df = pd.read_csv(
+                    io.StringIO(section['text']), header=None, index_col=False,
+                    names=[column.name for column in writer.columns],
+                    dtype=str, keep_default_na=False
+                ).fillna("")
+                writer.append(df)
+            yield section
+    
+    def finish(self, tables: List[Dict]) -> Dict:
+        """Store the collected tables plus extracted ones ({'data': records,
+        'page'/'sheet'}), replacing the document's previous tables"""
+        import pandas as pd
+        
+        try:
+            for i, table in enumerate(tables):
+                if not table.get('data'):
+                    continue
+                df = pd.DataFrame.from_records(table['data'])
+                if df.empty:
+                    continue
+                name = f"table {i + 1}" + (f" (page {table['page']})" if table.get('page') else "")
+                writer = self._writer(table.get('sheet') or name, list(df.columns), table.get('page'))
+                writer.append(df.astype(object).where(df.notna(), "").astype(str))
+            
+            for writer in self.writers.values():
+                writer.close()
+        except BaseException:
+            self.abort()
+            raise
+        
+        rows = sum(writer.meta['rows'] for writer in self.writers.values())
+        self.store._replace(self.directory if self.writers else None, self.final_dir)
+        return {'tables': len(self.writers), 'table_rows': rows}
+    
+    def abort(self):
+        for writer in self.writers.values():
+            writer.abort()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def _writer(self, name: str, columns: List, page: Optional[int]) -> TableWriter:
+        if name not in self.writers:
+            index = len(self.writers)
+            self.writers[name] = TableWriter(
+                os.path.join(self.directory, str(index)),
+                {
+                    'table_id': f"{self.document_id}_table_{index}",
+                    'document_id': self.document_id,
+                    'filename': self.filename,
+                    'name': str(name),
+                    'page': page,
+                    'created_at': time.time()
+                },
+                _column_names(columns)
+            )
+        return self.writers[name]
+
+class Table:
+    """A stored table with its columns memory-mapped on first use"""
+    
+    def __init__(self, directory: str, meta: Dict):
+        self.directory = directory
+        self.meta = meta
+        self.rows = meta['rows']
+        self.columns = {column['name']: (i, column) for i, column in enumerate(meta['columns'])}
+        self._data: Dict[str, np.ndarray] = {}
+        self._values: Dict[str, List[str]] = {}
+        self._lookups: Dict[str, Optional[Dict[Tuple[str, ...], int]]] = {}
+        self._lock = threading.Lock()
+    
+    def kind(self, name: str) -> str:
+        return self.columns[name][1]['kind']
+    
+    def data(self, name: str) -> np.ndarray:
+        """float64 values or int32 codes of a column"""
+        with self._lock:
+            if name not in self._data:
+                index, column = self.columns[name]
+                extension, dtype = ('f8', np.float64) if column['kind'] == 'number' \
+                    else ('i4', np.int32)
+                path = os.path.join(self.directory, f"{index}.{extension}")
+                self._data[name] = np.memmap(path, dtype=dtype, mode='r', shape=(self.rows,)) \
+                    if self.rows else np.empty(0, dtype=dtype)
+            return self._data[name]
+    
+    def values(self, name: str) -> List[str]:
+        """Dictionary of a text column"""
+        with self._lock:
+            if name not in self._values:
+                index, _ = self.columns[name]
+                with open(os.path.join(self.directory, f"{index}.json")) as f:
+                    self._values[name] = json.load(f)
+            return self._values[name]
+    
+    def lookup(self, name: str) -> Optional[Dict[Tuple[str, ...], int]]:
+        """Normalized value -> code for a text column, None when it has more
+        than TABLE_QUERY_MAX_VALUES distinct values (IDs, free text)"""
+        if name not in self._lookups:
+            values = self.values(name)
+            self._lookups[name] = None if len(values) > settings.TABLE_QUERY_MAX_VALUES else {
+                _normalize(value): code for code, value in enumerate(values)
+            }
+        return self._lookups[name]
+    
+    def decode(self, name: str, data: np.ndarray) -> List:
+        if self.kind(name) == 'number':
+            return [None if value != value else
+                    int(value) if value.is_integer() else float(value)
+                    for value in data.tolist()]
+        values = self.values(name)
+        return [values[code] if code >= 0 else None for code in data.tolist()]
+
+class TableStore:
+    """Tables from ingested documents, stored per workspace in columnar form
+    
+    Each table is a directory under TABLE_STORE_DIR/<workspace>/<document>
+    holding meta.json and one raw file per column: float64 for numeric
+    columns, int32 dictionary codes (plus a JSON dictionary) for text.
+    Columns are memory-mapped at query time, so questions like "total
+    amount by region where year is 2023" become vectorized numpy filters
+    and aggregations instead of reading row text back out of the indexes.
+    """
+    
+    def __init__(self, root: str = None):
+        self.root = root or settings.TABLE_STORE_DIR
+        os.makedirs(self.root, exist_ok=True)
+        
+        self._tables: "OrderedDict[str, Tuple[float, Table]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def collector(self, workspace_id: str, document_id: str, filename: str) -> TableCollector:
+        return TableCollector(self, workspace_id, document_id, filename)
+    
+    def delete_document(self, workspace_id: str, document_id: str):
+        self._replace(None, self._document_dir(workspace_id, document_id))
+    
+    def list_tables(self, workspace_id: str) -> List[Dict]:
+        return [table.meta for table in self._workspace_tables(workspace_id)]
+    
+    def query(self, question: str, workspace_id: str,
+              filters: Optional[Dict] = None) -> Optional[Dict]:
+        """Answer an aggregate or row-lookup question from the workspace's
+        tables, or None if it doesn't look like one
+        
+        A table is only considered if the question names one of its
+        columns. The question is then matched against the column names and
+        text values: mentioned values become equality filters, "over
+        1000"-style comparisons become numeric filters on the nearest
+        mentioned numeric column, "by <column>" groups, and total/average/
+        count/highest/lowest pick the aggregation. The best-matching table
+        answers it; 'confident' is False for row lookups, whose answer
+        should accompany text retrieval rather than replace it.
+        """
+        started = time.perf_counter()
+        text = question.lower()
+        words = [(m.group(), m.start(), m.end()) for m in WORD.finditer(text)]
+        normalized = [_normalize(word)[0] for word, _, _ in words]
+        
+        operation = None
+        operation_at = 0
+        for name, pattern in AGGREGATES:
+            match = pattern.search(text)
+            if match:
+                operation, operation_at = name, match.end()
+                break
+        if operation is None and not ROWS_INTENT.search(text):
+            return None
+        
+        best = None
+        for table in self._workspace_tables(workspace_id):
+            if filters and any(key in table.meta and table.meta[key] != value
+                               for key, value in filters.items()):
+                continue
+            plan = self._plan(table, text, words, normalized, operation, operation_at)
+            if plan and (best is None or plan['score'] > best[1]['score']):
+                best = (table, plan)
+        
+        if best is None:
+            return None
+        
+        result = self._execute(*best)
+        result['confident'] = best[1]['confident']
+        result['seconds'] = round(time.perf_counter() - started, 4)
+        return result
+    
+    def describe(self, result: Dict) -> str:
+        """Render a query result as context for the LLM"""
+        lines = [f"Table: {result['name']} from {result['filename']}"]
+        
+        conditions = [f"{f['column']} {f['op']} {_format(f['value'])}" for f in result['filters']]
+        query = result['operation'] if result['operation'] != 'rows' else "rows"
+        if result['column']:
+            query += f" of {result['column']}"
+        if result['group_by']:
+            query += f" by {result['group_by']}"
+        if conditions:
+            query += " where " + " and ".join(conditions)
+        lines.append(f"Query: {query}")
+        lines.append(f"Matching rows: {result['matched_rows']} of {result['total_rows']}")
+        
+        if 'value' in result:
+            lines.append(f"Result: {_format(result['value'])}")
+        else:
+            records = result.get('groups') or result.get('rows') or []
+            if records:
+                columns = list(records[0])
+                lines.append(",".join(columns))
+                lines.extend(",".join("" if r[c] is None else _format(r[c]) for c in columns)
+                             for r in records)
+            if result['truncated']:
+                lines.append(f"(first {len(records)} shown)")
+        
+        return "\n".join(lines)
+    
+    def _plan(self, table: Table, text: str, words: List, normalized: List[str],
+              operation: Optional[str], operation_at: int) -> Optional[Dict]:
+        """Match a question against one table's columns and values"""
+        
+        # Column mentions: (start char, end char, name)
+        mentions = []
+        for name in table.columns:
+            target = _normalize(name)
+            size = len(target)
+            if not size:
+                continue
+            for i in range(len(words) - size + 1):
+                if tuple(normalized[i:i + size]) == target:
+                    mentions.append((words[i][1], words[i + size - 1][2], name))
+        if not mentions:
+            return None  # Only a question that names a column is about this table
+        mentioned = {start for start, _, _ in mentions}
+        
+        # Text values mentioned, longest phrases first
+        value_filters: Dict[str, set] = {}
+        used = set()
+        for size in range(MAX_VALUE_WORDS, 0, -1):
+            for i in range(len(words) - size + 1):
+                span = range(i, i + size)
+                if used.intersection(span) or words[i][1] in mentioned:
+                    continue
+                phrase = tuple(normalized[i:i + size])
+                if size == 1 and (phrase[0] in STOP_WORDS or phrase[0].isdigit()):
+                    continue
+                for name in table.columns:
+                    if table.kind(name) != 'text':
+                        continue
+                    lookup = table.lookup(name)
+                    if lookup and phrase in lookup:
+                        value_filters.setdefault(name, set()).add(lookup[phrase])
+                        used.update(span)
+                        break
+        
+        numeric = [(start, end, name) for start, end, name in mentions
+                   if table.kind(name) == 'number']
+        
+        # Numeric comparisons apply to the closest numeric column before them
+        comparisons = []
+        compared = set()
+        compared_spans = []
+        for match in COMPARISON.finditer(text):
+            compared_spans.append(match.span())
+            before = [m for m in numeric if m[1] <= match.start()]
+            after = [m for m in numeric if m[0] >= match.end()]
+            column = before[-1][2] if before else after[0][2] if after else None
+            if column is None:
+                continue
+            comparisons.append((column, match.group('op'),
+                                float(match.group('number').replace(",", ""))))
+            compared.add(column)
+        
+        group_by = None
+        for start, _, name in mentions:
+            if GROUP_BY.search(text[:start]) and table.kind(name) == 'text':
+                group_by = name
+                break
+        
+        target = None
+        if operation not in (None, 'count'):
+            candidates = [m for m in numeric if m[2] not in compared] or numeric
+            following = [m for m in candidates if m[0] >= operation_at]
+            if following or candidates:
+                target = (following or candidates)[0][2]
+            else:
+                return None  # Nothing to aggregate in this table
+        
+        # A bare number ("in 2023") filters the other numeric column where
+        # it occurs most often (a year rather than an ID that happens to match)
+        for match in NUMBER.finditer(text):
+            if any(start <= match.start() < end for start, end in compared_spans):
+                continue
+            number = float(match.group().replace(",", ""))
+            holders = sorted(
+                (int(np.count_nonzero(table.data(name) == number)), name)
+                for name in table.columns
+                if table.kind(name) == 'number' and name != target and name not in compared
+            )
+            if holders and holders[-1][0] and (len(holders) == 1 or holders[-1][0] > holders[-2][0]):
+                comparisons.append((holders[-1][1], '=', number))
+                compared.add(holders[-1][1])
+        
+        if not (value_filters or comparisons or target or group_by):
+            return None
+        if operation is None and not (value_filters or comparisons):
+            return None  # "show"/"which" with nothing to select by
+        
+        return {
+            'operation': operation or 'rows',
+            # An aggregate answers the question outright; a row lookup may
+            # just share words with prose, so text results are kept too
+            'confident': operation is not None,
+            'column': target,
+            'group_by': group_by,
+            'values': value_filters,
+            'comparisons': comparisons,
+            'score': 2 * len({name for _, _, name in mentions}) + \
+                sum(len(codes) for codes in value_filters.values())
+        }
+    
+    def _execute(self, table: Table, plan: Dict) -> Dict:
+        """Run a plan with vectorized filters and aggregations"""
+        mask = np.ones(table.rows, dtype=bool)
+        filters = []
+        
+        for name, codes in plan['values'].items():
+            mask &= np.isin(table.data(name), np.fromiter(codes, dtype=np.int32))
+            values = table.values(name)
+            filters.append({'column': name, 'op': 'in' if len(codes) > 1 else '=',
+                            'value': ", ".join(sorted(values[code] for code in codes))})
+        
+        for name, op, number in plan['comparisons']:
+            compare = COMPARISON_OPS.get(op)
+            if compare is None:
+                compare = np.less if op.startswith(('less', 'lower', 'fewer', 'smaller',
+                                                    'under', 'below', '<')) else np.greater
+            mask &= compare(table.data(name), number)
+            filters.append({'column': name, 'op': SYMBOLS[compare.__name__], 'value': number})
+        
+        operation = plan['operation']
+        column = plan['column']
+        group_by = plan['group_by']
+        limit = settings.TABLE_QUERY_MAX_ROWS
+        
+        result = {
+            'table_id': table.meta['table_id'],
+            'document_id': table.meta['document_id'],
+            'filename': table.meta['filename'],
+            'name': table.meta['name'],
+            'page': table.meta.get('page'),
+            'operation': operation,
+            'column': column,
+            'group_by': group_by,
+            'filters': filters,
+            'matched_rows': int(mask.sum()),
+            'total_rows': table.rows,
+            'truncated': False
+        }
+        
+        if operation == 'rows':
+            indices = np.flatnonzero(mask)
+            result['truncated'] = len(indices) > limit
+            indices = indices[:limit]
+            data = {name: table.decode(name, table.data(name)[indices]) for name in table.columns}
+            result['rows'] = [dict(zip(data, row)) for row in zip(*data.values())]
+            return result
+        
+        values = table.data(column)[mask] if column else None
+        
+        if group_by is None:
+            if operation == 'count':
+                result['value'] = result['matched_rows']
+            else:
+                values = values[~np.isnan(values)]
+                result['value'] = None if not len(values) else \
+                    round(float(getattr(np, operation)(values)), 6)
+            return result
+        
+        codes = table.data(group_by)[mask]
+        valid = codes >= 0
+        if values is not None:
+            valid &= ~np.isnan(values)
+            values = values[valid]
+        codes = codes[valid]
+        groups = len(table.values(group_by))
+        
+        counts = np.bincount(codes, minlength=groups)
+        if operation == 'count':
+            aggregate = counts.astype(np.float64)
+        elif operation in ('sum', 'mean'):
+            aggregate = np.bincount(codes, weights=values, minlength=groups)
+            if operation == 'mean':
+                aggregate = aggregate / np.maximum(counts, 1)
+        else:
+            aggregate = np.full(groups, -np.inf if operation == 'max' else np.inf)
+            (np.maximum if operation == 'max' else np.minimum).at(aggregate, codes, values)
+        
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-aggregate[present], kind='stable')]
+        result['truncated'] = len(order) > limit
+        
+        label = f"{operation}({column})" if column else "count"
+        group_values = table.values(group_by)
+        result['groups'] = [
+            {group_by: group_values[code], label: round(float(aggregate[code]), 6)}
+            for code in order[:limit].tolist()
+        ]
+        return result
+    
+    def _workspace_tables(self, workspace_id: str) -> List[Table]:
+        """Every table in a workspace, reusing loaded ones that haven't changed"""
+        workspace_dir = os.path.join(self.root, workspace_id)
+        if not os.path.isdir(workspace_dir):
+            return []
+        
+        tables = []
+        for document in os.scandir(workspace_dir):
+            if not document.is_dir() or document.name.endswith('.tmp'):
+                continue
+            for entry in os.scandir(document.path):
+                meta_path = os.path.join(entry.path, "meta.json")
+                try:
+                    mtime = os.stat(meta_path).st_mtime
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                tables.append(self._load(entry.path, meta_path, mtime))
+        return tables
+    
+    def _load(self, directory: str, meta_path: str, mtime: float) -> Table:
+        with self._lock:
+            cached = self._tables.get(directory)
+            if cached and cached[0] == mtime:
+                self._tables.move_to_end(directory)
+                return cached[1]
+        
+        with open(meta_path) as f:
+            table = Table(directory, json.load(f))
+        
+        with self._lock:
+            self._tables[directory] = (mtime, table)
+            self._tables.move_to_end(directory)
+            while len(self._tables) > settings.TABLE_CACHE_SIZE:
+                self._tables.popitem(last=False)
+        return table
+    
+    def _document_dir(self, workspace_id: str, document_id: str) -> str:
+        return os.path.join(self.root, workspace_id, document_id)
+    
+    def _replace(self, new_dir: Optional[str], final_dir: str):
+        """Swap a document's table directory (or remove it when new_dir is None)"""
+        if os.path.isdir(final_dir):
+            old_dir = f"{final_dir}.{uuid.uuid4().hex}.tmp"
+            os.rename(final_dir, old_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        if new_dir is not None:
+            os.rename(new_dir, final_dir)
+        
+        with self._lock:
+            for directory in [d for d in self._tables if d.startswith(final_dir + os.sep)]:
+                del self._tables[directory]
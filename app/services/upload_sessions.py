@@ -0,0 +1,196 @@
+from app.config import settings
+from typing import AsyncIterator, Dict, List, Optional
+import aiofiles
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+CLEANUP_INTERVAL = 600  # seconds between scans for abandoned sessions
+
+class UploadSessionError(Exception):
+    """Invalid request against an upload session"""
+
+class UploadSessionStore:
+    """Resumable uploads kept on disk so any API worker can take any part
+    
+    Each session is a directory under TEMP_DIR/upload_sessions holding
+    session.json and one file per received part. Parts are written to a
+    temp name and renamed, so a dropped connection never leaves a
+    half-written part behind and the part can simply be re-sent.
+    """
+    
+    def __init__(self, root: str = None):
+        self.root = root or os.path.join(settings.TEMP_DIR, "upload_sessions")
+        os.makedirs(self.root, exist_ok=True)
+        self._cleaned_at = 0.0
+    
+    def create(self, filename: str, workspace_id: str, size: int,
+               part_size: Optional[int] = None) -> Dict:
+        if size <= 0:
+            raise UploadSessionError("size must be positive")
+        if size > settings.RESUMABLE_MAX_FILE_SIZE:
+            raise UploadSessionError(
+                f"File exceeds {settings.RESUMABLE_MAX_FILE_SIZE} bytes"
+            )
+        
+        self.cleanup_expired()
+        
+        part_size = part_size or settings.RESUMABLE_PART_SIZE
+        part_size = max(settings.RESUMABLE_MIN_PART_SIZE, min(part_size, size))
+        
+        session = {
+            'upload_id': uuid.uuid4().hex,
+            'filename': os.path.basename(filename),
+            'workspace_id': workspace_id,
+            'size': size,
+            'part_size': part_size,
+            'part_count': -(-size // part_size),
+            'created_at': time.time()
+        }
+        
+        directory = self._dir(session['upload_id'])
+        os.makedirs(directory)
+        with open(os.path.join(directory, "session.json"), 'w') as f:
+            json.dump(session, f)
+        
+        return session
+    
+    def get(self, upload_id: str) -> Dict:
+        try:
+            with open(os.path.join(self._dir(upload_id), "session.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+    
+    def expected_part_size(self, session: Dict, part_number: int) -> int:
+        if not 1 <= part_number <= session['part_count']:
+            raise UploadSessionError(
+                f"part_number must be between 1 and {session['part_count']}"
+            )
+        if part_number < session['part_count']:
+            return session['part_size']
+        return session['size'] - session['part_size'] * (session['part_count'] - 1)
+    
+    async def write_part(self, upload_id: str, part_number: int,
+                         chunks: AsyncIterator[bytes]) -> Dict:
+        """Stream one part from the request body straight to disk"""
+        session = self.get(upload_id)
+        expected = self.expected_part_size(session, part_number)
+        
+        part_path = self._part_path(upload_id, part_number)
+        temp_path = f"{part_path}.{uuid.uuid4().hex}.tmp"
+        written = 0
+        
+        try:
+            async with aiofiles.open(temp_path, 'wb') as out:
+                async for chunk in chunks:
+                    written += len(chunk)
+                    if written > expected:
+                        raise UploadSessionError(
+                            f"Part {part_number} must be {expected} bytes"
+                        )
+                    await out.write(chunk)
+            
+            if written != expected:
+                raise UploadSessionError(
+                    f"Part {part_number} must be {expected} bytes, got {written}"
+                )
+            os.replace(temp_path, part_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        return {'part_number': part_number, 'size': written}
+    
+    def received_parts(self, upload_id: str) -> List[int]:
+        parts = []
+        for name in os.listdir(self._dir(upload_id)):
+            if name.startswith("part_") and not name.endswith(".tmp"):
+                parts.append(int(name[len("part_"):]))
+        return sorted(parts)
+    
+    def progress(self, upload_id: str) -> Dict:
+        """Received parts, missing parts and received byte ranges"""
+        session = self.get(upload_id)
+        received = self.received_parts(upload_id)
+        received_set = set(received)
+        
+        # Merge consecutive parts into [start, end) byte ranges
+        ranges = []
+        for part in received:
+            start = (part - 1) * session['part_size']
+            end = start + self.expected_part_size(session, part)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        
+        return {
+            **session,
+            'received_parts': received,
+            'missing_parts': [
+                part for part in range(1, session['part_count'] + 1)
+                if part not in received_set
+            ],
+            'received_ranges': ranges,
+            'bytes_received': sum(end - start for start, end in ranges)
+        }
+    
+    def assemble(self, upload_id: str) -> Dict:
+        """Concatenate all parts into one temp file, hashing as it goes
+        
+        Parts are copied block by block, never loaded whole. Returns the
+        same shape as stream_to_temp.
+        """
+        session = self.get(upload_id)
+        missing = self.progress(upload_id)['missing_parts']
+        if missing:
+            raise UploadSessionError(f"Missing parts: {missing[:20]}")
+        
+        temp_path = os.path.join(settings.TEMP_DIR, f"upload_{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        header = b""
+        
+        with open(temp_path, 'wb') as out:
+            for part in range(1, session['part_count'] + 1):
+                with open(self._part_path(upload_id, part), 'rb') as f:
+                    for block in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b''):
+                        if not header:
+                            header = block[:2048]
+                        digest.update(block)
+                        out.write(block)
+        
+        return {
+            'temp_path': temp_path,
+            'size': session['size'],
+            'content_hash': digest.hexdigest(),
+            'header': header
+        }
+    
+    def delete(self, upload_id: str):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+    
+    def cleanup_expired(self):
+        """Drop sessions older than RESUMABLE_UPLOAD_TTL (scans at most once
+        every CLEANUP_INTERVAL seconds, so callers can run it on any request)"""
+        now = time.time()
+        if now - self._cleaned_at < CLEANUP_INTERVAL:
+            return
+        self._cleaned_at = now
+        
+        cutoff = now - settings.RESUMABLE_UPLOAD_TTL
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+    
+    def _dir(self, upload_id: str) -> str:
+        # upload ids are uuid hex; refuse anything that could escape root
+        if len(upload_id) != 32 or not all(c in "0123456789abcdef" for c in upload_id):
+            raise KeyError(upload_id)
+        return os.path.join(self.root, upload_id)
+    
+    def _part_path(self, upload_id: str, part_number: int) -> str:
+        return os.path.join(self._dir(upload_id), f"part_{part_number:06d}")
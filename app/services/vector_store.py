@@ -1,32 +1,95 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from app.config import settings
+import numpy as np
+import threading
+import time
 import uuid
 
+COLLECTION_PREFIX = "workspace_"
+
 class VectorStore:
     def __init__(self):
-        self.client = chromadb.Client(ChromaSettings(
-            persist_directory=settings.CHROMA_PERSIST_DIR,
-            anonymized_telemetry=False
-        ))
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        # PersistentClient writes to disk; chromadb.Client(Settings(...)) on
+        # 0.4.x is in-memory and loses every vector on restart.
+        self.client = chromadb.PersistentClient(
+            path=settings.CHROMA_PERSIST_DIR,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        
+        # Collection handles by workspace, looked up once per process
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.reload_timings: Dict[str, Dict] = {}
     
     def create_collection(self, workspace_id: str):
-        """Create or get a collection for a workspace"""
-        collection_name = f"workspace_{workspace_id}"
+        """Create or get a collection for a workspace (cached handle)"""
+        collection = self._collections.get(workspace_id)
+        if collection is not None:
+            return collection
+        
+        with self._lock:
+            collection = self._collections.get(workspace_id)
+            if collection is None:
+                collection = self._open_collection(workspace_id)
+                self._collections[workspace_id] = collection
+        
+        return collection
+    
+    def reload_workspaces(self) -> Dict[str, Dict]:
+        """Reopen every persisted workspace collection without re-embedding
+        
+        Each collection's HNSW index is loaded from disk by a one-row query,
+        so the first real search doesn't pay for it. Returns per-workspace
+        vector counts and reload seconds.
+        """
+        for listed in self.client.list_collections():
+            if not listed.name.startswith(COLLECTION_PREFIX):
+                continue
+            
+            workspace_id = (listed.metadata or {}).get(
+                'workspace_id', listed.name[len(COLLECTION_PREFIX):]
+            )
+            start = time.perf_counter()
+            
+            collection = self.create_collection(workspace_id)
+            count = collection.count()
+            if count:
+                sample = collection.get(limit=1, include=['embeddings'])
+                collection.query(query_embeddings=sample['embeddings'], n_results=1)
+            
+            self.reload_timings[workspace_id] = {
+                'vectors': count,
+                'seconds': round(time.perf_counter() - start, 4)
+            }
+        
+        return self.reload_timings
+    
+    def stats(self) -> Dict:
+        """Open workspaces and how long each took to reload at startup"""
+        return {
+            'open_workspaces': len(self._collections),
+            'reload': dict(self.reload_timings)
+        }
+    
+    def _open_collection(self, workspace_id: str):
+        """Get the workspace collection, creating it on first use"""
+        collection_name = f"{COLLECTION_PREFIX}{workspace_id}"
         
         try:
-            collection = self.client.get_collection(collection_name)
-        except:
-            collection = self.client.create_collection(
+            return self.client.get_collection(collection_name)
+        except ValueError:
+            # Doesn't exist yet. Embeddings are unit length, so inner
+            # product == cosine.
+            return self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"workspace_id": workspace_id}
+                metadata={"workspace_id": workspace_id, "hnsw:space": "ip"}
             )
-        
-        return collection
     
     def add_chunks(self, workspace_id: str, chunks: List[Dict], 
-                   embeddings: List[List[float]]):
+                   embeddings: np.ndarray):
         """Add chunks with embeddings to the collection"""
         collection = self.create_collection(workspace_id)
         
@@ -38,20 +101,22 @@ class VectorStore:
             **chunk.get('metadata', {})
         } for chunk in chunks]
         
+        # Chroma's client API only takes nested lists; convert once here,
+        # at the backend boundary, in a single C-level pass
         collection.add(
             ids=ids,
-            embeddings=embeddings,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
             documents=documents,
             metadatas=metadatas
         )
     
-    def search(self, workspace_id: str, query_embedding: List[float],
+    def search(self, workspace_id: str, query_embedding: np.ndarray,
                top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
         """Semantic search using query embedding"""
         collection = self.create_collection(workspace_id)
         
         results = collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=[np.asarray(query_embedding, dtype=np.float32).tolist()],
             n_results=top_k,
             where=filters if filters else None
         )
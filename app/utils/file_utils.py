@@ -0,0 +1,185 @@
+from typing import Dict, Iterable, List, Tuple
+import aiofiles
+import aiofiles.os
+import hashlib
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+
+MIME_SNIFF_BYTES = 2048  # libmagic only needs the file header
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2')
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload crosses the size limit"""
+
+async def stream_to_temp(source, temp_dir: str, max_size: int,
+                         chunk_size: int) -> Dict:
+    """Copy an async readable (e.g. UploadFile) to a temp file in fixed-size chunks
+    
+    Hashes and counts bytes on the fly and raises UploadTooLarge (removing
+    the partial file) the moment max_size is exceeded, so memory use is one
+    chunk regardless of file size. Returns the temp path, size, SHA-256 and
+    the first MIME_SNIFF_BYTES bytes for type detection.
+    """
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f"upload_{uuid.uuid4().hex}.part")
+    
+    digest = hashlib.sha256()
+    header = b""
+    size = 0
+    
+    try:
+        async with aiofiles.open(temp_path, 'wb') as out:
+            while True:
+                chunk = await source.read(chunk_size)
+                if not chunk:
+                    break
+                
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"File exceeds {max_size} bytes")
+                
+                if len(header) < MIME_SNIFF_BYTES:
+                    header += chunk[:MIME_SNIFF_BYTES - len(header)]
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await remove_quietly(temp_path)
+        raise
+    
+    return {
+        'temp_path': temp_path,
+        'size': size,
+        'content_hash': digest.hexdigest(),
+        'header': header
+    }
+
+def move_into_place(temp_path: str, final_path: str):
+    """Atomically rename a finished temp file to its final location"""
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    try:
+        os.replace(temp_path, final_path)
+    except OSError:
+        # TEMP_DIR on another filesystem: copy, then swap in atomically
+        staging = f"{final_path}.{uuid.uuid4().hex}.tmp"
+        shutil.move(temp_path, staging)
+        os.replace(staging, final_path)
+
+async def remove_quietly(path: str):
+    """Delete a file if it still exists"""
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def copy_to_temp(source, temp_dir: str, max_size: int, chunk_size: int) -> Dict:
+    """Blocking counterpart of stream_to_temp for file-like objects
+    (e.g. archive members); same return value and size enforcement"""
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f"upload_{uuid.uuid4().hex}.part")
+    
+    digest = hashlib.sha256()
+    header = b""
+    size = 0
+    
+    try:
+        with open(temp_path, 'wb') as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"File exceeds {max_size} bytes")
+                
+                if len(header) < MIME_SNIFF_BYTES:
+                    header += chunk[:MIME_SNIFF_BYTES - len(header)]
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    
+    return {
+        'temp_path': temp_path,
+        'size': size,
+        'content_hash': digest.hexdigest(),
+        'header': header
+    }
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def extract_archive(archive_path: str, temp_dir: str, allowed_extensions: Iterable[str],
+                    max_member_size: int, max_members: int,
+                    chunk_size: int) -> Tuple[List[Dict], List[Dict]]:
+    """Copy the documents in a zip or tar archive to temp files one at a time
+    
+    Members are streamed (never read whole), directory structure is
+    flattened and anything that isn't a regular file with an allowed
+    extension is skipped, as are members over max_member_size. Returns
+    (copied, skipped); each copied entry is a copy_to_temp result plus its
+    filename.
+    """
+    allowed = {ext.lower() for ext in allowed_extensions}
+    copied: List[Dict] = []
+    skipped: List[Dict] = []
+    
+    def members():
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        yield info.filename, info.file_size, lambda info=info: archive.open(info)
+        elif tarfile.is_tarfile(archive_path):
+            with tarfile.open(archive_path, mode='r:*') as archive:
+                for info in archive:
+                    if info.isfile():
+                        yield info.name, info.size, lambda info=info: archive.extractfile(info)
+        else:
+            raise ValueError("Not a zip or tar archive")
+    
+    try:
+        for name, size, open_member in members():
+            filename = os.path.basename(name)
+            ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+            
+            if not filename or filename.startswith('.') or '__MACOSX' in name:
+                continue
+            if ext not in allowed:
+                skipped.append({'filename': name, 'reason': 'unsupported file type'})
+                continue
+            if size > max_member_size:
+                skipped.append({'filename': name, 'reason': f'exceeds {max_member_size} bytes'})
+                continue
+            if len(copied) >= max_members:
+                skipped.append({'filename': name, 'reason': f'more than {max_members} files'})
+                continue
+            
+            try:
+                with open_member() as source:
+                    entry = copy_to_temp(source, temp_dir, max_member_size, chunk_size)
+            except UploadTooLarge as e:
+                # The header lied about the size
+                skipped.append({'filename': name, 'reason': str(e)})
+                continue
+            
+            entry['filename'] = filename
+            copied.append(entry)
+    except BaseException:
+        for entry in copied:
+            try:
+                os.remove(entry['temp_path'])
+            except FileNotFoundError:
+                pass
+        raise
+    
+    return copied, skipped
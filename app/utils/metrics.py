@@ -0,0 +1,53 @@
+from bisect import bisect_left
+from typing import Dict, List
+import threading
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last bucket is +inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+
+            target = q * self.count
+            seen = 0
+            for i, bucket_count in enumerate(self._counts):
+                seen += bucket_count
+                if seen >= target:
+                    return self.buckets[i] if i < len(self.buckets) else self.max
+
+            return self.max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+            counts = dict(zip(labels, self._counts))
+            count, total, maximum = self.count, self.total, self.max
+
+        return {
+            'count': count,
+            'mean': round(total / count, 4) if count else 0.0,
+            'max': round(maximum, 4),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': counts
+        }
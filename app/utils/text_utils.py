@@ -1,91 +1,279 @@
-from typing import List
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional
 from app.config import settings
+import copy
 import re
+import threading
+
+# Unterminated text at the end of a section is kept with the start of the
+# next one (a sentence running across a page break), up to this length
+MAX_CARRY_CHARS = 1000
+
+# End punctuation, optional closing quotes/brackets, then the whitespace
+# between sentences (group 1)
+SENTENCE_BREAK = re.compile(r'[.!?]["\'”’»)\]]*(\s+)')
+CLOSERS = '"\'”’»)]'
+SPECIAL_CHARS = re.compile(r'[^\w\s\.\,\!\?\;\:\-\(\)]')
+ROW = re.compile(r'[^\n]+')
+WORD = re.compile(r'\w+')
+
+class Sentence(NamedTuple):
+    """A sentence as a span of its section's text, never a copy of it"""
+    text: str  # The whole section text
+    start: int
+    end: int
+    offset: int  # Where the section starts in the document
+    page: Optional[int]
+    tokens: int
+    glued: bool  # Continues the previous section's last sentence
+
+def load_tokenizer(name: str) -> Optional[Callable[[List[str]], List[int]]]:
+    """Token counter for a list of texts using a model's tokenizer
+    
+    Returns None (count whitespace words instead) for "whitespace" or when
+    the tokenizer can't be loaded, e.g. offline without a cached model.
+    The counter is safe to call from several threads at once.
+    """
+    if name == "whitespace":
+        return None
+    
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"Could not load tokenizer {name}, counting words instead: {str(e)}")
+        return None
+    
+    # Fast tokenizers can fail ("Already borrowed") when one instance is
+    # called from several threads, so each thread counts with its own copy
+    local = threading.local()
+    
+    def count(texts: List[str]) -> List[int]:
+        own = getattr(local, 'tokenizer', None)
+        if own is None:
+            own = local.tokenizer = copy.deepcopy(tokenizer)
+        ids = own(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )['input_ids']
+        return [len(token_ids) for token_ids in ids]
+    
+    return count
 
 class TextChunker:
-    def __init__(self, chunk_size: int = None, overlap: int = None):
+    """Sentence-aligned, overlapping chunks sized in embedding-model tokens
+    
+    One pass over the text: sentence boundaries are found with a single
+    regex scan per section, each section's sentences are token-counted in
+    one batched tokenizer call, and the chunk being built is a deque of
+    spans with a running token total, so emitting a chunk and computing
+    its overlap costs O(sentences in the chunk) however long the document.
+    Text is only copied (and cleaned) when a chunk is emitted.
+    """
+    
+    def __init__(self, chunk_size: int = None, overlap: int = None,
+                 tokenizer: str = None):
         self.chunk_size = chunk_size or settings.CHUNK_SIZE
-        self.overlap = overlap or settings.CHUNK_OVERLAP
+        self.overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+        self.tokenizer_name = tokenizer or settings.CHUNK_TOKENIZER or settings.EMBEDDING_MODEL
+        self._count_tokens = None
+        self._tokenizer_loaded = False
+        self._tokenizer_lock = threading.Lock()  # Guards the one-time tokenizer load
     
     def chunk_text(self, text: str, document_id: str) -> List[dict]:
         """Split text into overlapping chunks"""
+        return list(self.iter_chunks([{'text': text}], document_id))
+    
+    def iter_chunks(self, sections: Iterable[Dict], document_id: str) -> Iterator[dict]:
+        """Split a stream of sections ({'text', 'page'}) into overlapping
+        chunks, yielding each chunk as soon as it is full
         
-        # Clean text
-        text = self._clean_text(text)
-        
-        # Split into sentences
-        sentences = self._split_sentences(text)
-        
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        Each chunk records its token count, the page its first sentence
+        came from (and page_end if it runs onto later pages) and start_char
+        / end_char offsets into the concatenated section texts. Sections
+        with a 'header' are table rows (one per line) and are packed into
+        chunks of whole rows instead, see _row_chunks.
+        """
+        current: Deque[Sentence] = deque()
+        current_tokens = 0
         chunk_index = 0
+        offset = 0
+        glue_next = False
         
-        for sentence in sentences:
-            sentence_length = len(sentence.split())
+        for section in sections:
+            if section.get('header') is not None:
+                if current:
+                    yield self._make_chunk(current, current_tokens, document_id, chunk_index)
+                    chunk_index += 1
+                    current.clear()
+                    current_tokens = 0
+                
+                for chunk in self._row_chunks(section, offset, document_id, chunk_index):
+                    yield chunk
+                    chunk_index += 1
+                
+                glue_next = False
+                offset += len(section['text'])
+                continue
+            
+            sentences, glue_next = self._sentences(section, offset, glue_next)
+            offset += len(section['text'])
             
-            # If adding this sentence exceeds chunk size
-            if current_length + sentence_length > self.chunk_size and current_chunk:
-                # Save current chunk
-                chunk_text = " ".join(current_chunk)
-                chunks.append({
-                    'chunk_id': f"{document_id}_chunk_{chunk_index}",
-                    'document_id': document_id,
-                    'content': chunk_text,
-                    'chunk_index': chunk_index,
-                    'word_count': current_length
-                })
+            for sentence in sentences:
+                # If adding this sentence exceeds chunk size (never between the
+                # two halves of a sentence split by a section break)
+                if current_tokens + sentence.tokens > self.chunk_size and current \
+                        and not sentence.glued:
+                    yield self._make_chunk(current, current_tokens, document_id, chunk_index)
+                    chunk_index += 1
+                    
+                    # Start new chunk with overlap: the longest run of trailing
+                    # sentences within the overlap budget that still leaves room
+                    # for this sentence
+                    while current and (current_tokens > self.overlap or
+                                       current_tokens + sentence.tokens > self.chunk_size):
+                        current_tokens -= current.popleft().tokens
                 
-                # Start new chunk with overlap
-                overlap_sentences = self._get_overlap_sentences(
-                    current_chunk, self.overlap
-                )
-                current_chunk = overlap_sentences + [sentence]
-                current_length = sum(len(s.split()) for s in current_chunk)
-                chunk_index += 1
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
+                current.append(sentence)
+                current_tokens += sentence.tokens
         
         # Add final chunk
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
-            chunks.append({
+        if current:
+            yield self._make_chunk(current, current_tokens, document_id, chunk_index)
+    
+    def _sentences(self, section: Dict, offset: int, glue_next: bool):
+        """Sentence spans of a section, with token counts, and whether its
+        last sentence may continue in the next section"""
+        text = section['text']
+        page = section.get('page')
+        
+        spans = []
+        start = 0
+        for match in SENTENCE_BREAK.finditer(text):
+            spans.append((start, match.start(1)))
+            start = match.end(1)
+        spans.append((start, len(text)))
+        spans = [self._strip(text, s, e) for s, e in spans]
+        spans = [(s, e) for s, e in spans if s < e]
+        
+        if not spans:
+            return [], glue_next
+        
+        counts = self._count([text[s:e] for s, e in spans])
+        sentences = [
+            Sentence(text, start, end, offset, page, tokens, glued=glue_next and i == 0)
+            for i, ((start, end), tokens) in enumerate(zip(spans, counts))
+        ]
+        
+        last_start, last_end = spans[-1]
+        glue_next = last_end - last_start <= MAX_CARRY_CHARS and \
+            text[last_start:last_end].rstrip(CLOSERS)[-1:] not in ('.', '!', '?')
+        
+        return sentences, glue_next
+    
+    def _row_chunks(self, section: Dict, offset: int, document_id: str,
+                    chunk_index: int) -> Iterator[dict]:
+        """Pack a block of table rows into chunks of whole rows, each
+        starting with the section's header (file/sheet name and columns)
+        
+        Rows never overlap or get split, and are not cleaned: separators,
+        signs and dates are part of the data.
+        """
+        text = section['text']
+        header = section['header']
+        spans = [match.span() for match in ROW.finditer(text) if not match.group().isspace()]
+        if not spans:
+            return
+        
+        header_tokens, *counts = self._count([header] + [text[s:e] for s, e in spans], rows=True)
+        budget = max(1, self.chunk_size - header_tokens)
+        
+        first = 0
+        tokens = 0
+        for i, count in enumerate(counts + [None]):
+            if i < len(spans) and (i == first or tokens + count <= budget):
+                tokens += count
+                continue
+            
+            start, end = spans[first][0], spans[i - 1][1]
+            chunk = {
                 'chunk_id': f"{document_id}_chunk_{chunk_index}",
                 'document_id': document_id,
-                'content': chunk_text,
+                'content': f"{header}\n{text[start:end]}",
                 'chunk_index': chunk_index,
-                'word_count': current_length
-            })
+                'token_count': header_tokens + tokens,
+                'start_char': offset + start,
+                'end_char': offset + end
+            }
+            if section.get('page') is not None:
+                chunk['page'] = chunk['page_end'] = section['page']
+            yield chunk
+            
+            chunk_index += 1
+            first = i
+            tokens = count
+    
+    def _make_chunk(self, sentences: Deque[Sentence], tokens: int,
+                    document_id: str, chunk_index: int) -> dict:
+        """Copy out and clean the chunk's text (one slice per section)"""
+        parts = []
+        run_start = sentences[0]
+        previous = sentences[0]
         
-        return chunks
+        for sentence in sentences:
+            if sentence.offset != previous.offset:  # Next section
+                parts.append(self._clean_text(previous.text[run_start.start:previous.end]))
+                run_start = sentence
+            previous = sentence
+        parts.append(self._clean_text(previous.text[run_start.start:previous.end]))
+        
+        chunk = {
+            'chunk_id': f"{document_id}_chunk_{chunk_index}",
+            'document_id': document_id,
+            'content': " ".join(part for part in parts if part),
+            'chunk_index': chunk_index,
+            'token_count': tokens,
+            'start_char': sentences[0].offset + sentences[0].start,
+            'end_char': previous.offset + previous.end
+        }
+        
+        pages = [sentence.page for sentence in sentences if sentence.page is not None]
+        if pages:
+            chunk['page'] = pages[0]
+            chunk['page_end'] = pages[-1]
+        
+        return chunk
+    
+    def _count(self, sentences: List[str], rows: bool = False) -> List[int]:
+        """Tokens per sentence (whitespace words without a tokenizer, or
+        words and numbers for table rows, which have few spaces)"""
+        if not self._tokenizer_loaded:
+            with self._tokenizer_lock:
+                if not self._tokenizer_loaded:
+                    self._count_tokens = load_tokenizer(self.tokenizer_name)
+                    self._tokenizer_loaded = True
+        
+        if self._count_tokens is not None:
+            return self._count_tokens(sentences)
+        
+        if rows:
+            return [len(WORD.findall(sentence)) for sentence in sentences]
+        return [len(sentence.split()) for sentence in sentences]
+    
+    def _strip(self, text: str, start: int, end: int):
+        """Shrink a span to exclude surrounding whitespace"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
     
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
         # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', '', text)
-        return text.strip()
-    
-    def _split_sentences(self, text: str) -> List[str]:
-        """Split text into sentences"""
-        # Simple sentence splitter
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
-    def _get_overlap_sentences(self, sentences: List[str], 
-                               overlap_tokens: int) -> List[str]:
-        """Get last N tokens worth of sentences for overlap"""
-        overlap = []
-        token_count = 0
-        
-        for sentence in reversed(sentences):
-            sentence_tokens = len(sentence.split())
-            if token_count + sentence_tokens <= overlap_tokens:
-                overlap.insert(0, sentence)
-                token_count += sentence_tokens
-            else:
-                break
-        
-        return overlap
\ No newline at end of file
+        text = SPECIAL_CHARS.sub('', text)
+        # Collapse whitespace (split/join beats a regex substitution here)
+        return " ".join(text.split())
@@ -0,0 +1,135 @@
+#Ingestion workers: separate processes that take jobs from the durable
+#queue and run the extract/chunk/embed/index pipeline, so CPU-heavy
+#parsing and OCR never run inside the web workers.
+#
+#Run standalone with:  python -m app.worker
+
+from app.config import settings
+from app.models.schemas import DocumentStatus
+from app.services.job_queue import JobQueue
+from typing import Dict, List
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+def _heartbeat(queue: JobQueue, job_id: str, stop: threading.Event):
+    """Keep a long-running job from being treated as abandoned"""
+    while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+        queue.heartbeat(job_id)
+
+def _process_batch(queue: JobQueue, ingestion, job: Dict) -> Dict:
+    """Run a batch job, skipping documents a previous attempt already indexed"""
+    batch_id = job['job_id']
+    done = {
+        document['document_id'] for document in queue.get_batch(batch_id)['documents']
+        if document['status'] == DocumentStatus.COMPLETED.value
+    }
+    documents = [
+        document for document in job['payload']['documents']
+        if document['document_id'] not in done
+    ]
+    
+    return ingestion.process_batch(
+        workspace_id=job['workspace_id'],
+        documents=documents,
+        progress=lambda stage, fraction: queue.update_progress(
+            batch_id, stage, fraction
+        ),
+        on_document=lambda document_id, status, **result: queue.update_batch_document(
+            batch_id, document_id, status, **result
+        )
+    )
+
+def run_worker(name: str, stop_event):
+    """Worker process main loop"""
+    # Ctrl+C goes to the whole process group; let the pool stop us cleanly
+    # between jobs instead of dying mid-document.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    from app.services.container import get_container
+    from app.services.ingestion_service import IngestionService
+    
+    queue = JobQueue()
+    services = get_container()
+    ingestion = IngestionService(services)
+    
+    try:
+        while not stop_event.is_set():
+            job = queue.claim(name, kinds=["document", "batch"])
+            if job is None:
+                stop_event.wait(settings.JOB_POLL_INTERVAL)
+                continue
+            
+            job_id = job['job_id']
+            beating = threading.Event()
+            threading.Thread(
+                target=_heartbeat, args=(queue, job_id, beating), daemon=True
+            ).start()
+            
+            try:
+                if job['kind'] == "batch":
+                    timings = _process_batch(queue, ingestion, job)
+                else:
+                    timings = ingestion.process_document(
+                        document_id=job['document_id'],
+                        workspace_id=job['workspace_id'],
+                        progress=lambda stage, fraction: queue.update_progress(
+                            job_id, stage, fraction
+                        ),
+                        **job['payload']
+                    )
+                queue.complete(job_id, timings)
+            except Exception as e:
+                print(f"[{name}] Error processing {job['document_id'] or job_id}: {str(e)}")
+                queue.fail(job_id, str(e))
+            finally:
+                beating.set()
+    finally:
+        services.close()
+
+class IngestionWorkerPool:
+    """A fixed set of ingestion worker processes"""
+    
+    def __init__(self, workers: int = None):
+        self.workers = settings.INGEST_WORKERS if workers is None else workers
+        # spawn: don't inherit the parent's threads, locks or loaded model
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._processes: List[multiprocessing.Process] = []
+    
+    def start(self):
+        for i in range(self.workers):
+            # Not daemonic, so workers may start their own process pools (OCR)
+            process = self._context.Process(
+                target=run_worker,
+                args=(f"ingest-{os.getpid()}-{i}", self._stop),
+                name=f"ingest-worker-{i}"
+            )
+            process.start()
+            self._processes.append(process)
+    
+    def stop(self, timeout: float = 30.0):
+        """Ask workers to finish their current job and exit"""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        
+        self._processes = []
+
+if __name__ == "__main__":
+    pool = IngestionWorkerPool()
+    pool.start()
+    print(f"Started {pool.workers} ingestion workers")
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping ingestion workers...")
+        pool.stop()
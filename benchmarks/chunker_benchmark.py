@@ -0,0 +1,139 @@
+#Chunks/second of TextChunker on large documents, against the chunker it
+#replaced (kept below as LegacyTextChunker: whitespace "tokens", repeated
+#split() and an O(n^2) overlap rebuild).
+#
+#Usage:
+#    python -m benchmarks.chunker_benchmark [--sizes 1,5,20] [--file DOC.txt]
+#
+#Without --file, synthetic documents of the given sizes (MB) are generated.
+#The new chunker is run twice: counting whitespace words (same unit as the
+#legacy one) and counting tokens with the embedding model's tokenizer.
+
+from app.config import settings
+from app.utils.text_utils import TextChunker
+from typing import Callable, Dict, List
+import argparse
+import random
+import re
+import time
+
+class LegacyTextChunker:
+    """TextChunker.chunk_text as it was before the streaming rewrite"""
+    
+    def __init__(self, chunk_size: int, overlap: int):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+    
+    def chunk_text(self, text: str, document_id: str) -> List[dict]:
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', '', text).strip()
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+        
+        chunks = []
+        current_chunk = []
+        current_length = 0
+        chunk_index = 0
+        
+        for sentence in sentences:
+            sentence_length = len(sentence.split())
+            if current_length + sentence_length > self.chunk_size and current_chunk:
+                chunks.append({
+                    'chunk_id': f"{document_id}_chunk_{chunk_index}",
+                    'content': " ".join(current_chunk),
+                    'chunk_index': chunk_index
+                })
+                current_chunk = self._overlap(current_chunk) + [sentence]
+                current_length = sum(len(s.split()) for s in current_chunk)
+                chunk_index += 1
+            else:
+                current_chunk.append(sentence)
+                current_length += sentence_length
+        
+        if current_chunk:
+            chunks.append({
+                'chunk_id': f"{document_id}_chunk_{chunk_index}",
+                'content': " ".join(current_chunk),
+                'chunk_index': chunk_index
+            })
+        return chunks
+    
+    def _overlap(self, sentences: List[str]) -> List[str]:
+        overlap = []
+        token_count = 0
+        for sentence in reversed(sentences):
+            sentence_tokens = len(sentence.split())
+            if token_count + sentence_tokens <= self.overlap:
+                overlap.insert(0, sentence)
+                token_count += sentence_tokens
+            else:
+                break
+        return overlap
+
+def synthetic_document(megabytes: float, seed: int = 0) -> str:
+    """Paragraphs of random sentences, roughly the requested size"""
+    rng = random.Random(seed)
+    words = [
+        "invoice", "contract", "payment", "the", "of", "and", "shall", "party",
+        "agreement", "term", "notice", "within", "days", "section", "provided",
+        "delivery", "schedule", "amount", "total", "customer", "supplier", "2023",
+        "liability", "confidential", "information", "services", "fees", "a", "to"
+    ]
+    parts = []
+    size = 0
+    target = int(megabytes * 1024 * 1024)
+    
+    while size < target:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+        sentence = sentence.capitalize() + rng.choice(".!?") + rng.choice(["  ", "\n", " "])
+        parts.append(sentence)
+        size += len(sentence)
+    
+    return "".join(parts)
+
+def run(chunk: Callable[[str], List], text: str) -> Dict:
+    start = time.perf_counter()
+    chunks = chunk(text)
+    seconds = time.perf_counter() - start
+    
+    return {
+        'chunks': len(chunks),
+        'seconds': round(seconds, 3),
+        'chunks_per_second': round(len(chunks) / seconds, 1) if seconds else 0.0,
+        'mb_per_second': round(len(text) / 1024 / 1024 / seconds, 2) if seconds else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and streaming chunkers")
+    parser.add_argument('--sizes', default="1,5,20", help="Synthetic document sizes in MB")
+    parser.add_argument('--file', help="Benchmark this text file instead")
+    args = parser.parse_args()
+    
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            documents = {args.file: f.read()}
+    else:
+        documents = {
+            f"synthetic {size} MB": synthetic_document(float(size))
+            for size in args.sizes.split(",")
+        }
+    
+    legacy = LegacyTextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    words = TextChunker(tokenizer="whitespace")
+    tokens = TextChunker()
+    tokens.chunk_text("Load the tokenizer before timing.", "warmup")
+    
+    chunkers = {
+        'legacy (words)': lambda text: legacy.chunk_text(text, "doc"),
+        'streaming (words)': lambda text: words.chunk_text(text, "doc"),
+        f'streaming ({tokens.tokenizer_name} tokens)': lambda text: tokens.chunk_text(text, "doc"),
+    }
+    
+    print(f"{'document':<22}{'chunker':<58}{'chunks':>8}{'seconds':>9}{'chunks/s':>11}{'MB/s':>8}")
+    for name, text in documents.items():
+        for label, chunk in chunkers.items():
+            result = run(chunk, text)
+            print(f"{name:<22}{label:<58}{result['chunks']:>8}{result['seconds']:>9}"
+                  f"{result['chunks_per_second']:>11}{result['mb_per_second']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#Extraction throughput per file type: pages/second (and MB/second) of
+#FileProcessor over a directory of sample documents, with the extraction
+#cache bypassed. PDFs are also run through the previous single-threaded
+#pdfplumber path (extract_text + extract_tables on every page) to compare.
+#
+#Usage:
+#    python -m benchmarks.extraction_benchmark SAMPLES_DIR [--no-legacy]
+#
+#PDF pages are counted from the document, images count as one page, and
+#text/CSV/Excel/DOCX files count the sections they are read in.
+
+from app.api.index import EXTENSION_FILE_TYPES
+from app.models.schemas import FileType
+from app.services.file_processor import FileProcessor
+from typing import Dict, List, Tuple
+import argparse
+import os
+import time
+
+def collect_files(samples_dir: str) -> List[Tuple[str, FileType]]:
+    files = []
+    for name in sorted(os.listdir(samples_dir)):
+        ext = name.rsplit('.', 1)[-1].lower()
+        if ext in EXTENSION_FILE_TYPES:
+            files.append((os.path.join(samples_dir, name), EXTENSION_FILE_TYPES[ext]))
+    return files
+
+def extract(processor: FileProcessor, path: str, file_type: FileType) -> int:
+    """Fully extract one file and return its page count"""
+    extraction = processor.extract(path, file_type, "benchmark", os.path.basename(path))
+    sections = sum(1 for _ in extraction['sections'])
+    
+    if file_type == FileType.PDF:
+        return extraction['metadata']['page_count']
+    if file_type == FileType.IMAGE:
+        return 1
+    return sections
+
+def legacy_pdf(path: str) -> int:
+    """The old PDF path: pdfplumber text and table extraction, page by page"""
+    import pdfplumber
+    import pandas as pd
+    
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            page.extract_text()
+            for table in page.extract_tables():
+                pd.DataFrame(table[1:], columns=table[0]).to_dict('records')
+        return len(pdf.pages)
+
+def run(files: List[Tuple[str, FileType]], extract_file) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    
+    for path, file_type in files:
+        start = time.perf_counter()
+        pages = extract_file(path, file_type)
+        seconds = time.perf_counter() - start
+        
+        result = results.setdefault(file_type.value, {'files': 0, 'pages': 0, 'bytes': 0, 'seconds': 0.0})
+        result['files'] += 1
+        result['pages'] += pages
+        result['bytes'] += os.path.getsize(path)
+        result['seconds'] += seconds
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Pages/second of document extraction per file type")
+    parser.add_argument('samples_dir')
+    parser.add_argument('--no-legacy', action='store_true', help="Skip the old PDF path")
+    args = parser.parse_args()
+    
+    files = collect_files(args.samples_dir)
+    if not files:
+        raise SystemExit(f"No supported documents found in {args.samples_dir}")
+    
+    processor = FileProcessor()
+    processor.cache = None  # Measure extraction, not cache reads
+    
+    # Start the pool outside the timed runs
+    processor._get_pool().submit(int).result()
+    
+    runs = {'current': run(files, lambda path, file_type: extract(processor, path, file_type))}
+    
+    pdfs = [(path, file_type) for path, file_type in files if file_type == FileType.PDF]
+    if pdfs and not args.no_legacy:
+        runs['legacy'] = run(pdfs, lambda path, file_type: legacy_pdf(path))
+    
+    processor.close()
+    
+    print(f"{'path':<10}{'type':<8}{'files':>7}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'MB/s':>8}")
+    for name, results in runs.items():
+        for file_type, result in sorted(results.items()):
+            seconds = result['seconds']
+            print(f"{name:<10}{file_type:<8}{result['files']:>7}{result['pages']:>8}"
+                  f"{seconds:>10.2f}"
+                  f"{(result['pages'] / seconds if seconds else 0):>10.2f}"
+                  f"{(result['bytes'] / 1024 / 1024 / seconds if seconds else 0):>8.2f}")
+
+if __name__ == "__main__":
+    main()
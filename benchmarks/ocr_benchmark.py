@@ -0,0 +1,136 @@
+#Compares the old fixed OCR configuration (OCR_DPI, every language in
+#OCR_LANGUAGES, no preprocessing) with the adaptive pipeline in OCRService
+#(per-page DPI, binarization, script detection).
+#
+#Usage:
+#    python -m benchmarks.ocr_benchmark SAMPLES_DIR [--truth TRUTH_DIR] [--max-pages N]
+#
+#SAMPLES_DIR holds PDFs and/or images. Ground truth is optional: for an
+#image `scan.png` put `scan.txt` in TRUTH_DIR, for page 3 of `doc.pdf` put
+#`doc_p3.txt`. Pages without ground truth only count towards speed.
+
+from app.config import settings
+from app.services.ocr_service import ocr_image, ocr_pdf_page
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import numpy as np
+import os
+import time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+def levenshtein(a: str, b: str) -> int:
+    """Edit distance, one numpy pass per character of a"""
+    target = np.frombuffer(b.encode('utf-32-le'), dtype=np.uint32)
+    index = np.arange(len(target) + 1)
+    previous = index.copy()
+    
+    for i, char in enumerate(a, 1):
+        candidate = np.empty_like(previous)
+        candidate[0] = i
+        candidate[1:] = np.minimum(
+            previous[1:] + 1,  # deletion
+            previous[:-1] + (target != ord(char))  # substitution / match
+        )
+        # insertions: current[j] = min over k <= j of candidate[k] + (j - k)
+        previous = np.minimum.accumulate(candidate - index) + index
+    
+    return int(previous[-1])
+
+def char_accuracy(predicted: str, truth: str) -> float:
+    predicted = " ".join(predicted.split())
+    truth = " ".join(truth.split())
+    if not truth:
+        return 1.0 if not predicted else 0.0
+    return max(0.0, 1 - levenshtein(predicted, truth) / len(truth))
+
+def collect_pages(samples_dir: str, max_pages: int) -> List[Tuple[str, Optional[int]]]:
+    """(path, page number) for every PDF page and (path, None) for images"""
+    from pdf2image import pdfinfo_from_path
+    
+    pages = []
+    for name in sorted(os.listdir(samples_dir)):
+        path = os.path.join(samples_dir, name)
+        lower = name.lower()
+        
+        if lower.endswith('.pdf'):
+            count = pdfinfo_from_path(path)['Pages']
+            pages.extend((path, page) for page in range(1, count + 1))
+        elif lower.endswith(IMAGE_EXTENSIONS):
+            pages.append((path, None))
+    
+    return pages[:max_pages] if max_pages else pages
+
+def truth_for(truth_dir: Optional[str], path: str, page: Optional[int]) -> Optional[str]:
+    if not truth_dir:
+        return None
+    
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = f"{stem}_p{page}.txt" if page else f"{stem}.txt"
+    truth_path = os.path.join(truth_dir, name)
+    
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, encoding='utf-8') as f:
+        return f.read()
+
+def run(pages: List[Tuple[str, Optional[int]]], truth_dir: Optional[str],
+        ocr: Callable[[str, Optional[int]], str]) -> Dict:
+    accuracies = []
+    start = time.perf_counter()
+    
+    for path, page in pages:
+        text = ocr(path, page)
+        truth = truth_for(truth_dir, path, page)
+        if truth is not None:
+            accuracies.append(char_accuracy(text, truth))
+    
+    seconds = time.perf_counter() - start
+    return {
+        'pages': len(pages),
+        'seconds': round(seconds, 2),
+        'pages_per_second': round(len(pages) / seconds, 3) if seconds else 0.0,
+        'char_accuracy': round(float(np.mean(accuracies)), 4) if accuracies else None,
+        'scored_pages': len(accuracies)
+    }
+
+def make_ocr(adaptive: bool) -> Callable[[str, Optional[int]], str]:
+    def ocr(path: str, page: Optional[int]) -> str:
+        if page is None:
+            from PIL import Image
+            return ocr_image(Image.open(path), settings.TESSERACT_CONFIG,
+                             settings.OCR_LANGUAGES, settings.OCR_PAGE_TIMEOUT,
+                             adaptive=adaptive)
+        return ocr_pdf_page(path, page, settings.OCR_DPI, settings.TESSERACT_CONFIG,
+                            settings.OCR_LANGUAGES, settings.OCR_PAGE_TIMEOUT,
+                            adaptive=adaptive)
+    return ocr
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed and adaptive OCR")
+    parser.add_argument('samples_dir')
+    parser.add_argument('--truth', dest='truth_dir')
+    parser.add_argument('--max-pages', type=int, default=0)
+    args = parser.parse_args()
+    
+    pages = collect_pages(args.samples_dir, args.max_pages)
+    if not pages:
+        raise SystemExit(f"No PDFs or images found in {args.samples_dir}")
+    
+    # Both runs are single-process so pages/second compares the OCR stage itself
+    results = {
+        f'fixed ({settings.OCR_DPI} dpi, {settings.OCR_LANGUAGES})': run(
+            pages, args.truth_dir, make_ocr(adaptive=False)
+        ),
+        'adaptive': run(pages, args.truth_dir, make_ocr(adaptive=True))
+    }
+    
+    print(f"{'configuration':<36}{'pages':>7}{'seconds':>10}{'pages/s':>10}{'char acc':>10}")
+    for name, result in results.items():
+        accuracy = result['char_accuracy']
+        print(f"{name:<36}{result['pages']:>7}{result['seconds']:>10}"
+              f"{result['pages_per_second']:>10}"
+              f"{accuracy if accuracy is not None else '-':>10}")
+
+if __name__ == "__main__":
+    main()
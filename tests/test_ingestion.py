@@ -0,0 +1,169 @@
+from app.config import settings
+from app.models.schemas import FileType
+from app.services.container import ServiceContainer
+from app.services.file_processor import FileProcessor
+from app.services.ingestion_service import IngestionService
+from app.services.keyword_search import KeywordSearchService
+from app.services.near_duplicates import NearDuplicateIndex
+from app.services.table_store import TableStore
+from app.utils.text_utils import TextChunker
+from concurrent.futures import ThreadPoolExecutor
+import app.services.file_processor as file_processor
+import app.services.ocr_service as ocr_service
+import numpy as np
+import pytest
+import threading
+
+pytest.importorskip("pandas")
+pytest.importorskip("langdetect")
+pytest.importorskip("whoosh")
+
+NOTES = (
+    "The warehouse in Lyon ships every order placed before noon on the same day. "
+    "Orders placed later are shipped the next morning by the regional carrier.\n"
+    "Returns are accepted within thirty days when the original packaging is intact. "
+    "Refunds are issued to the card used for the purchase within five working days.\n"
+)
+SALES = "region,product,amount\nNorth,Laptop,1200\nSouth,Phone,800\nNorth,Phone,700\n"
+
+class FakeEmbeddings:
+    """Stands in for the sentence-transformers model: one vector per text"""
+
+    def embed_chunks(self, texts):
+        embeddings = np.ones((len(texts), 4), dtype=np.float32)
+        return embeddings, {'hits': 0, 'misses': len(texts), 'seconds_saved': 0.0}
+
+class FakeVectorStore:
+    """Stands in for Chroma, keeping what was written"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def add_chunks(self, workspace_id, chunks, embeddings):
+        assert len(chunks) == len(embeddings)
+        self.chunks.extend((workspace_id, chunk) for chunk in chunks)
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "notes.txt").write_text(NOTES, encoding="utf-8")
+    (tmp_path / "sales.csv").write_text(SALES, encoding="utf-8")
+    return tmp_path
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'EXTRACTION_CACHE_DIR', str(tmp_path / "cache"))
+    processor = FileProcessor()
+    yield processor
+    processor.close()
+
+@pytest.fixture
+def services(tmp_path, processor, monkeypatch):
+    monkeypatch.setattr(settings, 'DEDUP_ENABLED', True)
+    monkeypatch.setattr(settings, 'TABLE_STORE_ENABLED', True)
+
+    container = ServiceContainer()
+    container._services.update(
+        file_processor=processor,
+        text_chunker=TextChunker(chunk_size=24, overlap=4, tokenizer="whitespace"),
+        embedding_service=FakeEmbeddings(),
+        vector_store=FakeVectorStore(),
+        keyword_search=KeywordSearchService(str(tmp_path / "whoosh")),
+        near_duplicates=NearDuplicateIndex(str(tmp_path / "dedup.db")),
+        table_store=TableStore(str(tmp_path / "tables"))
+    )
+    yield container
+    container._services['keyword_search'].close()
+
+def test_extract_text(files, processor):
+    extraction = processor.extract(str(files / "notes.txt"), FileType.TEXT, "doc1", "notes.txt")
+    sections = list(extraction['sections'])
+
+    assert "".join(section['text'] for section in sections) == NOTES
+    assert extraction['metadata']['document_id'] == "doc1"
+    assert extraction['metadata']['language'] == 'en'
+    assert not extraction['cache_hit']
+
+def test_extract_csv(files, processor):
+    extraction = processor.extract(str(files / "sales.csv"), FileType.CSV, "doc1", "sales.csv")
+    sections = list(extraction['sections'])
+
+    assert sections[0]['columns'] == ['region', 'product', 'amount']
+    assert "North,Laptop,1200" in sections[0]['text']
+    assert extraction['metadata']['row_count'] == 3
+
+def test_extract_replays_from_cache(files, processor):
+    path = str(files / "notes.txt")
+    first = processor.extract(path, FileType.TEXT, "doc1", "notes.txt")
+    first_text = [section['text'] for section in first['sections']]
+
+    second = processor.extract(path, FileType.TEXT, "doc2", "copy.txt")
+
+    assert second['cache_hit']
+    assert [section['text'] for section in second['sections']] == first_text
+    assert second['metadata']['filename'] == "copy.txt"
+
+def test_pdf_pages_ocr_alongside_text(processor, monkeypatch):
+    # Page 2 has no text layer; page 3 has one but turns out to need OCR
+    submitted = []
+    release = threading.Event()
+
+    def extract_pdf_pages(path, pages):
+        assert release.wait(5), "text pages ran before any OCR was started"
+        return [{'page': page, 'text': f"text {page}", 'tables': [], 'needs_ocr': page == 3}
+                for page in pages]
+
+    def ocr_pdf_page(path, page, *args):
+        submitted.append(page)
+        release.set()  # Scanned pages start before any text page is back
+        return f"ocr {page}"
+
+    monkeypatch.setattr(file_processor, 'extract_pdf_pages', extract_pdf_pages)
+    monkeypatch.setattr(ocr_service, 'ocr_pdf_page', ocr_pdf_page)
+    monkeypatch.setattr(settings, 'PDF_PAGES_PER_TASK', 2)
+    processor._pool = ThreadPoolExecutor(4)  # One shared pool, in-process
+
+    metadata = {}
+    pages = list(processor._pdf_pages("doc.pdf", [False, True, False, False], metadata, []))
+
+    assert [(page['page'], page['text'], page['ocr']) for page in pages] == [
+        (1, "text 1", False), (2, "ocr 2", True), (3, "ocr 3", True), (4, "text 4", False)
+    ]
+    assert sorted(submitted) == [2, 3]
+    assert metadata['ocr_pages'] == "2,3"
+
+def test_process_text_document(files, services):
+    result = IngestionService(services).process_document(
+        "doc1", str(files / "notes.txt"), FileType.TEXT, "ws", "notes.txt"
+    )
+
+    written = services.vector_store.chunks
+    assert result['chunks'] == len(written) > 1
+    assert result['duplicate_chunks'] == 0
+    assert {workspace for workspace, _ in written} == {"ws"}
+    assert all(chunk['metadata']['language'] == 'en' for _, chunk in written)
+
+    # Keyword documents are committed before the job reports completion
+    assert services.keyword_search.stats()['pending_documents'] == 0
+    hits = services.keyword_search.search("refunds", "ws")
+    assert [hit['document_id'] for hit in hits] == ["doc1"]
+
+def test_process_csv_document(files, services):
+    result = IngestionService(services).process_document(
+        "doc1", str(files / "sales.csv"), FileType.CSV, "ws", "sales.csv"
+    )
+
+    assert result['chunks'] >= 1
+    assert result['tables'] == 1
+    assert result['table_rows'] == 3
+    assert services.table_store.query("total amount for North", "ws")['value'] == 1900
+
+def test_reingesting_a_copy_collapses_its_chunks(files, services):
+    ingestion = IngestionService(services)
+    path = str(files / "notes.txt")
+
+    first = ingestion.process_document("doc1", path, FileType.TEXT, "ws", "notes.txt")
+    second = ingestion.process_document("doc2", path, FileType.TEXT, "ws", "copy.txt")
+
+    assert second['extraction_cache_hit']
+    assert second['duplicate_chunks'] == second['chunks'] == first['chunks']
+    assert len(services.vector_store.chunks) == first['chunks']
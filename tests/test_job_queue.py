@@ -0,0 +1,125 @@
+from app.config import settings
+from app.models.schemas import DocumentStatus
+from app.services.job_queue import JobQueue
+import time
+
+import pytest
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(settings, 'JOB_RETRY_BACKOFF', 5.0)
+    monkeypatch.setattr(settings, 'JOB_STALE_AFTER', 120.0)
+    monkeypatch.setattr(settings, 'INGEST_WORKSPACE_CONCURRENCY', 2)
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+def _set(queue, job_id, **columns):
+    """Rewrite job columns directly (to age heartbeats or skip backoff)"""
+    assignments = ", ".join(f"{name} = ?" for name in columns)
+    with queue._connect() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                     (*columns.values(), job_id))
+
+def test_enqueue_returns_existing_job_for_document(queue):
+    first = queue.enqueue("ws", {'file_path': "a.pdf"}, document_id="doc")
+    second = queue.enqueue("ws", {'file_path': "a.pdf"}, document_id="doc")
+    
+    assert second['job_id'] == first['job_id']
+    assert first['status'] == DocumentStatus.PENDING.value
+
+def test_claim_takes_highest_priority_first(queue):
+    low = queue.enqueue("ws", {}, document_id="low")
+    high = queue.enqueue("ws", {}, document_id="high", priority=5)
+    
+    claimed = queue.claim("worker")
+    
+    assert claimed['job_id'] == high['job_id']
+    assert claimed['status'] == DocumentStatus.PROCESSING.value
+    assert claimed['attempts'] == 1
+    assert queue.claim("worker")['job_id'] == low['job_id']
+    assert queue.claim("worker") is None
+
+def test_claim_respects_workspace_concurrency(queue):
+    for i in range(3):
+        queue.enqueue("busy", {}, document_id=f"busy-{i}")
+    other = queue.enqueue("quiet", {}, document_id="quiet")
+    
+    claimed = [queue.claim("worker") for _ in range(3)]
+    
+    assert [job['workspace_id'] for job in claimed].count("busy") == 2
+    assert other['job_id'] in {job['job_id'] for job in claimed}
+    assert queue.claim("worker") is None
+
+def test_fail_retries_with_backoff_then_fails(queue):
+    job = queue.enqueue("ws", {}, document_id="doc")
+    
+    claimed = queue.claim("worker")
+    before = time.time()
+    queue.fail(claimed['job_id'], "boom")
+    
+    retried = queue.get_job(job['job_id'])
+    assert retried['status'] == DocumentStatus.PENDING.value
+    assert retried['run_after'] >= before + 5.0
+    assert queue.claim("worker") is None  # Still backing off
+    
+    for _ in range(2):
+        _set(queue, job['job_id'], run_after=0)
+        queue.fail(queue.claim("worker")['job_id'], "boom")
+    
+    failed = queue.get_job(job['job_id'])
+    assert failed['status'] == DocumentStatus.FAILED.value
+    assert failed['attempts'] == 3
+    assert failed['error'] == "boom"
+
+def test_stale_job_is_retried_with_backoff(queue):
+    job = queue.enqueue("ws", {}, document_id="doc")
+    queue.claim("worker")
+    _set(queue, job['job_id'], heartbeat_at=time.time() - 1000)
+    
+    assert queue.claim("other") is None  # Requeued, but not runnable yet
+    
+    requeued = queue.get_job(job['job_id'])
+    assert requeued['status'] == DocumentStatus.PENDING.value
+    assert requeued['error'] == "worker lost"
+    assert requeued['run_after'] > time.time()
+
+def test_stale_job_fails_after_max_attempts(queue):
+    job = queue.enqueue("ws", {}, document_id="doc")
+    
+    # The worker dies on this document every time
+    for _ in range(3):
+        assert queue.claim("worker")['job_id'] == job['job_id']
+        _set(queue, job['job_id'], heartbeat_at=time.time() - 1000)
+        assert queue.claim("worker") is None  # Requeues (or fails) it
+        _set(queue, job['job_id'], run_after=0)
+    
+    assert queue.claim("worker") is None
+    
+    failed = queue.get_job(job['job_id'])
+    assert failed['status'] == DocumentStatus.FAILED.value
+    assert failed['attempts'] == 3
+
+def test_heartbeat_keeps_job_claimed(queue):
+    job = queue.enqueue("ws", {}, document_id="doc")
+    queue.claim("worker")
+    queue.heartbeat(job['job_id'])
+    
+    assert queue.claim("other") is None
+    assert queue.get_job(job['job_id'])['status'] == DocumentStatus.PROCESSING.value
+
+def test_batch_document_status(queue):
+    batch = queue.enqueue_batch("ws", [
+        {'document_id': "a", 'filename': "a.txt"},
+        {'document_id': "b", 'filename': "b.txt"}
+    ])
+    queue.update_batch_document(batch['job_id'], "a", DocumentStatus.COMPLETED, chunks=4)
+    
+    documents = {d['document_id']: d for d in queue.get_batch(batch['job_id'])['documents']}
+    assert documents['a']['status'] == DocumentStatus.COMPLETED.value
+    assert documents['a']['chunks'] == 4
+    assert documents['b']['status'] == DocumentStatus.PENDING.value
+    
+    status = queue.get_document_status("a")
+    assert status['job_id'] == batch['job_id']
+    assert status['status'] == DocumentStatus.COMPLETED.value
+    assert status['timings'] == {'chunks': 4}
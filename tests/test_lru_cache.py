@@ -0,0 +1,38 @@
+from app.utils.cache import LRUCache
+import time
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = LRUCache(max_size=10, ttl=5)
+    cache.put("a", 1)
+    
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert len(cache) == 0
+
+def test_zero_ttl_never_expires_and_zero_size_disables():
+    assert LRUCache(max_size=1, ttl=0).ttl is None
+    
+    disabled = LRUCache(max_size=0)
+    disabled.put("a", 1)
+    assert disabled.get("a") is None
+    assert len(disabled) == 0
@@ -0,0 +1,88 @@
+from app.config import settings
+from app.services.near_duplicates import NearDuplicateIndex
+
+import pytest
+
+DISCLAIMER = ("This report is confidential and intended solely for the use of the "
+              "individual or entity to whom it is addressed. If you have received it "
+              "in error please notify the sender and delete all copies immediately. "
+              "Any review, retransmission, dissemination or other use of this "
+              "information by persons other than the intended recipient is prohibited "
+              "and may be unlawful under applicable data protection regulations.")
+OTHER = ("Quarterly revenue grew eleven percent on strong demand for the new "
+         "product line while operating costs stayed flat across every region.")
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DEDUP_THRESHOLD', 0.9)
+    monkeypatch.setattr(settings, 'DEDUP_SHINGLE_WORDS', 3)
+    monkeypatch.setattr(settings, 'DEDUP_NUM_PERM', 128)
+    monkeypatch.setattr(settings, 'DEDUP_BANDS', 16)
+    return NearDuplicateIndex(str(tmp_path / "dedup.db"))
+
+def _chunk(document_id, index, content):
+    return {'chunk_id': f"{document_id}_chunk_{index}", 'document_id': document_id,
+            'chunk_index': index, 'page': None, 'content': content}
+
+def _ingest(index, chunks):
+    plan = index.collapse("ws", chunks)
+    index.register("ws", plan)
+    return plan
+
+def test_identical_signatures_for_identical_text(index):
+    assert (index.signature(DISCLAIMER) == index.signature(DISCLAIMER)).all()
+    assert index.signature("!!! ...") is None
+
+def test_collapses_duplicates_within_a_batch(index):
+    plan = _ingest(index, [_chunk("a", 0, DISCLAIMER), _chunk("a", 1, OTHER),
+                           _chunk("a", 2, DISCLAIMER)])
+    
+    assert [c['chunk_id'] for c in plan['keep']] == ["a_chunk_0", "a_chunk_1"]
+    assert [c['chunk_id'] for c in plan['duplicates']] == ["a_chunk_2"]
+    assert index.references("ws", ["a_chunk_0"])["a_chunk_0"][0]['chunk_id'] == "a_chunk_2"
+
+def test_collapses_near_duplicates_across_documents(index):
+    _ingest(index, [_chunk("a", 0, DISCLAIMER)])
+    
+    edited = DISCLAIMER.replace("regulations", "rules")  # Last word: one shingle differs
+    plan = _ingest(index, [_chunk("b", 0, edited), _chunk("b", 1, OTHER)])
+    
+    assert [c['chunk_id'] for c in plan['duplicates']] == ["b_chunk_0"]
+    reference = index.references("ws", ["a_chunk_0"])["a_chunk_0"][0]
+    assert reference['document_id'] == "b"
+    assert settings.DEDUP_THRESHOLD <= reference['similarity'] < 1.0
+
+def test_workspaces_are_separate(index):
+    _ingest(index, [_chunk("a", 0, DISCLAIMER)])
+    
+    plan = index.collapse("other", [_chunk("b", 0, DISCLAIMER)])
+    assert plan['duplicates'] == []
+
+def test_nothing_is_recorded_until_register(index):
+    plan = index.collapse("ws", [_chunk("a", 0, DISCLAIMER)])
+    assert index.stats() == {'canonical_chunks': 0, 'collapsed_chunks': 0}
+    
+    # The first write failed, so a later copy must be indexed, not collapsed
+    retry = index.collapse("ws", [_chunk("b", 0, DISCLAIMER)])
+    assert retry['duplicates'] == []
+    
+    index.register("ws", retry)
+    assert index.stats() == {'canonical_chunks': 1, 'collapsed_chunks': 0}
+
+def test_reindexed_canonical_chunk_stays_canonical(index):
+    _ingest(index, [_chunk("a", 0, DISCLAIMER)])
+    _ingest(index, [_chunk("b", 0, DISCLAIMER)])
+    
+    plan = _ingest(index, [_chunk("a", 0, DISCLAIMER)])
+    
+    assert [c['chunk_id'] for c in plan['keep']] == ["a_chunk_0"]
+    assert index.stats() == {'canonical_chunks': 1, 'collapsed_chunks': 1}
+
+def test_reindexed_chunk_with_new_text_is_rebucketed(index):
+    _ingest(index, [_chunk("a", 0, DISCLAIMER)])
+    _ingest(index, [_chunk("a", 0, OTHER)])  # Same chunk id, different content
+    
+    plan = index.collapse("ws", [_chunk("b", 0, DISCLAIMER), _chunk("b", 1, OTHER)])
+    
+    assert [c['chunk_id'] for c in plan['keep']] == ["b_chunk_0"]
+    assert plan['references'][0][1] == "a_chunk_0"
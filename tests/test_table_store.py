@@ -0,0 +1,113 @@
+from app.services.table_store import TableStore
+
+import pytest
+
+pytest.importorskip("pandas")
+
+SALES = [
+    ('North', 'Laptop', 1200, 2023),
+    ('South', 'Phone', 800, 2023),
+    ('North', 'Phone', 700, 2022),
+    ('East', 'Laptop', 1500, 2023),
+    ('South', 'Laptop', 900, 2022),
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = TableStore(str(tmp_path / "tables"))
+    collector = store.collector("ws", "doc1", "sales.csv")
+    counts = collector.finish([{'data': [
+        {'region': region, 'product': product, 'amount': amount, 'year': year}
+        for region, product, amount, year in SALES
+    ]}])
+    assert counts == {'tables': 1, 'table_rows': len(SALES)}
+    return store
+
+def test_total(store):
+    result = store.query("What is the total amount?", "ws")
+    
+    assert result['operation'] == 'sum'
+    assert result['column'] == 'amount'
+    assert result['value'] == sum(row[2] for row in SALES)
+    assert result['confident']
+
+def test_value_and_bare_number_filters(store):
+    result = store.query("total amount for laptop in 2023", "ws")
+    
+    assert result['value'] == 1200 + 1500
+    assert {f['column'] for f in result['filters']} == {'product', 'year'}
+
+def test_comparison(store):
+    result = store.query("how many rows have amount over 850", "ws")
+    
+    assert result['operation'] == 'count'
+    assert result['value'] == 3
+
+def test_group_by(store):
+    result = store.query("average amount by region", "ws")
+    
+    groups = {group['region']: group['mean(amount)'] for group in result['groups']}
+    assert groups == {'North': 950.0, 'South': 850.0, 'East': 1500.0}
+    assert result['groups'][0]['region'] == 'East'  # Largest first
+
+def test_row_lookup_is_not_confident(store):
+    result = store.query("which rows have product phone", "ws")
+    
+    assert result['operation'] == 'rows'
+    assert not result['confident']
+    assert sorted(row['region'] for row in result['rows']) == ['North', 'South']
+
+@pytest.mark.parametrize("question", [
+    "what is the capital of France",
+    "list the policies for the North office",  # A cell value, but no column named
+    "show me what happened in 2023",  # A bare year, but no column named
+    "what is the total headcount",
+])
+def test_questions_without_a_column_are_not_table_questions(store, question):
+    assert store.query(question, "ws") is None
+
+def test_other_workspace_sees_nothing(store):
+    assert store.query("What is the total amount?", "other") is None
+
+def test_column_types(tmp_path):
+    store = TableStore(str(tmp_path / "tables"))
+    collector = store.collector("ws", "doc", "codes.csv")
+    collector.finish([{'data': [{'code': '10', 'price': '5'}, {'code': 'A7', 'price': '7'},
+                                {'code': '10', 'price': '$1,000'}]}])
+    
+    # "A7" turns code into a text column; "$1,000" still parses as a number
+    table = store._workspace_tables("ws")[0]
+    assert [column['kind'] for column in table.meta['columns']] == ['text', 'number']
+    
+    assert store.query("total price", "ws")['value'] == 5 + 7 + 1000
+    
+    result = store.query("total price for code a7", "ws")
+    assert result['value'] == 7
+    assert result['filters'] == [{'column': 'code', 'op': '=', 'value': 'A7'}]
+
+def test_reingest_replaces_tables(store):
+    collector = store.collector("ws", "doc1", "sales.csv")
+    collector.finish([{'data': [{'region': 'West', 'amount': 5}]}])
+    
+    assert store.query("What is the total amount?", "ws")['value'] == 5
+    
+    store.delete_document("ws", "doc1")
+    assert store.list_tables("ws") == []
+
+def test_streamed_row_sections(tmp_path):
+    store = TableStore(str(tmp_path / "tables"))
+    collector = store.collector("ws", "doc", "big.csv")
+    sections = [
+        {'text': "\n".join(f"{'north' if i % 2 else 'south'},{i}" for i in range(start, start + 100)),
+         'header': "big.csv\nregion,units", 'columns': ['region', 'units']}
+        for start in range(0, 1000, 100)
+    ]
+    
+    passed = list(collector.watch(sections))
+    counts = collector.finish([])
+    
+    assert passed == sections  # Sections flow through to the chunker unchanged
+    assert counts == {'tables': 1, 'table_rows': 1000}
+    
+    groups = {g['region']: g['sum(units)'] for g in store.query("total units by region", "ws")['groups']}
+    assert groups == {'north': sum(range(1, 1000, 2)), 'south': sum(range(0, 1000, 2))}
@@ -0,0 +1,105 @@
+from app.utils.text_utils import TextChunker
+import threading
+
+def _chunker(chunk_size=10, overlap=3):
+    # Whitespace counting: token counts are word counts, no model download
+    return TextChunker(chunk_size=chunk_size, overlap=overlap, tokenizer="whitespace")
+
+def _sentences(count, words=4):
+    return [" ".join(f"s{i}w{j}" for j in range(words)) + "." for i in range(count)]
+
+def test_chunks_respect_size_and_overlap():
+    text = " ".join(_sentences(10))  # 40 words in 4-word sentences
+    chunks = _chunker(chunk_size=10, overlap=4).chunk_text(text, "doc")
+    
+    assert len(chunks) > 1
+    assert all(chunk['token_count'] <= 10 for chunk in chunks)
+    assert [chunk['chunk_index'] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0]['chunk_id'] == "doc_chunk_0"
+    
+    # Each chunk starts with the last sentence of the previous one
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = previous['content'].rsplit(". ", 1)[-1]
+        assert chunk['content'].startswith(last_sentence.rstrip("."))
+    
+    # Every sentence is in some chunk
+    for sentence in _sentences(10):
+        assert any(sentence in chunk['content'] for chunk in chunks)
+
+def test_no_overlap_when_budget_is_zero():
+    text = " ".join(_sentences(6))
+    chunks = _chunker(chunk_size=8, overlap=0).chunk_text(text, "doc")
+    
+    words = [word for chunk in chunks for word in chunk['content'].split()]
+    assert len(words) == len(set(words)) == 24
+
+def test_offsets_point_into_source_text():
+    text = " ".join(_sentences(5))
+    for chunk in _chunker().chunk_text(text, "doc"):
+        assert text[chunk['start_char']:chunk['end_char']] == chunk['content']
+
+def test_long_sentence_becomes_its_own_chunk():
+    long_sentence = " ".join(f"w{i}" for i in range(25)) + "."
+    text = f"Short one. {long_sentence} Short two."
+    chunks = _chunker(chunk_size=10, overlap=2).chunk_text(text, "doc")
+    
+    assert any(chunk['content'] == long_sentence for chunk in chunks)
+
+def test_page_spans_across_sections():
+    sections = [
+        {'text': "Page one starts here. It keeps going", 'page': 1},
+        {'text': "across the break. Page two has more words to say.", 'page': 2},
+        {'text': "Page three ends it.", 'page': 3},
+    ]
+    chunks = list(_chunker(chunk_size=12, overlap=0).iter_chunks(sections, "doc"))
+    
+    assert chunks[0]['page'] == 1
+    assert chunks[-1]['page_end'] == 3
+    for chunk in chunks:
+        assert chunk['page'] <= chunk['page_end']
+    
+    # The sentence split by the page break stays in one chunk
+    assert any("It keeps going across the break." in chunk['content'] for chunk in chunks)
+
+def test_table_rows_are_packed_whole_under_header():
+    header = "sales.csv\nregion,amount"
+    rows = "\n".join(f"north,{i}" for i in range(20))
+    section = {'text': rows, 'page': None, 'header': header}
+    
+    chunks = list(_chunker(chunk_size=12, overlap=4).iter_chunks([section], "doc"))
+    
+    assert len(chunks) > 1
+    seen = []
+    for chunk in chunks:
+        assert chunk['content'].startswith(header + "\n")
+        chunk_rows = chunk['content'][len(header) + 1:].split("\n")
+        assert all(row.startswith("north,") for row in chunk_rows)
+        seen.extend(chunk_rows)
+    assert seen == rows.split("\n")  # Whole rows, in order, no overlap
+
+def test_prose_after_table_rows_continues_numbering():
+    sections = [
+        {'text': "a,1\nb,2", 'header': "t.csv\nkey,value"},
+        {'text': "Some prose after the table."},
+    ]
+    chunks = list(_chunker().iter_chunks(sections, "doc"))
+    
+    assert [chunk['chunk_index'] for chunk in chunks] == [0, 1]
+    assert chunks[1]['content'] == "Some prose after the table."
+
+def test_concurrent_chunking_matches_sequential():
+    chunker = _chunker()
+    texts = [" ".join(_sentences(30, words=i % 5 + 1)) for i in range(8)]
+    expected = [chunker.chunk_text(text, f"d{i}") for i, text in enumerate(texts)]
+    results = [None] * len(texts)
+    
+    def run(i):
+        results[i] = chunker.chunk_text(texts[i], f"d{i}")
+    
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert results == expected
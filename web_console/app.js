@@ -42,12 +42,75 @@ fileInput.addEventListener('change', (e) => {
     handleFiles(e.target.files);
 });
 
+const ARCHIVE_PATTERN = /\.(zip|tar|tgz|tbz2|tar\.gz|tar\.bz2)$/i;
+
 async function handleFiles(files) {
+    // Several files or an archive go through one batch job
+    if (files.length > 1 || ARCHIVE_PATTERN.test(files[0].name)) {
+        await uploadBatch(files);
+        return;
+    }
+    
     for (const file of files) {
         await uploadFile(file);
     }
 }
 
+async function uploadBatch(files) {
+    const formData = new FormData();
+    for (const file of files) {
+        formData.append('files', file);
+    }
+    
+    try {
+        const response = await fetch(`${API_BASE}/batch?workspace_id=${WORKSPACE_ID}`, {
+            method: 'POST',
+            body: formData
+        });
+        
+        const data = await response.json();
+        
+        for (const doc of data.documents) {
+            if (!document.getElementById(`file-${doc.document_id}`)) {
+                uploadedFiles.push(doc);
+                displayFile(doc);
+            }
+        }
+        
+        if (data.skipped.length) {
+            console.warn('Skipped files:', data.skipped);
+        }
+        
+        if (data.batch_id) {
+            checkBatchStatus(data.batch_id);
+        }
+        
+    } catch (error) {
+        console.error('Batch upload failed:', error);
+        alert('Batch upload failed: ' + error.message);
+    }
+}
+
+async function checkBatchStatus(batchId) {
+    // One request per poll for the whole batch
+    const interval = setInterval(async () => {
+        try {
+            const response = await fetch(`${API_BASE}/batch/${batchId}`);
+            const data = await response.json();
+            
+            for (const doc of data.documents) {
+                updateFileStatus(doc.document_id, doc.status);
+            }
+            
+            if (data.status === 'completed' || data.status === 'failed') {
+                clearInterval(interval);
+            }
+        } catch (error) {
+            clearInterval(interval);
+        }
+    }, 2000);
+}
+
 async function uploadFile(file) {
     const formData = new FormData();
     formData.append('file', file);
@@ -60,8 +123,11 @@ async function uploadFile(file) {
         
         const data = await response.json();
         
-        uploadedFiles.push(data);
-        displayFile(data);
+        // Byte-identical re-uploads come back with the existing document id
+        if (!document.getElementById(`file-${data.document_id}`)) {
+            uploadedFiles.push(data);
+            displayFile(data);
+        }
         
         // Trigger indexing
         await indexDocument(data.document_id);
@@ -141,8 +207,13 @@ async function sendMessage() {
     addMessage(message, 'user');
     input.value = '';
     
+    // Assistant message is filled in as tokens stream in
+    const messageDiv = addMessage('', 'assistant');
+    const textEl = messageDiv.querySelector('.message-text');
+    let sources = [];
+    
     try {
-        const response = await fetch(`${API_BASE}/chat`, {
+        const response = await fetch(`${API_BASE}/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -154,16 +225,53 @@ async function sendMessage() {
             })
         });
         
-        const data = await response.json();
-        
-        conversationId = data.conversation_id;
-        
-        // Display assistant message
-        addMessage(data.response, 'assistant', data.sources);
+        await readEvents(response, (event, data) => {
+            if (event === 'sources') {
+                conversationId = data.conversation_id;
+                sources = data.sources;
+            } else if (event === 'token') {
+                textEl.textContent += data.content;
+                scrollMessages();
+            } else if (event === 'done') {
+                conversationId = data.conversation_id;
+                addSources(messageDiv, sources);
+            } else if (event === 'error') {
+                throw new Error(data.detail);
+            }
+        });
         
     } catch (error) {
         console.error('Chat failed:', error);
-        addMessage('Sorry, something went wrong.', 'assistant');
+        textEl.textContent = 'Sorry, something went wrong.';
+    }
+}
+
+// Read a Server-Sent Events stream from a fetch response
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            
+            onEvent(event, data ? JSON.parse(data) : null);
+        }
     }
 }
 
@@ -172,8 +280,21 @@ function addMessage(text, role, sources = null) {
     
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${role}`;
-    messageDiv.textContent = text;
     
+    const textEl = document.createElement('span');
+    textEl.className = 'message-text';
+    textEl.textContent = text;
+    messageDiv.appendChild(textEl);
+    
+    addSources(messageDiv, sources);
+    
+    messagesDiv.appendChild(messageDiv);
+    scrollMessages();
+    
+    return messageDiv;
+}
+
+function addSources(messageDiv, sources) {
     if (sources && sources.length > 0) {
         const sourcesDiv = document.createElement('div');
         sourcesDiv.className = 'sources';
@@ -187,9 +308,12 @@ function addMessage(text, role, sources = null) {
         });
         
         messageDiv.appendChild(sourcesDiv);
+        scrollMessages();
     }
-    
-    messagesDiv.appendChild(messageDiv);
+}
+
+function scrollMessages() {
+    const messagesDiv = document.getElementById('messages');
     messagesDiv.scrollTop = messagesDiv.scrollHeight;
 }
 
@@ -205,19 +329,32 @@ async function loadDocuments() {
     const documentsList = document.getElementById('documentsList');
     documentsList.innerHTML = '<p>Loading documents...</p>';
     
-    // This would call a GET /documents endpoint
-    // For now, show uploaded files
-    documentsList.innerHTML = '';
-    
-    uploadedFiles.forEach(file => {
-        const item = document.createElement('div');
-        item.className = 'file-item';
-        item.innerHTML = `
-            <div class="file-info">
-                <div class="file-name">${file.filename}</div>
-                <div class="file-status">${file.file_type} • ${(file.size / 1024).toFixed(2)} KB</div>
-            </div>
-        `;
-        documentsList.appendChild(item);
-    });
+    try {
+        const response = await fetch(`${API_BASE}/documents?workspace_id=${WORKSPACE_ID}`);
+        const data = await response.json();
+        
+        documentsList.innerHTML = '';
+        
+        const summary = document.createElement('p');
+        summary.textContent = `${data.dedup.documents} documents • ` +
+            `${data.dedup.duplicates} duplicate uploads skipped • ` +
+            `${(data.dedup.bytes_saved / 1024).toFixed(2)} KB saved`;
+        documentsList.appendChild(summary);
+        
+        data.documents.forEach(file => {
+            const item = document.createElement('div');
+            item.className = 'file-item';
+            item.innerHTML = `
+                <div class="file-info">
+                    <div class="file-name">${file.filename}</div>
+                    <div class="file-status">${file.file_type} • ${(file.size / 1024).toFixed(2)} KB</div>
+                </div>
+            `;
+            documentsList.appendChild(item);
+        });
+        
+    } catch (error) {
+        console.error('Loading documents failed:', error);
+        documentsList.innerHTML = '<p>Could not load documents.</p>';
+    }
 }
\ No newline at end of file